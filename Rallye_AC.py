@@ -1,8 +1,26 @@
 import pygame
-import ctypes
-from ctypes import c_int32, c_float, c_wchar, Structure
-import mmap
 import os
+import sys
+import time
+
+from ac_layout import LAYOUT_PATH, SimInfo
+from dash_layout import BLACK, PANEL_RECT, STANDBY, DashLayout
+from derived import DerivedChannels
+from detectors import EventDetector, describe
+from governor import FrameGovernor
+from ingest import IngestThread
+from low_impact import LowImpact
+from pb_store import PersonalBestStore, TraceRecorder
+from predictor import Predictor
+from profiler import FrameProfiler
+from recorder import SessionRecorder, recording_name
+from shift_points import ShiftPointStore
+from splits import SegmentTimer
+from strip_chart import INPUT_TRACES, StripChart
+from track_map import TrackMap
+from tyre_panel import create_panel
+from telemetry import AcReader, GcPolicy, TelemetryFrame
+from web_dash import WebDashboard
 
 # ------SETTINGS---------------------------------------------------------------
 freedom_units = True
@@ -13,6 +31,11 @@ SCREEN_WIDTH, SCREEN_HEIGHT = 1024, 600
 # Set refresh rate below in hz
 refresh_rate = 60
 
+# Updates per second for the widgets that barely change, everything else draws every frame.
+# Only estimate, segments, progress, damage, map and tyres can be listed. When frames run close to
+# the refresh_rate budget these are slowed down further, and restored once there is headroom
+widget_rates = {'estimate': 10, 'segments': 10, 'progress': 15, 'damage': 5, 'map': 30, 'tyres': 30}
+
 # Use fullscreen borderless?
 fullscreen = False
 
@@ -20,123 +43,75 @@ fullscreen = False
 # Ex: if your main monitor is 1920x1080 and Dash is set up to the right -> '1920, 0'
 dash_position = '100, 100'
 
+# Number of equal-distance segments the stage is split into for split times
+segment_count = 10
+
+# Where personal bests and reference traces are kept between sessions
+pb_store_path = r"~\Documents\Sim-Dashboard\personal_bests.db"
+
+# Record sessions to disk for later analysis
+record_sessions = False
+recording_directory = r"~\Documents\Sim-Dashboard\recordings"
+
+# Rolling throttle, brake, speed and steering traces
+show_traces = True
+trace_seconds = 10
+
+# Stage map with a ghost of the personal best, needs a personal best set since this version
+show_map = True
+
+# Four-corner tyre panel in the map's place, F9 switches between the two. Shows core temperature
+# (mean, min-max), pressure, load and camber per wheel, and a red bar for the share of physics
+# ticks spent slipping, over every tick since the last update. Needs numpy
+show_tyre_panel = True
+
+# Per-section frame timing overlay, also enabled by --profile or toggled with F10.
+# F11 writes a cProfile dump covering the next profile_capture_frames frames.
+profile_mode = False
+profile_capture_frames = 300
+
+# Low-impact mode for running on the sim's PC: pins the dashboard to these cores (None = all),
+# lowers its priority and keeps the drawing's CPU time under low_impact_cpu_budget of one core
+# by stretching frames. The budget covers the render loop only, drawing at 60 Hz takes about
+# 0.1-0.25; the telemetry thread is held back by the cores and priority alone.
+# show_cpu_usage puts the dashboard's own CPU use (all of it, and drawing) in the bottom-left corner
+low_impact = False
+low_impact_cores = None  # e.g. [3] for the last core of a 4-core CPU
+low_impact_cpu_budget = 0.3
+show_cpu_usage = False
+
+# Turn off automatic garbage collection while driving and collect between frames instead
+gc_control = True
+
+# Extra derived channels as (name, inputs, function of the inputs), see derived.py.
+# A channel named like a standard one (estimated_ms, delta_ms, ...) replaces it.
+custom_channels = []
+
+# Learn each car's upshift points from full-throttle pulls; the shift light and
+# tach colours follow them once known, until then they light at 95% of max rpm
+learn_shift_points = True
+shift_points_path = r"~\Documents\Sim-Dashboard\shift_points.json"
+
+# Distance the fuel range and end-of-stage tyre wear predictions are fitted over, in metres
+prediction_window_m = 3000
+
+# Lockup, wheelspin, puncture, off-track, impact and damage alerts
+show_alerts = True
+
+# Serve a browser dashboard at http://localhost:web_port/. With web_lan it is served to the
+# whole network (http://<this pc>:web_port/ on a phone); it has no password, so only on a network you trust
+# Append ?hz=5 to the address to slow it down on a weak phone or connection
+web_dashboard = False
+web_port = 8080
+web_lan = False
+
+# Shared-memory layout of the AC pages, swap it for another AC build or a sim using the same format
+ac_layout_path = LAYOUT_PATH
+
 # -----------------------------------------------------------------------------
 
 
-# Extract Shared Memory Structures
-class SPageFilePhysics(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('packetId', c_int32),
-        ('gas', c_float),
-        ('brake', c_float),
-        ('fuel', c_float),
-        ('gear', c_int32),
-        ('rpms', c_int32),
-        ('steerAngle', c_float),
-        ('speedKmh', c_float),
-        ('velocity', c_float * 3),
-        ('accG', c_float * 3),
-        ('wheelSlip', c_float * 4),
-        ('wheelLoad', c_float * 4),
-        ('wheelsPressure', c_float * 4),
-        ('wheelAngularSpeed', c_float * 4),
-        ('tyreWear', c_float * 4),
-        ('tyreDirtyLevel', c_float * 4),
-        ('tyreCoreTemperature', c_float * 4),
-        ('camberRAD', c_float * 4),
-        ('suspensionTravel', c_float * 4),
-        ('drs', c_float),
-        ('tc', c_float),
-        ('heading', c_float),
-        ('pitch', c_float),
-        ('roll', c_float),
-        ('cgHeight', c_float),
-        ('carDamage', c_float * 5),
-        ('numberOfTyresOut', c_int32),
-        ('pitLimiterOn', c_int32),
-        ('abs', c_float),
-        ('kersCharge', c_float),
-        ('kersInput', c_float),
-        ('autoShifterOn', c_int32),
-        ('rideHeight', c_float * 2),
-    ]
-
-class SPageFileGraphic(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('packetId', c_int32),
-        ('status', c_int32),
-        ('session', c_int32),
-        ('currentTime', c_wchar * 15),
-        ('lastTime', c_wchar * 15),
-        ('bestTime', c_wchar * 15),
-        ('split', c_wchar * 15),
-        ('completedLaps', c_int32),
-        ('position', c_int32),
-        ('iCurrentTime', c_int32),
-        ('iLastTime', c_int32),
-        ('iBestTime', c_int32),
-        ('sessionTimeLeft', c_float),
-        ('distanceTraveled', c_float),
-        ('isInPit', c_int32),
-        ('currentSectorIndex', c_int32),
-        ('lastSectorTime', c_int32),
-        ('numberOfLaps', c_int32),
-        ('tyreCompound', c_wchar * 33),
-        ('replayTimeMultiplier', c_float),
-        ('normalizedCarPosition', c_float),
-        ('carCoordinates', c_float * 3),
-        ('penaltyTime', c_float),
-        ('flag', c_int32),
-        ('idealLineOn', c_int32),
-    ]
-
-class SPageFileStatic(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('smVersion', c_wchar * 15),
-        ('acVersion', c_wchar * 15),
-        ('numberOfSessions', c_int32),
-        ('numCars', c_int32),
-        ('carModel', c_wchar * 33),
-        ('track', c_wchar * 33),
-        ('playerName', c_wchar * 33),
-        ('playerSurname', c_wchar * 33),
-        ('playerNick', c_wchar * 33),
-        ('sectorCount', c_int32),
-        ('maxTorque', c_float),
-        ('maxPower', c_float),
-        ('maxRpm', c_int32),
-        ('maxFuel', c_float),
-        ('suspensionMaxTravel', c_float * 4),
-        ('tyreRadius', c_float * 4),
-    ]
-
-class SimInfo:
-    def __init__(self):
-        self.physics = None
-        self.graphics = None
-        self.static = None
-        try:
-            self._physics = mmap.mmap(-1, ctypes.sizeof(SPageFilePhysics), 'acpmf_physics')
-            self._graphics = mmap.mmap(-1, ctypes.sizeof(SPageFileGraphic), 'acpmf_graphics')
-            self._static = mmap.mmap(-1, ctypes.sizeof(SPageFileStatic), 'acpmf_static')
-
-            self.physics = SPageFilePhysics.from_buffer(self._physics)
-            self.graphics = SPageFileGraphic.from_buffer(self._graphics)
-            self.static = SPageFileStatic.from_buffer(self._static)
-        except Exception:
-            pass # AC not running
-
-    def close(self):
-        for m in (getattr(self, attr, None) for attr in ['_physics', '_graphics', '_static']):
-            if m:
-                try:
-                    m.close()
-                except:
-                    pass
-info = SimInfo()
+info = SimInfo(ac_layout_path)
 
 pygame.init()
 
@@ -146,268 +121,168 @@ if fullscreen == True:
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
 
 pygame.display.set_caption('Rallye Dashboard')
-font_super_large = pygame.font.SysFont('arial', 300, bold=True)
-font_large = pygame.font.SysFont('arial', 120, bold=True)
-font_medium_large = pygame.font.SysFont('arial', 85, bold=True)
-font_medium = pygame.font.SysFont('arial', 60, bold=True)
-font_medium_small = pygame.font.SysFont('arial', 35, bold=True)
-font_small = pygame.font.SysFont('arial', 20, bold=True)
-
-def format_time(ms):
-    if ms <= 0:
-        return '--:--.---'
-    minutes = ms // 60000
-    seconds = (ms // 1000) % 60
-    millis = ms % 1000
-    return f'{minutes}:{seconds:02}.{millis:03}'
-
-def format_delta(ms):
-    if ms == 0:
-        return '+0.000'
-    sign = '+' if ms > 0 else '-'
-    abs_ms = abs(ms)
-    minutes = abs_ms // 60000
-    seconds = (abs_ms // 1000) % 60 
-    millis = abs_ms % 1000 
-    if minutes > 0:
-        return f'{sign}{minutes}:{seconds:02}.{millis:03}'
-    else:
-        return f'{sign}{seconds}.{millis:03}'
-
-#Tach Settings
-TACH_HEIGHT = 80 
-TACH_Y = SCREEN_HEIGHT - TACH_HEIGHT
-TACH_X = 0 
-TACH_WIDTH = SCREEN_WIDTH 
-
-def get_rpm_color(rpm_ratio):
-    if rpm_ratio < 0.7:
-        g = 255
-        r = int(255 * (rpm_ratio / 0.7))
-        b = 0 
-    elif rpm_ratio < 0.9:
-        r = 255
-        g = int(255 * (1 - (rpm_ratio - 0.7) / 0.325))
-        b = 0 
-    else:
-        r = 255
-        g = int(100 * (1 - (rpm_ratio - 0.9) / 0.1))
-        b = 0 
-    return (r, g, b)
-
-def find_max_rpm(static_max_rpm, current_rpm, max_seen_rpm):
-    if static_max_rpm > 0:
-        return static_max_rpm
-    else:
-        max_seen_rpm[0] = max(max_seen_rpm[0], current_rpm)
-        return int(max_seen_rpm[0])
 
 running = True
 clock = pygame.time.Clock()
-last_packet_id = -1
-
-# Default Values
-speed = rpm = throttle = brake = current_lap_ms = 0 
-gear = 0 
-max_rpm_seen = [0] 
-distance_km = 0.0 
-progress_percent = 0
-speed_unit = 'KPH'
-dist_units = 'KM'
-
-previous_distance = 0.0
+idle_frames = 0
+
+# The ingest thread reads every physics step, the loop draws the newest one
+frame = TelemetryFrame()
+detector = EventDetector()
+alerts_seen = 0
+shift_store = ShiftPointStore(shift_points_path) if learn_shift_points else None
+tyre_panel = create_panel(PANEL_RECT) if show_tyre_panel else None
+learners = [Predictor(prediction_window_m)]
+if shift_store is not None:
+    learners.append(shift_store.model)
+if tyre_panel is not None:
+    learners.append(tyre_panel.aggregator)
+ingest = None
+if info.physics:
+    ingest = IngestThread(AcReader(info, TelemetryFrame()), detector, learners)
+    ingest.start()
+
 previous_time = 0 
-delta_ms = 0 
-delta_valid = False
+
+segments = SegmentTimer(segment_count)
+last_completed_laps = -1
+
+pb_store = PersonalBestStore(pb_store_path)
+pb_key = None
+trace_recorder = TraceRecorder()
+
+recorder = None
+record_start = time.perf_counter()
+
+traces = StripChart((10, 182, 360, 70), trace_seconds, refresh_rate, INPUT_TRACES) if show_traces else None
+
+profiler = FrameProfiler(profile_mode or '--profile' in sys.argv)
+
+track_map = TrackMap(PANEL_RECT) if show_map else None
+
+governor = FrameGovernor(refresh_rate, widget_rates)
+
+layout = DashLayout(screen, freedom_units, segments, traces, profiler, track_map, governor, tyre_panel)
+derived = DerivedChannels(custom_channels, freedom_units)
+
+web = WebDashboard(web_port, freedom_units, '' if web_lan else '127.0.0.1') if web_dashboard else None
+if web is not None:
+    web.start()
+standby_zero = layout.font_large.render("0", True, STANDBY)
+standby_neutral = layout.font_large.render("N", True, STANDBY)
+
+gc_policy = GcPolicy(gc_control)
+gc_policy.start()
+
+# After the threads are started, so they are pinned and lowered too
+cpu_limiter = LowImpact(low_impact, low_impact_cores, cpu_budget=low_impact_cpu_budget)
+cpu_limiter.apply()
 
 while running:
+    profiler.begin_frame()
+    governor.begin_frame()
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
-
-    screen.fill((0, 0, 0))
-
-    if info.physics and info.graphics:
-        if info.physics.packetId != last_packet_id:
-            last_packet_id = info.physics.packetId
-
-            speed = info.physics.speedKmh
-            rpm = info.physics.rpms
-            gear = info.physics.gear - 1
-            throttle = info.physics.gas
-            brake = info.physics.brake
-            current_lap_ms = info.graphics.iCurrentTime
-            best_lap_ms = info.graphics.iBestTime
-            distance_km = info.graphics.distanceTraveled / 1000.0
-            max_rpm = find_max_rpm(info.static.maxRpm, rpm, max_rpm_seen)
-            tc_level = info.physics.tc 
-            abs_level = info.physics.abs
-            engine_dmg = info.physics.carDamage[0] * 100
-            tyre_wear_avg = sum(info.physics.tyreWear) / 4
-            susp_dmg_max = max(info.physics.carDamage[2:5]) * 100
-            tyre_punctrues = info.physics.numberOfTyresOut 
-
-            # Calc is short for calculator
-            progress_percent = info.graphics.normalizedCarPosition * 100.0 if info.graphics.normalizedCarPosition >= 0 else 0 
-            
-            if best_lap_ms > 0 and current_lap_ms > 0:
-                expected_ms = best_lap_ms * info.graphics.normalizedCarPosition
-                current_elapsed = current_lap_ms
-                delta_ms = int(current_elapsed - expected_ms)
-                delta_valid = True 
-            else:
-                delta_ms = 0 
-                delta_valid = False
-
-
-            if best_lap_ms > 0 and progress_percent > 1:
-                pace_factor = current_lap_ms / (best_lap_ms * (progress_percent / 100.0))
-                estimated_stage_ms = int(best_lap_ms * pace_factor)
-            else:
-                estimated_stage_ms = 0
-
-            
-
-        rpm_ratio = max(0, min(1, rpm / max(100, max_rpm)))
-
-        # Rendering
-        # Speed
-        if freedom_units == True:
-            speed = speed / 1.609
-            speed_unit = 'MPH'
-        speed_text = font_large.render(f'{int(speed)}', True, (255, 255, 255))
-        screen.blit(speed_text, (10, 255))
-        screen.blit(font_medium_small.render(speed_unit, True, (200, 200, 200)), (20 + speed_text.get_width(), 305))
-
-        # RPM 
-        rpm_text = font_large.render(f'{int(rpm)}', True, (255, 255, 255))
-        screen.blit(rpm_text, (10, 380))
-        screen.blit(font_medium_small.render('RPM', True, (200, 200, 200)), (20 + rpm_text.get_width(), 430))
-
-        # Gear 
-        flash_color = (255, 0, 0) if (pygame.time.get_ticks() // 75) % 2 else (255, 255, 255)
-        gear_str = 'R' if gear == -1 else 'N' if gear == 0 else str(gear)
-        gear_color = (255, 0, 0) if gear == -1 else flash_color if rpm_ratio > 0.95 else (255, 255, 255)
-        gear_text = font_super_large.render(gear_str, True, gear_color)
-        screen.blit(gear_text, ((SCREEN_WIDTH // 2 - gear_text.get_width() // 2), (SCREEN_HEIGHT // 2 - 75)))
-
-        #RIGHT HAND SIDE PANEL
-        right_x = SCREEN_WIDTH - 10
-
-        # Times
-        current_text = font_medium_large.render(format_time(current_lap_ms), True, (255, 255, 255))
-        screen.blit(current_text, (right_x - current_text.get_width(), 280))
-        screen.blit(font_small.render("CURRENT STAGE", True, (200, 200, 200)), (right_x - 250, 260))
-        
-        if delta_valid:
-            delta_color = (0, 255, 0) if delta_ms < 0 else (255, 255, 0) if delta_ms == 0 else (255, 100, 100)
-            delta_text = font_medium_large.render(format_delta(delta_ms), True, delta_color)
-        else:
-            delta_text = font_medium_large.render('+--.---', True, (150, 150, 150))
-        screen.blit(delta_text, (SCREEN_WIDTH // 2 - delta_text.get_width() // 2, 180))
-
-        if estimated_stage_ms > 0:
-            est_text = font_medium_large.render(format_time(estimated_stage_ms), True, (100, 200, 255))
-        else:
-            est_text = font_medium_large.render('--:--.---', True, (100, 200, 255))
-        screen.blit(est_text, (right_x - est_text.get_width(), 400))
-        screen.blit(font_small.render('ESTIMATED STAGE', True, (100, 200, 255)), (right_x - 250, 380))
-
-        # Stage progress 
-        if freedom_units == True:
-            dist_units = 'Mi'
-            distance_km = distance_km / 1.609
-                
-        progress_text = font_medium_small.render(f'{distance_km:.2f} {dist_units}', True, (255, 255, 255))
-        screen.blit(progress_text, (right_x - progress_text.get_width(), 150))
-
-        # Progress Bar 
-        bar_width = SCREEN_WIDTH - 30 - progress_text.get_width()
-        bar_height = 10 
-        bar_x = SCREEN_WIDTH - bar_width - 20 - progress_text.get_width()
-        bar_y = 165
-        pygame.draw.rect(screen, (50, 50, 50), (bar_x, bar_y, bar_width, bar_height))
-        fill_width = int(bar_width * (progress_percent / 100.0))
-        pygame.draw.rect(screen, (200, 200, 200), (bar_x, bar_y, fill_width, bar_height))
-        percent_text = font_small.render(f'{progress_percent:.0f}%', True, (200, 200, 200))
-        screen.blit(percent_text, (fill_width, bar_y - 25))
-
-        # Input Pos Bars
-        pygame.draw.rect(screen, (0, 255, 0), (620, 500 - int(throttle * 220), 10, int(throttle * 220)))
-        pygame.draw.rect(screen, (255, 0, 0), (400, 500 - int(brake * 220), 10, int(brake * 220)))
-
-        #RPM bar 
-        fill_width = int(TACH_WIDTH * rpm_ratio)
-
-        pygame.draw.rect(screen, (30, 30, 30), (TACH_X, TACH_Y, TACH_WIDTH, TACH_HEIGHT))
-        if fill_width > 0:
-            for x in range(TACH_X, TACH_X + fill_width):
-                segment_ratio = (x - TACH_X) / TACH_WIDTH
-                color = get_rpm_color(segment_ratio)
-                pygame.draw.line(screen, color, (x, TACH_Y), (x, TACH_Y + TACH_HEIGHT - 1), 1)
-
-        #TC and abs
-        if tc_level < 0.1:
-            tc_color = (0, 255, 0)
-            tc_text_str = 'TC OFF'
-        elif tc_level < 0.5:
-            tc_color = (255, 200, 0)
-            tc_text_str = 'TC'
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F10:
+                profiler.toggle()
+            elif event.key == pygame.K_F11:
+                profiler.capture(profile_capture_frames)
+            elif event.key == pygame.K_F9:
+                layout.toggle_panel()
+
+    screen.fill(BLACK)
+    profiler.lap('events')
+
+    if ingest is not None:
+        if ingest.snapshot(frame):
+            idle_frames = 0
+            profiler.lap('read')
+
+            # Stage finished, the finish closes the last segment before the timer resets
+            if frame.laps != last_completed_laps:
+                if last_completed_laps >= 0:
+                    segments.finish(frame.last_ms)
+                    if trace_recorder.complete:
+                        pb_store.submit(pb_key, frame.last_ms, trace_recorder.trace())
+                last_completed_laps = frame.laps
+
+            # Personal bests survive restarts, the sim's own best does not
+            current_lap_ms = frame.current_ms
+            if pb_key is None or current_lap_ms < previous_time:
+                pb_key = ('ac', info.static.track, info.static.carModel)
+                pb_store.request_reference(pb_key)
+                trace_recorder.reset()
+                derived.set('stage_start_distance', frame.distance_m)
+                if shift_store is not None:
+                    shift_store.select('ac', info.static.carModel)
+            previous_time = current_lap_ms
+            derived.set('best_lap_ms', frame.best_ms if frame.best_ms > 0 else pb_store.best_ms(pb_key))
+            derived.set('reference', pb_store.reference)
+            if shift_store is not None:
+                derived.set('shift_points', shift_store.model.shift_rpm)
+
+            # Stage distance, progress, delta, estimate, rpm and display units
+            derived.update(frame)
+            if web is not None:
+                web.publish(frame)
+            trace_recorder.update(frame.stage_distance, current_lap_ms, frame.pos[0], frame.pos[2])
+            if track_map is not None:
+                track_map.set_reference(pb_store.reference)
+
+            segments.update(frame.position, current_lap_ms)
+            profiler.lap('derived')
+
+            if record_sessions:
+                if recorder is None:
+                    recorder = SessionRecorder(os.path.join(os.path.expanduser(recording_directory),
+                                                            recording_name('ac', info.static.track, info.static.carModel)),
+                                               'ac', info.static.track, info.static.carModel)
+                recorder.write_frame(time.perf_counter() - record_start, frame)
+            profiler.lap('record')
         else:
-            tc_color(255, 0, 0)
-            tc_text_str = 'TC !'
-        tc_indicator = font_medium.render(tc_text_str, True, tc_color)
-        screen.blit(tc_indicator, (10, 10))
-
-        if abs_level < 0.1:
-            abs_color = (0, 255, 0)
-            abs_text_str = 'ABS OFF'
-        else:
-            abs_color = (255, 0, 0)
-            abs_text_str = 'ABS !'
-
-        abs_indicator = font_medium.render(abs_text_str, True, abs_color)
-        screen.blit(abs_indicator, (10, 70))
-
-        # Engine Damage 
-        dmg_bar_x = right_x - 350
-        dmg_bar_y = 20 
-        pygame.draw.rect(screen, (40, 40, 40), (dmg_bar_x, dmg_bar_y, 350, 30))
-        eng_fill_w = int(350 * (engine_dmg / 100))
-        if eng_fill_w > 0:
-            pygame.draw.rect(screen, (255, 0, 0), (dmg_bar_x, dmg_bar_y, eng_fill_w, 30))
-        eng_pct = font_small.render(f'ENG {engine_dmg:.0f}%', True, (255, 0, 0))
-        screen.blit(eng_pct, (dmg_bar_x - eng_pct.get_width() - 10, dmg_bar_y))
-
-        # Tires bar
-        tyre_bar_y = dmg_bar_y + 35 
-        pygame.draw.rect(screen, (40, 40, 40), (dmg_bar_x, tyre_bar_y, 350, 30))
-        tyre_fill_w = int(350 * (tyre_wear_avg / 100))
-        tyre_color = (255, 165, 0) if tyre_punctrues == 0 else (255, 100, 0)
-        if tyre_fill_w > 0:
-            pygame.draw.rect(screen, tyre_color, (dmg_bar_x, tyre_bar_y, tyre_fill_w, 30))
-        punc_text = '!' * tyre_punctrues
-        tyre_pct = font_small.render(f'TIRE {tyre_wear_avg:.0f}% {punc_text}', True, (255, 200, 10))
-        screen.blit(tyre_pct, (dmg_bar_x - tyre_pct.get_width() - 10, tyre_bar_y))
-
-        susp_bar_y = tyre_bar_y + 35 
-        pygame.draw.rect(screen, (40, 40, 40), (dmg_bar_x, susp_bar_y, 350, 30))
-        susp_fill_w = int(350 * (susp_dmg_max / 100))
-        if susp_fill_w > 0:
-            pygame.draw.rect(screen, (100, 150, 255), (dmg_bar_x, susp_bar_y, susp_fill_w, 30))
-        susp_pct = font_small.render(f'SUSP {susp_dmg_max:.0f}%', True, (150, 200, 255))
-        screen.blit(susp_pct, (dmg_bar_x - susp_pct.get_width() - 10, susp_bar_y))
+            idle_frames += 1
+
+        if detector.count != alerts_seen:
+            if recorder is not None:
+                # Every event since the last frame goes into the recording's index
+                events = tuple(detector.events)
+                for t, kind, wheel, value in events[len(events) - min(detector.count - alerts_seen, len(events)):]:
+                    recorder.mark(t - record_start, kind, wheel, value)
+            alerts_seen = detector.count
+            if show_alerts:
+                layout.show_alert(describe(detector.events[-1]))
+        layout.draw(frame)
 
     else:
         # AC not running - just shows zeros or a standby message
-        screen.blit(font_large.render("0", True, (100, 100, 100)), (50, 50))
-        screen.blit(font_large.render("0", True, (100, 100, 100)), (300, 50))
-        screen.blit(font_large.render("N", True, (100, 100, 100)), (600, 50))
-
+        screen.blit(standby_zero, (50, 50))
+        screen.blit(standby_zero, (300, 50))
+        screen.blit(standby_neutral, (600, 50))
+        idle_frames += 1
+        profiler.lap('standby')
+
+    if show_cpu_usage:
+        cpu_limiter.draw(screen, layout.font_small, 10, 497)
+    profiler.draw(screen, layout.font_profile, 10, 10)
     pygame.display.flip()
+    profiler.lap('flip')
+    gc_policy.safe_point(idle_frames > refresh_rate)
+    governor.end_frame()
     clock.tick(refresh_rate) # Hz Refresh rate, AC physics is slower than 144Hz
-
+    cpu_limiter.throttle()
+    profiler.lap('wait')
+
+gc_policy.stop()
+if ingest is not None:
+    ingest.stop()
+if web is not None:
+    web.stop()
+pb_store.close()
+if shift_store is not None:
+    shift_store.save()
+if recorder is not None:
+    recorder.close()
 info.close()
 pygame.quit()
-
-
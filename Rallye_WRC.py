@@ -1,8 +1,26 @@
 import pygame
 import socket
-import json
-import struct
 import os
+import sys
+import time
+
+from dash_layout import BLACK, PANEL_RECT, STANDBY, DashLayout
+from derived import DerivedChannels
+from detectors import EventDetector, describe
+from governor import FrameGovernor
+from ingest import IngestThread
+from low_impact import LowImpact
+from pb_store import PersonalBestStore, TraceRecorder
+from predictor import Predictor
+from profiler import FrameProfiler
+from recorder import SessionRecorder, recording_name
+from shift_points import ShiftPointStore
+from splits import SegmentTimer
+from strip_chart import INPUT_TRACES, StripChart
+from track_map import TrackMap
+from telemetry import GcPolicy, TelemetryFrame
+from web_dash import WebDashboard
+from wrc_udp import WrcReader, load_packet_layouts
 
 # ------SETTINGS---------------------------------------------------------------
 freedom_units = True
@@ -13,6 +31,11 @@ SCREEN_WIDTH, SCREEN_HEIGHT = 1024, 600
 # Set refresh rate below in hz
 refresh_rate = 60
 
+# Updates per second for the widgets that barely change, everything else draws every frame.
+# Only estimate, segments, progress, damage and map can be listed. When frames run close to
+# the refresh_rate budget these are slowed down further, and restored once there is headroom
+widget_rates = {'estimate': 10, 'segments': 10, 'progress': 15, 'damage': 5, 'map': 30}
+
 # Use fullscreen borderless?
 fullscreen = False
 
@@ -25,45 +48,72 @@ UDP_PORT = 9999
 # Telemetry Directory
 telemetry_directory = r"~\Documents\My Games\WRC\telemetry\readme" 
 
+# Number of equal-distance segments the stage is split into for split times
+segment_count = 10
+
+# Where personal bests and reference traces are kept between sessions
+pb_store_path = r"~\Documents\Sim-Dashboard\personal_bests.db"
+
+# Record sessions to disk for later analysis
+record_sessions = False
+recording_directory = r"~\Documents\Sim-Dashboard\recordings"
+
+# Rolling throttle, brake, speed and steering traces
+show_traces = True
+trace_seconds = 10
+
+# Stage map with a ghost of the personal best, needs a personal best set since this version
+show_map = True
+
+# Per-section frame timing overlay, also enabled by --profile or toggled with F10.
+# F11 writes a cProfile dump covering the next profile_capture_frames frames.
+profile_mode = False
+profile_capture_frames = 300
+
+# Low-impact mode for running on the sim's PC: pins the dashboard to these cores (None = all),
+# lowers its priority and keeps the drawing's CPU time under low_impact_cpu_budget of one core
+# by stretching frames. The budget covers the render loop only, drawing at 60 Hz takes about
+# 0.1-0.25; the telemetry thread is held back by the cores and priority alone.
+# show_cpu_usage puts the dashboard's own CPU use (all of it, and drawing) in the bottom-left corner
+low_impact = False
+low_impact_cores = None  # e.g. [3] for the last core of a 4-core CPU
+low_impact_cpu_budget = 0.3
+show_cpu_usage = False
+
+# Turn off automatic garbage collection while driving and collect between frames instead
+gc_control = True
+
+# Extra derived channels as (name, inputs, function of the inputs), see derived.py.
+# A channel named like a standard one (estimated_ms, delta_ms, ...) replaces it.
+custom_channels = []
+
+# Learn each car's upshift points from full-throttle pulls; the shift light and
+# tach colours follow them once known, until then they light at 95% of max rpm
+learn_shift_points = True
+shift_points_path = r"~\Documents\Sim-Dashboard\shift_points.json"
+
+# Distance the fuel range and end-of-stage tyre wear predictions are fitted over, in metres
+prediction_window_m = 3000
+
+# Lockup, wheelspin, puncture, off-track, impact and damage alerts
+show_alerts = True
+
+# Serve a browser dashboard at http://localhost:web_port/. With web_lan it is served to the
+# whole network (http://<this pc>:web_port/ on a phone); it has no password, so only on a network you trust
+# Append ?hz=5 to the address to slow it down on a weak phone or connection
+web_dashboard = False
+web_port = 8080
+web_lan = False
+
 # -----------------------------------------------------------------------------
 
 
 # Dynamic UDP Parser for EA SPORTS WRC Native Telemetry
 TELEMETRY_DIR = os.path.expanduser(telemetry_directory)
-CHANNELS_JSON = os.path.join(TELEMETRY_DIR, "channels.json")
-STRUCTURE_JSON = os.path.join(TELEMETRY_DIR, "udp", "wrc.json")
-
-def load_udp_parser():
-    with open(CHANNELS_JSON, 'r') as f:
-        channels_data = json.load(f)
-        channels = {ch['id']: ch for ch in channels_data['channels']}
-    
-    with open(STRUCTURE_JSON, 'r') as f:
-        struct_data = json.load(f)
-    
-    # session_update packet
-    packet = next(p for p in struct_data['packets'] if p['id'] == 'session_update')
-    header = struct_data['header']['channels']
-    update = packet['channels']
-    all_channels = header + update
-    
-    type_map = {
-        'boolean': '?',
-        'uint8': 'B', 'int8': 'b',
-        'uint16': 'H', 'int16': 'h',
-        'uint32': 'I', 'int32': 'i',
-        'uint64': 'Q', 'int64': 'q',
-        'float32': 'f', 'float64': 'd',
-    }
-    
-    fmt = '<' + ''.join(type_map[channels[ch]['type']] for ch in all_channels)
-    return fmt, all_channels
-
-unpack_fmt, channel_order = load_udp_parser()
+packet_layouts = load_packet_layouts(TELEMETRY_DIR)
 
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 sock.bind(("127.0.0.1", UDP_PORT))
-sock.settimeout(0.01)  # Non-blocking
 
 pygame.init()
 
@@ -73,253 +123,178 @@ if fullscreen:
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
 
 pygame.display.set_caption('EA WRC Rallye Dashboard')
-font_super_large = pygame.font.SysFont('arial', 300, bold=True)
-font_large = pygame.font.SysFont('arial', 120, bold=True)
-font_medium_large = pygame.font.SysFont('arial', 85, bold=True)
-font_medium = pygame.font.SysFont('arial', 60, bold=True)
-font_medium_small = pygame.font.SysFont('arial', 35, bold=True)
-font_small = pygame.font.SysFont('arial', 20, bold=True)
-
-def format_time(ms):
-    if ms <= 0:
-        return '--:--.---'
-    minutes = ms // 60000
-    seconds = (ms // 1000) % 60
-    millis = ms % 1000
-    return f'{minutes}:{seconds:02}.{millis:03}'
-
-def format_delta(ms):
-    if ms == 0:
-        return '+0.000'
-    sign = '+' if ms > 0 else '-'
-    abs_ms = abs(ms)
-    minutes = abs_ms // 60000
-    seconds = (abs_ms // 1000) % 60 
-    millis = abs_ms % 1000 
-    if minutes > 0:
-        return f'{sign}{minutes}:{seconds:02}.{millis:03}'
-    else:
-        return f'{sign}{seconds}.{millis:03}'
-
-#Tach Settings
-TACH_HEIGHT = 80 
-TACH_Y = SCREEN_HEIGHT - TACH_HEIGHT
-TACH_X = 0 
-TACH_WIDTH = SCREEN_WIDTH 
-
-def get_rpm_color(rpm_ratio):
-    if rpm_ratio < 0.7:
-        g = 255
-        r = int(255 * (rpm_ratio / 0.7))
-        b = 0 
-    elif rpm_ratio < 0.9:
-        r = 255
-        g = int(255 * (1 - (rpm_ratio - 0.7) / 0.325))
-        b = 0 
-    else:
-        r = 255
-        g = int(100 * (1 - (rpm_ratio - 0.9) / 0.1))
-        b = 0 
-    return (r, g, b)
-
-def find_max_rpm(static_max_rpm, current_rpm, max_seen_rpm):
-    if static_max_rpm > 0:
-        return static_max_rpm
-    else:
-        max_seen_rpm[0] = max(max_seen_rpm[0], current_rpm)
-        return int(max_seen_rpm[0])
 
 running = True
 clock = pygame.time.Clock()
+idle_frames = 0
+
+# The ingest thread reads every packet, the loop draws the newest one
+frame = TelemetryFrame()
+wrc = WrcReader(packet_layouts, TelemetryFrame(), sock)
+detector = EventDetector()
+alerts_seen = 0
+shift_store = ShiftPointStore(shift_points_path) if learn_shift_points else None
+learners = [Predictor(prediction_window_m)]
+if shift_store is not None:
+    learners.append(shift_store.model)
+ingest = IngestThread(wrc, detector, learners)
+ingest.start()
 
-# Default Values
-speed = rpm = throttle = brake = current_lap_ms = 0 
-gear = 0 
-max_rpm_seen = [0] 
-distance_km = 0.0 
-progress_percent = 0
-speed_unit = 'KPH'
-dist_units = 'KM'
+segments = SegmentTimer(segment_count)
 
-delta_ms = 0 
-delta_valid = False
-estimated_stage_ms = 0
+pb_store = PersonalBestStore(pb_store_path)
+pb_key = None
+trace_recorder = TraceRecorder()
+stage_submitted = False
+previous_time = 0
+sessions_seen = 0
+ends_seen = 0
 
-data = {}
+recorder = None
+record_start = time.perf_counter()
+
+traces = StripChart((10, 182, 360, 70), trace_seconds, refresh_rate, INPUT_TRACES) if show_traces else None
+
+profiler = FrameProfiler(profile_mode or '--profile' in sys.argv)
+
+track_map = TrackMap(PANEL_RECT) if show_map else None
+
+governor = FrameGovernor(refresh_rate, widget_rates)
+
+layout = DashLayout(screen, freedom_units, segments, traces, profiler, track_map, governor)
+derived = DerivedChannels(custom_channels, freedom_units)
+
+web = WebDashboard(web_port, freedom_units, '' if web_lan else '127.0.0.1') if web_dashboard else None
+if web is not None:
+    web.start()
+
+standby_text = layout.font_large.render("Waiting for EA WRC telemetry...", True, STANDBY)
+
+gc_policy = GcPolicy(gc_control)
+gc_policy.start()
+
+# After the threads are started, so they are pinned and lowered too
+cpu_limiter = LowImpact(low_impact, low_impact_cores, cpu_budget=low_impact_cpu_budget)
+cpu_limiter.apply()
 
 while running:
+    profiler.begin_frame()
+    governor.begin_frame()
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
             running = False
-
-    screen.fill((0, 0, 0))
-
-    # Receive UDP packet
-    try:
-        packet, _ = sock.recvfrom(4096)
-        values = struct.unpack(unpack_fmt, packet)
-        data = dict(zip(channel_order, values))
-    except:
-        pass  # No new packet
-
-    if data:
-        # === CHANNEL MAPPING (adjust these based on your channels.json) ===
-        # Run once with print(data) to see exact names and update below
-        speed = data.get('speed', 0)  # usually km/h
-        rpm = data.get('rpm', 0) or data.get('engine_rpm', 0)
-        gear = data.get('gear', 0)  # adjust offset if needed
-        throttle = data.get('throttle', 0) or data.get('gas', 0)
-        brake = data.get('brake', 0)
-        current_lap_ms = data.get('stage_current_time', 0) * 1000 or data.get('current_time_ms', 0)  # ms
-        best_lap_ms = data.get('stage_best_time', 0) * 1000 or data.get('best_time_ms', 0)
-        progress_percent = data.get('normalized_spline_position', 0) * 100 or data.get('stage_progress', 0)
-        distance_km = data.get('distance_completed', 0) / 1000 or data.get('distance_traveled', 0) / 1000
-        max_rpm = find_max_rpm(data.get('max_rpm', 0), rpm, max_rpm_seen)
-
-        tc_level = data.get('tc_intervention', 0) or 0
-        abs_level = data.get('abs_intervention', 0) or 0
-        engine_dmg = data.get('engine_damage', 0) * 100 or 0
-        tyre_wear_avg = data.get('tyre_wear_average', 0) * 100 or sum(data.get('tyre_wear', [0]*4)) / 4 * 100
-        susp_dmg_max = data.get('suspension_damage', 0) * 100 or 0
-        tyre_punctures = data.get('flat_tyres', 0) or 0
-
-        # Delta & Estimated
-        if best_lap_ms > 0 and current_lap_ms > 0:
-            expected_ms = best_lap_ms * (progress_percent / 100.0)
-            delta_ms = int(current_lap_ms - expected_ms)
-            delta_valid = True 
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_F10:
+                profiler.toggle()
+            elif event.key == pygame.K_F11:
+                profiler.capture(profile_capture_frames)
+
+    screen.fill(BLACK)
+    profiler.lap('events')
+
+    # Newest UDP packet from the ingest thread
+    new_packet = ingest.snapshot(frame)
+    profiler.lap('read')
+
+    if ingest.ticks:
+        if new_packet:
+            idle_frames = 0
+            current_lap_ms = frame.current_ms
+
+            # Personal bests, WRC forgets stage_best_time when the game restarts
+            if pb_key is None or current_lap_ms < previous_time or wrc.sessions != sessions_seen:
+                sessions_seen = wrc.sessions
+                stage_id, vehicle_id = wrc.stage_key()
+                pb_key = ('wrc', stage_id, vehicle_id)
+                pb_store.request_reference(pb_key)
+                trace_recorder.reset()
+                stage_submitted = False
+                if shift_store is not None:
+                    shift_store.select('wrc', vehicle_id)
+            previous_time = current_lap_ms
+            derived.set('best_lap_ms', frame.best_ms if frame.best_ms > 0 else pb_store.best_ms(pb_key))
+            derived.set('reference', pb_store.reference)
+            if shift_store is not None:
+                derived.set('shift_points', shift_store.model.shift_rpm)
+
+            # Stage distance, progress, delta, estimate, rpm and display units;
+            # WRC's distance is already from the stage start
+            derived.update(frame)
+            if web is not None:
+                web.publish(frame)
+            trace_recorder.update(frame.stage_distance, current_lap_ms, frame.pos[0], frame.pos[2])
+            if track_map is not None:
+                track_map.set_reference(pb_store.reference)
+            # session_end carries the official stage time, older layouts without
+            # it fall back to the end of the progress bar
+            if not wrc.has_session_end and frame.progress_percent >= 99.9 and not stage_submitted:
+                stage_submitted = True
+                if recorder is not None:
+                    recorder.mark(time.perf_counter() - record_start, 'finish', -1, current_lap_ms)
+                if trace_recorder.complete:
+                    pb_store.submit(pb_key, current_lap_ms, trace_recorder.trace())
+
+            segments.update(frame.position, current_lap_ms)
+            profiler.lap('derived')
+
+            if record_sessions:
+                if recorder is None:
+                    recorder = SessionRecorder(os.path.join(os.path.expanduser(recording_directory),
+                                                            recording_name('wrc', pb_key[1], pb_key[2])),
+                                               'wrc', pb_key[1], pb_key[2])
+                recorder.write_frame(time.perf_counter() - record_start, frame)
+            profiler.lap('record')
         else:
-            delta_valid = False
-
-        if best_lap_ms > 0 and progress_percent > 1:
-            pace_factor = current_lap_ms / (best_lap_ms * (progress_percent / 100.0))
-            estimated_stage_ms = int(best_lap_ms * pace_factor)
-        else:
-            estimated_stage_ms = 0
-
-        rpm_ratio = max(0, min(1, rpm / max(100, max_rpm)))
-
-        # Rendering (exact same as your AC code)
-        if freedom_units:
-            speed = speed / 1.609
-            speed_unit = 'MPH'
-            if 'Mi' in dist_units:
-                distance_km = distance_km / 1.609
-            dist_units = 'Mi'
-
-        speed_text = font_large.render(f'{int(speed)}', True, (255, 255, 255))
-        screen.blit(speed_text, (10, 255))
-        screen.blit(font_medium_small.render(speed_unit, True, (200, 200, 200)), (20 + speed_text.get_width(), 305))
-
-        rpm_text = font_large.render(f'{int(rpm)}', True, (255, 255, 255))
-        screen.blit(rpm_text, (10, 380))
-        screen.blit(font_medium_small.render('RPM', True, (200, 200, 200)), (20 + rpm_text.get_width(), 430))
-
-        flash_color = (255, 0, 0) if (pygame.time.get_ticks() // 75) % 2 else (255, 255, 255)
-        gear_str = 'R' if gear == -1 else 'N' if gear == 0 else str(gear)
-        gear_color = (255, 0, 0) if gear == -1 else flash_color if rpm_ratio > 0.95 else (255, 255, 255)
-        gear_text = font_super_large.render(gear_str, True, gear_color)
-        screen.blit(gear_text, ((SCREEN_WIDTH // 2 - gear_text.get_width() // 2), (SCREEN_HEIGHT // 2 - 75)))
-
-        right_x = SCREEN_WIDTH - 10
-
-        current_text = font_medium_large.render(format_time(current_lap_ms), True, (255, 255, 255))
-        screen.blit(current_text, (right_x - current_text.get_width(), 280))
-        screen.blit(font_small.render("CURRENT STAGE", True, (200, 200, 200)), (right_x - 250, 260))
-        
-        if delta_valid:
-            delta_color = (0, 255, 0) if delta_ms < 0 else (255, 255, 0) if delta_ms == 0 else (255, 100, 100)
-            delta_text = font_medium_large.render(format_delta(delta_ms), True, delta_color)
-        else:
-            delta_text = font_medium_large.render('+--.---', True, (150, 150, 150))
-        screen.blit(delta_text, (SCREEN_WIDTH // 2 - delta_text.get_width() // 2, 180))
-
-        if estimated_stage_ms > 0:
-            est_text = font_medium_large.render(format_time(estimated_stage_ms), True, (100, 200, 255))
-        else:
-            est_text = font_medium_large.render('--:--.---', True, (100, 200, 255))
-        screen.blit(est_text, (right_x - est_text.get_width(), 400))
-        screen.blit(font_small.render('ESTIMATED STAGE', True, (100, 200, 255)), (right_x - 250, 380))
-
-        progress_text = font_medium_small.render(f'{distance_km:.2f} {dist_units}', True, (255, 255, 255))
-        screen.blit(progress_text, (right_x - progress_text.get_width(), 150))
-
-        bar_width = SCREEN_WIDTH - 30 - progress_text.get_width()
-        bar_x = SCREEN_WIDTH - bar_width - 20 - progress_text.get_width()
-        bar_y = 165
-        pygame.draw.rect(screen, (50, 50, 50), (bar_x, bar_y, bar_width, 10))
-        fill_width = int(bar_width * (progress_percent / 100.0))
-        pygame.draw.rect(screen, (200, 200, 200), (bar_x, bar_y, fill_width, 10))
-        percent_text = font_small.render(f'{progress_percent:.0f}%', True, (200, 200, 200))
-        screen.blit(percent_text, (fill_width, bar_y - 25))
-
-        pygame.draw.rect(screen, (0, 255, 0), (620, 500 - int(throttle * 220), 10, int(throttle * 220)))
-        pygame.draw.rect(screen, (255, 0, 0), (400, 500 - int(brake * 220), 10, int(brake * 220)))
-
-        fill_width = int(TACH_WIDTH * rpm_ratio)
-        pygame.draw.rect(screen, (30, 30, 30), (TACH_X, TACH_Y, TACH_WIDTH, TACH_HEIGHT))
-        if fill_width > 0:
-            for x in range(TACH_X, TACH_X + fill_width):
-                segment_ratio = (x - TACH_X) / TACH_WIDTH
-                color = get_rpm_color(segment_ratio)
-                pygame.draw.line(screen, color, (x, TACH_Y), (x, TACH_Y + TACH_HEIGHT - 1), 1)
-
-        # TC and ABS
-        if tc_level < 0.1:
-            tc_color = (0, 255, 0)
-            tc_text_str = 'TC OFF'
-        elif tc_level < 0.5:
-            tc_color = (255, 200, 0)
-            tc_text_str = 'TC'
-        else:
-            tc_color = (255, 0, 0)
-            tc_text_str = 'TC !'
-        tc_indicator = font_medium.render(tc_text_str, True, tc_color)
-        screen.blit(tc_indicator, (10, 10))
-
-        if abs_level < 0.1:
-            abs_color = (0, 255, 0)
-            abs_text_str = 'ABS OFF'
-        else:
-            abs_color = (255, 0, 0)
-            abs_text_str = 'ABS !'
-        abs_indicator = font_medium.render(abs_text_str, True, abs_color)
-        screen.blit(abs_indicator, (10, 70))
-
-        # Damage bars
-        dmg_bar_x = right_x - 350
-        dmg_bar_y = 20 
-        pygame.draw.rect(screen, (40, 40, 40), (dmg_bar_x, dmg_bar_y, 350, 30))
-        eng_fill_w = int(350 * (engine_dmg / 100))
-        if eng_fill_w > 0:
-            pygame.draw.rect(screen, (255, 0, 0), (dmg_bar_x, dmg_bar_y, eng_fill_w, 30))
-        eng_pct = font_small.render(f'ENG {engine_dmg:.0f}%', True, (255, 0, 0))
-        screen.blit(eng_pct, (dmg_bar_x - eng_pct.get_width() - 10, dmg_bar_y))
-
-        tyre_bar_y = dmg_bar_y + 35 
-        pygame.draw.rect(screen, (40, 40, 40), (dmg_bar_x, tyre_bar_y, 350, 30))
-        tyre_fill_w = int(350 * (tyre_wear_avg / 100))
-        tyre_color = (255, 165, 0) if tyre_punctures == 0 else (255, 100, 0)
-        if tyre_fill_w > 0:
-            pygame.draw.rect(screen, tyre_color, (dmg_bar_x, tyre_bar_y, tyre_fill_w, 30))
-        punc_text = '!' * tyre_punctures
-        tyre_pct = font_small.render(f'TIRE {tyre_wear_avg:.0f}% {punc_text}', True, (255, 200, 10))
-        screen.blit(tyre_pct, (dmg_bar_x - tyre_pct.get_width() - 10, tyre_bar_y))
-
-        susp_bar_y = tyre_bar_y + 35 
-        pygame.draw.rect(screen, (40, 40, 40), (dmg_bar_x, susp_bar_y, 350, 30))
-        susp_fill_w = int(350 * (susp_dmg_max / 100))
-        if susp_fill_w > 0:
-            pygame.draw.rect(screen, (100, 150, 255), (dmg_bar_x, susp_bar_y, susp_fill_w, 30))
-        susp_pct = font_small.render(f'SUSP {susp_dmg_max:.0f}%', True, (150, 200, 255))
-        screen.blit(susp_pct, (dmg_bar_x - susp_pct.get_width() - 10, susp_bar_y))
+            idle_frames += 1
+
+        if wrc.ends != ends_seen:
+            ends_seen = wrc.ends
+            # Only a completed stage counts, not a retirement or disqualification
+            if not stage_submitted and pb_key is not None and wrc.finished():
+                stage_submitted = True
+                segments.finish(wrc.result_ms)
+                if recorder is not None:
+                    recorder.mark(time.perf_counter() - record_start, 'finish', -1, wrc.result_ms)
+                if trace_recorder.complete:
+                    pb_store.submit(pb_key, wrc.result_ms, trace_recorder.trace())
+
+        if detector.count != alerts_seen:
+            if recorder is not None:
+                # Every event since the last frame goes into the recording's index
+                events = tuple(detector.events)
+                for t, kind, wheel, value in events[len(events) - min(detector.count - alerts_seen, len(events)):]:
+                    recorder.mark(t - record_start, kind, wheel, value)
+            alerts_seen = detector.count
+            if show_alerts:
+                layout.show_alert(describe(detector.events[-1]))
+        layout.draw(frame)
 
     else:
         # Standby
-        screen.blit(font_large.render("Waiting for EA WRC telemetry...", True, (100, 100, 100)), (SCREEN_WIDTH//2 - 300, SCREEN_HEIGHT//2))
+        screen.blit(standby_text, (SCREEN_WIDTH//2 - 300, SCREEN_HEIGHT//2))
+        idle_frames += 1
+        profiler.lap('standby')
 
+    if show_cpu_usage:
+        cpu_limiter.draw(screen, layout.font_small, 10, 497)
+    profiler.draw(screen, layout.font_profile, 10, 10)
     pygame.display.flip()
+    profiler.lap('flip')
+    gc_policy.safe_point(idle_frames > refresh_rate)
+    governor.end_frame()
     clock.tick(refresh_rate)
-
+    cpu_limiter.throttle()
+    profiler.lap('wait')
+
+gc_policy.stop()
+ingest.stop()
+print(f'WRC packets: {wrc.counts}, {wrc.unknown} unknown, {wrc.invalid} with the wrong size')
+if web is not None:
+    web.stop()
+pb_store.close()
+if shift_store is not None:
+    shift_store.save()
+if recorder is not None:
+    recorder.close()
 sock.close()
 pygame.quit()
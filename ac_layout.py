@@ -0,0 +1,109 @@
+import ctypes
+import json
+import mmap
+import os
+
+import ac_numpy
+
+# The AC shared-memory pages are described in ac_layout.json, the same way the
+# WRC packets come from the game's channels.json and wrc.json. The ctypes
+# structures are generated from it at startup, so a new field is one line of
+# JSON and a different AC build or sim variant is a different layout file:
+#   "pages"     page name -> mmap tag, structure name and [name, type, count]
+#               fields in page order
+#   "channels"  TelemetryFrame attribute -> "page.field" it's read from; only
+#               these fields are touched per tick
+
+LAYOUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'ac_layout.json')
+
+CTYPES = {
+    'int8': ctypes.c_int8, 'uint8': ctypes.c_uint8,
+    'int16': ctypes.c_int16, 'uint16': ctypes.c_uint16,
+    'int32': ctypes.c_int32, 'uint32': ctypes.c_uint32,
+    'float32': ctypes.c_float, 'float64': ctypes.c_double,
+    'wchar': ctypes.c_wchar,
+}
+
+
+class AcLayout:
+    def __init__(self, path=LAYOUT_PATH):
+        with open(path, encoding='utf-8') as f:
+            schema = json.load(f)
+        self.path = path
+        self.channels = schema.get('channels', {})
+        self.pages = {}  # page name -> (mmap tag, structure)
+        for page, spec in schema['pages'].items():
+            fields = []
+            for field in spec['fields']:
+                name, type_name = field[0], field[1]
+                ctype = CTYPES[type_name]
+                if len(field) > 2:
+                    ctype = ctype * field[2]
+                fields.append((name, ctype))
+            structure = type(spec['structure'], (ctypes.Structure,),
+                             {'_pack_': schema.get('pack', 4), '_fields_': fields})
+            self.pages[page] = (spec['tagname'], structure)
+
+    def structure(self, page):
+        return self.pages[page][1]
+
+    def field(self, ref):
+        # 'physics.rpms' -> (page, ctypes type, offset, size)
+        page, name = ref.split('.')
+        structure = self.structure(page)
+        descriptor = getattr(structure, name)
+        return page, dict(structure._fields_)[name], descriptor.offset, descriptor.size
+
+
+_layouts = {}
+
+
+def load_layout(path=LAYOUT_PATH):
+    # One generated set of structures per layout file, so every importer
+    # shares the same classes
+    if path not in _layouts:
+        _layouts[path] = AcLayout(path)
+    return _layouts[path]
+
+
+class SimInfo:
+    def __init__(self, layout_path=LAYOUT_PATH):
+        self.layout = load_layout(layout_path)
+        self.physics = None
+        self.graphics = None
+        self.static = None
+        self.physics_np = None
+        self.graphics_np = None
+        self.wheels_np = None
+        try:
+            for page, (tagname, structure) in self.layout.pages.items():
+                setattr(self, '_' + page, mmap.mmap(-1, ctypes.sizeof(structure), tagname))
+            for page, (_, structure) in self.layout.pages.items():
+                setattr(self, page, structure.from_buffer(getattr(self, '_' + page)))
+
+            # Zero-copy NumPy views over the same pages, when numpy is installed
+            if ac_numpy.np is not None:
+                physics = self.layout.structure('physics')
+                self.physics_np = ac_numpy.page_view(self._physics, physics)
+                self.graphics_np = ac_numpy.page_view(self._graphics, self.layout.structure('graphics'))
+                self.wheels_np = ac_numpy.wheel_matrix(self._physics, physics)
+        except Exception:
+            pass # AC not running
+
+    def accessor(self, ref):
+        # A ctypes object pinned at one field of the live page: .value reads
+        # just that field's bytes, arrays index like the structure's do
+        page, ctype, offset, _ = self.layout.field(ref)
+        return ctype.from_buffer(getattr(self, '_' + page), offset)
+
+    def address(self, ref):
+        page, _, offset, size = self.layout.field(ref)
+        return ctypes.addressof(getattr(self, page)) + offset, size
+
+    def close(self):
+        for m in (getattr(self, '_' + page, None) for page in self.layout.pages):
+            if m:
+                try:
+                    m.close()
+                except:
+                    pass
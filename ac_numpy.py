@@ -0,0 +1,115 @@
+import ctypes
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:  # the dashboards run without it, they just don't get the views
+    np = None
+
+# Zero-copy NumPy views over the AC shared-memory pages. The dtypes are built
+# from the ctypes _fields_ (names, offsets and total size), so a view reads the
+# very bytes the ctypes structure does. Per-wheel channels come out as
+# float32[4] arrays, and the block of consecutive per-wheel channels as one
+# (channels, 4) matrix that a single assignment copies into a history buffer.
+
+# Consecutive float[4] fields of SPageFilePhysics, in page order
+WHEEL_FIELDS = (
+    'wheelSlip', 'wheelLoad', 'wheelsPressure', 'wheelAngularSpeed', 'tyreWear',
+    'tyreDirtyLevel', 'tyreCoreTemperature', 'camberRAD', 'suspensionTravel',
+)
+
+
+def _field_format(ctype):
+    if issubclass(ctype, ctypes.Array):
+        if ctype._type_ is ctypes.c_wchar:
+            # wchar_t is 2 bytes on Windows and 4 elsewhere, numpy's 'U' is
+            # always 4, so strings stay raw bytes; read them through ctypes
+            return f'V{ctypes.sizeof(ctype)}'
+        return (np.dtype(ctype._type_), (ctype._length_,))
+    return np.dtype(ctype)
+
+
+def structure_dtype(structure):
+    names, formats, offsets = [], [], []
+    for name, ctype in structure._fields_:
+        names.append(name)
+        formats.append(_field_format(ctype))
+        offsets.append(getattr(structure, name).offset)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets,
+                     'itemsize': ctypes.sizeof(structure)})
+
+
+def page_view(buffer, structure):
+    # One-record structured array over the page; view['tyreWear'][0] is a
+    # float32[4] view, not a copy
+    return np.frombuffer(buffer, dtype=structure_dtype(structure), count=1)
+
+
+def wheel_matrix(buffer, structure, fields=WHEEL_FIELDS):
+    # (len(fields), 4) float32 view over consecutive per-wheel fields
+    first = getattr(structure, fields[0])
+    for i, name in enumerate(fields):
+        f = getattr(structure, name)
+        if f.offset != first.offset + i * 16 or f.size != 16:
+            raise ValueError(f'{name} is not the next float[4] after {fields[i - 1]}')
+    return np.frombuffer(buffer, dtype=np.float32, count=4 * len(fields), offset=first.offset).reshape(len(fields), 4)
+
+
+def _benchmark(iterations=100000):
+    import mmap
+    from array import array
+    from ac_layout import load_layout
+
+    SPageFilePhysics = load_layout().structure('physics')
+    page = mmap.mmap(-1, ctypes.sizeof(SPageFilePhysics))
+    physics = SPageFilePhysics.from_buffer(page)
+    view = page_view(page, SPageFilePhysics)
+    wheels = wheel_matrix(page, SPageFilePhysics)
+    for k, name in enumerate(WHEEL_FIELDS):
+        for w in range(4):
+            getattr(physics, name)[w] = k * 10 + w + 0.5
+    assert view['tyreCoreTemperature'][0][2] == physics.tyreCoreTemperature[2]
+
+    rows = 1024
+    history = array('f', [0.0]) * (rows * 4 * len(WHEEL_FIELDS))
+    start = time.perf_counter()
+    for i in range(iterations):
+        base = (i % rows) * 4 * len(WHEEL_FIELDS)
+        for name in WHEEL_FIELDS:
+            values = getattr(physics, name)
+            for w in range(4):
+                history[base] = values[w]
+                base += 1
+    ctypes_copy = time.perf_counter() - start
+
+    np_history = np.zeros((rows, len(WHEEL_FIELDS), 4), dtype=np.float32)
+    start = time.perf_counter()
+    for i in range(iterations):
+        np_history[i % rows] = wheels
+    numpy_copy = time.perf_counter() - start
+    assert np_history[5, 4, 1] == physics.tyreWear[1]
+
+    means = array('f', [0.0]) * len(WHEEL_FIELDS)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for k, name in enumerate(WHEEL_FIELDS):
+            means[k] = sum(getattr(physics, name)) / 4
+    ctypes_mean = time.perf_counter() - start
+    np_means = np.zeros(len(WHEEL_FIELDS), dtype=np.float32)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        np.mean(wheels, axis=1, out=np_means)
+    numpy_mean = time.perf_counter() - start
+    assert abs(np_means[6] - means[6]) < 1e-4
+
+    print(f'copy {len(WHEEL_FIELDS)}x4 wheel channels into history: ctypes {ctypes_copy / iterations * 1e6:.2f} us, '
+          f'numpy view {numpy_copy / iterations * 1e6:.2f} us')
+    print(f'per-wheel mean of every wheel channel: ctypes {ctypes_mean / iterations * 1e6:.2f} us, '
+          f'numpy view {numpy_mean / iterations * 1e6:.2f} us')
+
+
+if __name__ == '__main__':
+    if np is None:
+        sys.exit('numpy is not installed')
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,172 @@
+import argparse
+import os
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from recorder import SessionReader
+
+# Run-vs-run comparison of recorded stages. Both runs are resampled onto one
+# distance grid with np.interp, so a 20-minute stage at full telemetry rate
+# aligns in a few milliseconds and a whole event's runs can be compared
+# against one reference in a single call:
+#   python compare_runs.py mine.simrec teammate.simrec [more.simrec ...] --png overlay.png
+
+STEP_M = 1.0
+SEGMENTS = 10
+TRACES = ('speed_kmh', 'throttle', 'brake')
+
+REFERENCE_COLOR = (255, 255, 255)
+RUN_COLORS = ((255, 165, 0), (100, 200, 255), (0, 255, 0), (255, 100, 100), (180, 0, 255))
+
+
+def load_stage(path, stage=None):
+    # Distance, stage time and traces of one stage of a recording, as
+    # memory-mapped columns. A recording can hold several stages, split where
+    # the stage timer goes backwards; the default is the longest one.
+    recording = SessionReader(path)
+    dtype = np.dtype([('t', '<f8')] + [(name, '<f4') for name in recording.channels])
+    records = np.memmap(path, dtype=dtype, mode='r', offset=recording.data_offset, shape=(recording.count,))
+    recording.close()
+    if not len(records):
+        raise ValueError(f'{path} has no records')
+
+    stage_ms = records['stage_time_ms']
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(stage_ms) < 0) + 1, [len(records)]))
+    if stage is None:
+        distance = records['stage_distance_m']
+        lengths = [distance[b - 1] - distance[a] for a, b in zip(starts[:-1], starts[1:])]
+        stage = int(np.argmax(lengths))
+    elif not 0 <= stage < len(starts) - 1:
+        raise ValueError(f'{path} has no stage {stage}, stages recorded: {len(starts) - 1}')
+    run = records[starts[stage]:starts[stage + 1]]
+
+    # np.interp wants non-decreasing positions; reversing or a reset blip
+    # would otherwise fold the run back on itself
+    distance = np.maximum.accumulate(run['stage_distance_m'].astype(np.float64))
+    distance -= distance[0]
+    columns = {'distance': distance, 'time_s': run['stage_time_ms'] / 1000.0}
+    for name in TRACES:
+        columns[name] = run[name]
+    return columns
+
+
+def align(reference, other, step_m=STEP_M):
+    # Both runs on a common distance grid; delta > 0 means `other` is behind
+    length = min(reference['distance'][-1], other['distance'][-1])
+    grid = np.arange(0.0, length, step_m)
+    aligned = {'distance': grid}
+    for key, run in (('ref', reference), ('run', other)):
+        for name in ('time_s',) + TRACES:
+            aligned[f'{key}_{name}'] = np.interp(grid, run['distance'], run[name])
+    aligned['delta_s'] = aligned['run_time_s'] - aligned['ref_time_s']
+    return aligned
+
+
+def segment_gains(aligned, segments=SEGMENTS):
+    # Time gained (< 0) or lost (> 0) in each equal-distance segment
+    grid = aligned['distance']
+    if not len(grid):
+        return np.zeros(0)
+    bounds = np.linspace(0.0, grid[-1], segments + 1)
+    delta_at = np.interp(bounds, grid, aligned['delta_s'])
+    return np.diff(delta_at)
+
+
+def render_overlay(path, alignments, names, size=(1200, 800)):
+    import pygame
+    pygame.font.init()
+    font = pygame.font.SysFont('arial', 16, bold=True)
+    width, height = size
+    surface = pygame.Surface(size)
+    surface.fill((0, 0, 0))
+    panels = [('delta_s', 'DELTA s'), ('speed_kmh', 'SPEED'), ('throttle', 'THROTTLE'), ('brake', 'BRAKE')]
+    panel_h = height // len(panels)
+    length = max(a['distance'][-1] for a in alignments if len(a['distance']))
+
+    def polyline(distance, values, low, high, top, color):
+        # One point per pixel column is all the resolution a PNG can show
+        columns = np.linspace(0, len(distance) - 1, min(len(distance), width)).astype(int)
+        xs = distance[columns] / length * (width - 1)
+        span = high - low if high > low else 1.0
+        ys = top + panel_h - 4 - (values[columns] - low) / span * (panel_h - 24)
+        if len(xs) > 1:
+            pygame.draw.lines(surface, color, False, np.column_stack((xs, ys)).tolist())
+
+    for p, (name, label) in enumerate(panels):
+        top = p * panel_h
+        pygame.draw.rect(surface, (60, 60, 60), (0, top, width, panel_h), 1)
+        surface.blit(font.render(label, True, (200, 200, 200)), (6, top + 4))
+        if name == 'delta_s':
+            high = max(float(np.abs(a['delta_s']).max()) for a in alignments if len(a['delta_s'])) or 1.0
+            low = -high
+            zero = top + panel_h - 4 - (0 - low) / (high - low) * (panel_h - 24)
+            pygame.draw.line(surface, (90, 90, 90), (0, zero), (width, zero))
+        else:
+            low = 0.0
+            high = max(float(max(a[f'ref_{name}'].max(), a[f'run_{name}'].max())) for a in alignments
+                       if len(a['distance'])) or 1.0
+        for i, a in enumerate(alignments):
+            if not len(a['distance']):
+                continue
+            color = RUN_COLORS[i % len(RUN_COLORS)]
+            if name == 'delta_s':
+                polyline(a['distance'], a['delta_s'], low, high, top, color)
+            else:
+                if i == 0:
+                    polyline(a['distance'], a[f'ref_{name}'], low, high, top, REFERENCE_COLOR)
+                polyline(a['distance'], a[f'run_{name}'], low, high, top, color)
+
+    x = width - 10
+    for i, name in reversed(list(enumerate(names))):
+        text = font.render(name, True, REFERENCE_COLOR if i == 0 else RUN_COLORS[(i - 1) % len(RUN_COLORS)])
+        x -= text.get_width()
+        surface.blit(text, (x, 4))
+        x -= 16
+    pygame.image.save(surface, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare recorded runs of a stage by distance')
+    parser.add_argument('reference')
+    parser.add_argument('runs', nargs='+')
+    parser.add_argument('--stage', type=int, help='stage index within each recording, default the longest')
+    parser.add_argument('--segments', type=int, default=SEGMENTS)
+    parser.add_argument('--step', type=float, default=STEP_M, help='distance grid step in metres')
+    parser.add_argument('--csv', help='write the aligned delta traces here')
+    parser.add_argument('--png', help='render the overlaid traces here')
+    args = parser.parse_args()
+    if np is None:
+        sys.exit('compare_runs needs numpy')
+
+    reference = load_stage(args.reference, args.stage)
+    alignments = []
+    for path in args.runs:
+        start = time.perf_counter()
+        aligned = align(reference, load_stage(path, args.stage), args.step)
+        gains = segment_gains(aligned, args.segments)
+        elapsed = (time.perf_counter() - start) * 1000
+        alignments.append(aligned)
+        total = aligned['delta_s'][-1] if len(aligned['delta_s']) else 0.0
+        print(f'{os.path.basename(path)}: {total:+.3f} s over {aligned["distance"][-1:].sum():.0f} m '
+              f'(aligned in {elapsed:.1f} ms)')
+        print('  segments ' + ' '.join(f'{g:+.3f}' for g in gains))
+
+    if args.csv:
+        columns = [alignments[0]['distance']] + [a['delta_s'] for a in alignments]
+        rows = min(len(c) for c in columns)
+        header = 'distance_m,' + ','.join(f'delta_s_{os.path.basename(p)}' for p in args.runs)
+        np.savetxt(args.csv, np.column_stack([c[:rows] for c in columns]), delimiter=',', header=header,
+                   comments='', fmt='%.4f')
+        print(f'{args.csv} written')
+    if args.png:
+        render_overlay(args.png, alignments, [os.path.basename(p) for p in [args.reference] + args.runs])
+        print(f'{args.png} written')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from recorder import SessionReader
+from session_index import SessionIndex, index_path
+
+# Team-wide index of recorded sessions. Every .simrec under a directory is
+# analysed once in a process pool and the results go into a small SQLite file
+# that can be queried by track, car and date:
+#   python corpus.py scan D:\recordings
+#   python corpus.py list --track arganil --car fiesta
+# A file is re-analysed only when its content hash or that of its .simidx
+# changes, since finishes and event counts come from the index; size and
+# mtimes are checked first so unchanged files are not even hashed. Bumping
+# ANALYSIS_VERSION re-runs the analysis on everything.
+
+ANALYSIS_VERSION = 2
+FINISH_PROGRESS = 0.999
+DEFAULT_DB = r"~\Documents\Sim-Dashboard\corpus.db"
+HASH_BLOCK = 1 << 20
+
+COLUMNS = (
+    ('path', 'TEXT PRIMARY KEY'), ('size', 'INTEGER'), ('mtime', 'REAL'), ('hash', 'TEXT'),
+    ('index_mtime', 'REAL'), ('index_hash', 'TEXT'),
+    ('version', 'INTEGER'), ('sim', 'TEXT'), ('track', 'TEXT'), ('car', 'TEXT'), ('started', 'REAL'),
+    ('records', 'INTEGER'), ('duration_s', 'REAL'), ('distance_m', 'REAL'), ('stages', 'INTEGER'),
+    ('finished', 'INTEGER'), ('best_ms', 'INTEGER'), ('top_speed_kmh', 'REAL'), ('mean_speed_kmh', 'REAL'),
+    ('full_throttle_pct', 'REAL'), ('braking_pct', 'REAL'), ('fuel_used', 'REAL'), ('max_damage', 'REAL'),
+    ('events', 'TEXT'),
+)
+NAMES = tuple(name for name, _ in COLUMNS)
+
+
+def file_hash(path):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        while block := f.read(HASH_BLOCK):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_mtime(path):
+    # 0 when the recording has no index
+    try:
+        return os.stat(index_path(path)).st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def file_hashes(path):
+    # Content hashes of the recording and its index, '' for a missing index
+    return file_hash(path), file_hash(index_path(path)) if os.path.exists(index_path(path)) else ''
+
+
+def analyse(path, digests=None):
+    # One session's metadata and statistics, vectorised over the whole file
+    recording = SessionReader(path)
+    header = recording.header
+    dtype = np.dtype([('t', '<f8')] + [(name, '<f4') for name in recording.channels])
+    records = np.memmap(path, dtype=dtype, mode='r', offset=recording.data_offset, shape=(recording.count,))
+    recording.close()
+    stat = os.stat(path)
+    digest, index_digest = digests or file_hashes(path)
+    row = {'path': path, 'size': stat.st_size, 'mtime': stat.st_mtime, 'hash': digest,
+           'index_mtime': index_mtime(path), 'index_hash': index_digest, 'version': ANALYSIS_VERSION, 'sim': header.get('sim', ''), 'track': header.get('track', ''),
+           'car': header.get('car', ''), 'started': header.get('started', 0.0), 'records': len(records),
+           'duration_s': 0.0, 'distance_m': 0.0, 'stages': 0, 'finished': 0, 'best_ms': 0,
+           'top_speed_kmh': 0.0, 'mean_speed_kmh': 0.0, 'full_throttle_pct': 0.0, 'braking_pct': 0.0,
+           'fuel_used': 0.0, 'max_damage': 0.0, 'events': '{}'}
+    if not len(records):
+        return row
+
+    t = records['t']
+    stage_ms = records['stage_time_ms']
+    speed = records['speed_kmh']
+    row['duration_s'] = float(t[-1] - t[0])
+    # Stages split where the stage timer goes backwards, like compare_runs
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(stage_ms) < 0) + 1, [len(records)]))
+    distance = records['stage_distance_m']
+    row['distance_m'] = float(sum(distance[b - 1] - distance[a] for a, b in zip(starts[:-1], starts[1:])))
+    row['stages'] = len(starts) - 1
+    # Finishes are the index's finish markers, which the dashboards write for AC's lap count and
+    # WRC's session_end alike. Without any, a finish bumps the completed-lap count or, as WRC
+    # never does, takes the progress to the end; its time is where the timer stood just before
+    index = SessionIndex(index_path(path)) if os.path.exists(index_path(path)) else None
+    marked = index.find('finish') if index is not None else []
+    if marked:
+        times = np.array([value for _, _, _, _, value in marked])
+    else:
+        finishes = np.flatnonzero(np.diff(records['laps']) > 0)
+        if not len(finishes):
+            progress = records['stage_progress']
+            finishes = np.flatnonzero((progress[1:] >= FINISH_PROGRESS) & (progress[:-1] < FINISH_PROGRESS)) + 1
+        times = stage_ms[finishes]
+    times = times[times > 0]
+    row['finished'] = len(times)
+    row['best_ms'] = int(times.min()) if len(times) else 0
+
+    moving = speed > 5
+    row['top_speed_kmh'] = float(speed.max())
+    row['mean_speed_kmh'] = float(speed[moving].mean()) if moving.any() else 0.0
+    row['full_throttle_pct'] = float((records['throttle'][moving] > 0.98).mean() * 100) if moving.any() else 0.0
+    row['braking_pct'] = float((records['brake'][moving] > 0.05).mean() * 100) if moving.any() else 0.0
+    fuel = records['fuel']
+    # Refuels between stages would count as negative use, only drops add up
+    row['fuel_used'] = float(-np.diff(fuel)[np.diff(fuel) < 0].sum())
+    row['max_damage'] = float(max(records['engine_damage'].max(), records['suspension_damage'].max()))
+
+    if index is not None:
+        counts = {}
+        for _, _, kind, _, _ in index.find():
+            if kind not in ('stage_start', 'finish'):
+                counts[kind] = counts.get(kind, 0) + 1
+        row['events'] = json.dumps(counts, sort_keys=True)
+    return row
+
+
+def _analyse_job(job):
+    path, digests = job
+    try:
+        return analyse(path, digests)
+    except (ValueError, OSError) as e:
+        print(f'{path}: skipped, {e}')
+        return None
+
+
+class Corpus:
+    def __init__(self, path=DEFAULT_DB):
+        self.path = os.path.expanduser(path)
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.execute(f'CREATE TABLE IF NOT EXISTS sessions ({", ".join(f"{n} {t}" for n, t in COLUMNS)})')
+        existing = [row[1] for row in self.db.execute('PRAGMA table_info(sessions)')]
+        for name, kind in COLUMNS:
+            if name not in existing:
+                self.db.execute(f'ALTER TABLE sessions ADD COLUMN {name} {kind}')
+        self.db.execute('CREATE INDEX IF NOT EXISTS sessions_track_car ON sessions (track, car)')
+
+    def close(self):
+        self.db.close()
+
+    def stale(self, paths):
+        # The paths whose size or mtime, or their .simidx's mtime, differ from the
+        # database; the hashes decide later
+        known = {path: key for path, *key in
+                 self.db.execute('SELECT path, size, mtime, index_mtime, version FROM sessions')}
+        stale = []
+        for path in paths:
+            stat = os.stat(path)
+            if known.get(path) != [stat.st_size, stat.st_mtime, index_mtime(path), ANALYSIS_VERSION]:
+                stale.append(path)
+        return stale
+
+    def scan(self, directory, workers=None):
+        # One spelling per file, so the same recording reached through a relative
+        # path or a symlink is not indexed twice
+        directory = os.path.realpath(os.path.expanduser(directory))
+        paths = sorted(os.path.join(root, name) for root, _, names in os.walk(directory)
+                       for name in names if name.endswith('.simrec'))
+        stale = self.stale(paths)
+        hashes = {path: (digest, index_digest) for path, digest, index_digest in self.db.execute(
+            'SELECT path, hash, index_hash FROM sessions WHERE version = ?', (ANALYSIS_VERSION,))}
+        touched = analysed = 0
+        if stale:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Hashing is the cheap half; same content only needs the new mtimes
+                changed = []
+                for path, digests in zip(stale, pool.map(file_hashes, stale)):
+                    if hashes.get(path) == digests:
+                        stat = os.stat(path)
+                        self.db.execute('UPDATE sessions SET size = ?, mtime = ?, index_mtime = ? WHERE path = ?',
+                                        (stat.st_size, stat.st_mtime, index_mtime(path), path))
+                        touched += 1
+                    else:
+                        changed.append((path, digests))
+                for row in pool.map(_analyse_job, changed):
+                    if row is not None:
+                        self.db.execute(f'INSERT OR REPLACE INTO sessions ({", ".join(NAMES)}) '
+                                        f'VALUES ({", ".join("?" * len(NAMES))})', [row[name] for name in NAMES])
+                        analysed += 1
+        # Sessions whose recording is gone, only under this directory: the
+        # trailing separator keeps D:\runs from claiming D:\runs2
+        present = set(paths)
+        prefix = os.path.join(directory, '')
+        removed = [path for (path,) in self.db.execute('SELECT path FROM sessions')
+                   if path.startswith(prefix) and path not in present]
+        self.db.executemany('DELETE FROM sessions WHERE path = ?', [(path,) for path in removed])
+        self.db.commit()
+        return len(paths), analysed, touched, len(removed)
+
+    def query(self, track=None, car=None, sim=None):
+        where, args = [], []
+        for column, value in (('track', track), ('car', car), ('sim', sim)):
+            if value:
+                where.append(f'{column} LIKE ?')
+                args.append(f'%{value}%')
+        sql = f'SELECT {", ".join(NAMES)} FROM sessions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY track, car, best_ms = 0, best_ms, started'
+        return [dict(zip(NAMES, row)) for row in self.db.execute(sql, args)]
+
+
+def format_time(ms):
+    if ms <= 0:
+        return '--:--.---'
+    return f'{ms // 60000}:{(ms // 1000) % 60:02}.{ms % 1000:03}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Index and query a directory of session recordings')
+    parser.add_argument('--db', default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest='command', required=True)
+    scan = commands.add_parser('scan', help='analyse new and changed recordings')
+    scan.add_argument('directory')
+    scan.add_argument('-j', '--workers', type=int, help='processes, defaults to every core')
+    listing = commands.add_parser('list', help='list indexed sessions')
+    listing.add_argument('--track')
+    listing.add_argument('--car')
+    listing.add_argument('--sim')
+    args = parser.parse_args()
+    if np is None:
+        sys.exit('corpus needs numpy')
+
+    corpus = Corpus(args.db)
+    if args.command == 'scan':
+        start = time.perf_counter()
+        found, analysed, touched, removed = corpus.scan(args.directory, args.workers)
+        print(f'{found} recordings: {analysed} analysed, {touched} unchanged but touched, '
+              f'{found - analysed - touched} cached, {removed} removed ({time.perf_counter() - start:.1f} s)')
+    else:
+        for row in corpus.query(args.track, args.car, args.sim):
+            started = time.strftime('%Y-%m-%d %H:%M', time.localtime(row['started']))
+            print(f'{started}  {row["sim"]:4} {row["track"][:24]:24} {row["car"][:24]:24} '
+                  f'best {format_time(row["best_ms"])}  {row["finished"]}/{row["stages"]} stages  '
+                  f'{row["distance_m"] / 1000:7.1f} km  top {row["top_speed_kmh"]:5.0f} km/h  '
+                  f'{row["full_throttle_pct"]:3.0f}% flat  {row["events"]}')
+    corpus.close()
+
+
+if __name__ == '__main__':
+    main()
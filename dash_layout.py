@@ -0,0 +1,469 @@
+import pygame
+
+from splits import draw_segment_bar
+
+# Shared screen layout for the Rallye dashboards, drawn from a TelemetryFrame.
+# Colours, rects, static labels and the tach gradients are built once. Text is
+# rendered once per distinct value and cached per widget, so a frame whose
+# values haven't changed draws without rendering or allocating anything.
+# With a FrameGovernor, the low-rate widgets (TIERED) are drawn first on the
+# cleared screen when due and their area is copied; in between, the copy is
+# blitted back as is, there is nothing under it yet to cover.
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+LABEL = (200, 200, 200)
+MUTED = (150, 150, 150)
+STANDBY = (100, 100, 100)
+GREEN = (0, 255, 0)
+RED = (255, 0, 0)
+YELLOW = (255, 255, 0)
+AMBER = (255, 200, 0)
+SLOWER = (255, 100, 100)
+ESTIMATE = (100, 200, 255)
+THEORETICAL = (180, 0, 255)
+TYRE = (255, 165, 0)
+TYRE_PUNCTURED = (255, 100, 0)
+TYRE_TEXT = (255, 200, 10)
+FUEL = (0, 130, 255)
+FUEL_TEXT = (100, 200, 255)
+SUSPENSION = (100, 150, 255)
+SUSPENSION_TEXT = (150, 200, 255)
+BAR_BACKGROUND = (40, 40, 40)
+PROGRESS_BACKGROUND = (50, 50, 50)
+TACH_BACKGROUND = (30, 30, 30)
+ALERT = (255, 60, 60)
+
+TACH_HEIGHT = 80
+DAMAGE_BAR_WIDTH = 350
+DAMAGE_BAR_HEIGHT = 24
+TEXT_CACHE_LIMIT = 256
+ALERT_MS = 2000
+TIERED = ('estimate', 'segments', 'progress', 'damage', 'map', 'tyres')  # names widget_rates can slow down
+# Stage map and tyre panel, between the TC/ABS labels (to about x 275 in Arial)
+# and the damage labels (from about x 515) on a 1024 wide screen
+PANEL_RECT = (285, 6, 225, 128)
+
+
+def format_time(ms):
+    if ms <= 0:
+        return '--:--.---'
+    minutes = ms // 60000
+    seconds = (ms // 1000) % 60
+    millis = ms % 1000
+    return f'{minutes}:{seconds:02}.{millis:03}'
+
+def format_delta(ms):
+    if ms == 0:
+        return '+0.000'
+    sign = '+' if ms > 0 else '-'
+    abs_ms = abs(ms)
+    minutes = abs_ms // 60000
+    seconds = (abs_ms // 1000) % 60
+    millis = abs_ms % 1000
+    if minutes > 0:
+        return f'{sign}{minutes}:{seconds:02}.{millis:03}'
+    else:
+        return f'{sign}{seconds}.{millis:03}'
+
+def delta_color(ms):
+    return GREEN if ms < 0 else YELLOW if ms == 0 else SLOWER
+
+def wear_end_key(frame):
+    # Projected end-of-stage wear per wheel packed into one int (7 bits each),
+    # or the average alone (bit 28) when the sim only reports that; -1 = not known
+    end = frame.tyre_wear_end
+    wear = frame.tyre_wear
+    if end[0] >= 0 and (wear[0] or wear[1] or wear[2] or wear[3]):
+        key = 0
+        for w in range(4):
+            value = round(end[w])
+            key = (key << 7) | (0 if value < 0 else 127 if value > 127 else value)
+        return key
+    if frame.tyre_wear_avg_end >= 0:
+        return (1 << 28) | min(round(frame.tyre_wear_avg_end), 1000)
+    return -1
+
+def format_wear_end(key):
+    if key < 0:
+        return ''
+    if key >> 28:
+        return f'END {key & 0xffff}%'
+    return 'END ' + ' '.join(str((key >> shift) & 127) for shift in (21, 14, 7, 0))
+
+def get_rpm_color(rpm_ratio, shift_ratio=0.95):
+    # Green to yellow, then to red just before the shift point
+    yellow = shift_ratio - 0.25
+    red = shift_ratio - 0.05
+    if rpm_ratio < yellow:
+        g = 255
+        r = int(255 * (rpm_ratio / yellow))
+        b = 0
+    elif rpm_ratio < red:
+        r = 255
+        g = int(255 * (1 - (rpm_ratio - yellow) / ((red - yellow) * 1.625)))
+        b = 0
+    else:
+        r = 255
+        g = max(0, int(100 * (1 - (rpm_ratio - red) / (1 - red))))
+        b = 0
+    return (r, g, b)
+
+
+class TextCache:
+    # Surfaces keyed by the int (or None) they show; cleared when full so a
+    # ticking value can't grow it without bound
+    def __init__(self, render, limit=TEXT_CACHE_LIMIT):
+        self.render = render
+        self.limit = limit
+        self.surfaces = {}
+
+    def get(self, key):
+        surface = self.surfaces.get(key)
+        if surface is None:
+            if len(self.surfaces) >= self.limit:
+                self.surfaces.clear()
+            surface = self.surfaces[key] = self.render(key)
+        return surface
+
+
+class DashLayout:
+    def __init__(self, screen, freedom_units, segments, traces=None, profiler=None, track_map=None, governor=None,
+                 tyre_panel=None):
+        self.screen = screen
+        self.width, self.height = screen.get_size()
+        self.freedom_units = freedom_units
+        self.segments = segments
+        self.traces = traces
+        self.profiler = profiler
+        self.track_map = track_map
+        self.tyre_panel = tyre_panel
+        self.governor = governor
+        if governor is not None:
+            for name in governor.intervals:
+                if name not in TIERED:
+                    raise ValueError(f'widget_rates: {name} always draws every frame, '
+                                     f'only {", ".join(TIERED)} can be slowed down')
+        # Millisecond clock for the gear flash and alert timeout; offline
+        # renderers replace it with the recording's time
+        self.ticks = pygame.time.get_ticks
+
+        self.font_super_large = pygame.font.SysFont('arial', 300, bold=True)
+        self.font_large = pygame.font.SysFont('arial', 120, bold=True)
+        self.font_medium_large = pygame.font.SysFont('arial', 85, bold=True)
+        self.font_medium = pygame.font.SysFont('arial', 60, bold=True)
+        self.font_medium_small = pygame.font.SysFont('arial', 35, bold=True)
+        self.font_small = pygame.font.SysFont('arial', 20, bold=True)
+        self.font_profile = pygame.font.SysFont('consolas', 16)
+        large, medium_large, medium_small, small = (self.font_large, self.font_medium_large,
+                                                    self.font_medium_small, self.font_small)
+        dist_units = 'Mi' if freedom_units else 'KM'
+
+        # Per-widget text caches
+        self.speed_text = TextCache(lambda v: large.render(str(v), True, WHITE))
+        self.rpm_text = TextCache(lambda v: large.render(str(v), True, WHITE))
+        # key = gear * 2 + flash
+        self.gear_text = TextCache(lambda key: self.font_super_large.render(
+            'R' if key >> 1 == -1 else 'N' if key >> 1 == 0 else str(key >> 1), True, RED if key & 1 else WHITE))
+        self.current_text = TextCache(lambda ms: medium_large.render(format_time(ms), True, WHITE), 64)
+        self.delta_text = TextCache(lambda ms: medium_large.render('+--.---', True, MUTED) if ms is None
+                                    else medium_large.render(format_delta(ms), True, delta_color(ms)), 64)
+        self.estimate_text = TextCache(lambda ms: medium_large.render(format_time(ms), True, ESTIMATE), 64)
+        self.theo_text = TextCache(lambda ms: small.render(f'THEO {format_time(ms)}', True,
+                                                           THEORETICAL if ms > 0 else MUTED))
+        self.segment_label = TextCache(lambda i: small.render(f'S{i}', True, LABEL))
+        self.segment_delta = TextCache(lambda ms: small.render('+--.---', True, MUTED) if ms is None
+                                       else small.render(format_delta(ms), True, delta_color(ms)), 64)
+        # key = distance in hundredths of the display unit
+        self.distance_text = TextCache(lambda d: medium_small.render(f'{d / 100:.2f} {dist_units}', True, WHITE))
+        self.percent_text = TextCache(lambda p: small.render(f'{p}%', True, LABEL))
+        self.engine_text = TextCache(lambda p: small.render(f'ENG {p}%', True, RED))
+        # key = wear * 8 + tyres out
+        self.tyre_text = TextCache(lambda key: small.render(f'TIRE {key >> 3}% {"!" * (key & 7)}', True, TYRE_TEXT))
+        self.susp_text = TextCache(lambda p: small.render(f'SUSP {p}%', True, SUSPENSION_TEXT))
+        # key = fuel range in tenths of the display unit, laps in tenths, -1 = not known
+        self.fuel_text = TextCache(lambda d: small.render(f'FUEL {d / 10:.1f} {dist_units.upper()}' if d >= 0
+                                                          else 'FUEL --', True, FUEL_TEXT))
+        self.fuel_laps_text = TextCache(lambda laps: small.render(f'{laps / 10:.1f} LAPS' if laps >= 0 else '',
+                                                                  True, WHITE))
+        self.wear_end_text = TextCache(lambda key: small.render(format_wear_end(key), True, WHITE))
+
+        # Static labels
+        self.speed_unit = medium_small.render('MPH' if freedom_units else 'KPH', True, LABEL)
+        self.rpm_label = medium_small.render('RPM', True, LABEL)
+        self.current_label = small.render('CURRENT STAGE', True, LABEL)
+        self.estimate_label = small.render('ESTIMATED STAGE', True, ESTIMATE)
+        self.tc_off = self.font_medium.render('TC OFF', True, GREEN)
+        self.tc_on = self.font_medium.render('TC', True, AMBER)
+        self.tc_high = self.font_medium.render('TC !', True, RED)
+        self.abs_off = self.font_medium.render('ABS OFF', True, GREEN)
+        self.abs_on = self.font_medium.render('ABS !', True, RED)
+
+        # Positions and bars, mutated in place while drawing
+        w, h = self.width, self.height
+        right_x = w - 10
+        self.right_x = right_x
+        self.speed_pos = pygame.Rect(10, 255, 0, 0)
+        self.speed_unit_pos = pygame.Rect(0, 305, 0, 0)
+        self.rpm_pos = pygame.Rect(10, 380, 0, 0)
+        self.rpm_label_pos = pygame.Rect(0, 430, 0, 0)
+        self.gear_pos = pygame.Rect(0, h // 2 - 75, 0, 0)
+        self.current_pos = pygame.Rect(0, 280, 0, 0)
+        self.current_label_pos = pygame.Rect(right_x - 250, 260, 0, 0)
+        self.delta_pos = pygame.Rect(0, 180, 0, 0)
+        self.estimate_pos = pygame.Rect(0, 400, 0, 0)
+        self.estimate_label_pos = pygame.Rect(right_x - 250, 380, 0, 0)
+        self.theo_pos = pygame.Rect(0, 497, 0, 0)
+        self.segment_label_pos = pygame.Rect(0, 497, 0, 0)
+        self.segment_delta_pos = pygame.Rect(0, 497, 0, 0)
+        self.distance_pos = pygame.Rect(0, 150, 0, 0)
+        self.progress_bar = pygame.Rect(0, 165, 0, 10)
+        self.progress_fill = pygame.Rect(0, 165, 0, 10)
+        self.percent_pos = pygame.Rect(0, 140, 0, 0)
+        self.throttle_bar = pygame.Rect(620, 500, 10, 0)
+        self.brake_bar = pygame.Rect(400, 500, 10, 0)
+        self.tc_pos = pygame.Rect(10, 10, 0, 0)
+        self.abs_pos = pygame.Rect(10, 70, 0, 0)
+        dmg_bar_x = right_x - DAMAGE_BAR_WIDTH
+        self.damage_bars = tuple(pygame.Rect(dmg_bar_x, y, DAMAGE_BAR_WIDTH, DAMAGE_BAR_HEIGHT)
+                                 for y in (12, 40, 68, 96))
+        self.damage_fill = pygame.Rect(dmg_bar_x, 0, 0, DAMAGE_BAR_HEIGHT)
+        self.note_pos = pygame.Rect(0, 0, 0, 0)
+        self.damage_text_pos = pygame.Rect(0, 0, 0, 0)
+        self.alert = None
+        self.alert_until = 0
+        self.alert_centre = (200 + dmg_bar_x - 120) // 2
+        self.alert_pos = pygame.Rect(0, 20, 0, 0)
+
+        # The tach is a gradient rendered once per shift point (in hundredths
+        # of max rpm, so a handful per car); each frame blits the lit part of
+        # it instead of drawing a line per pixel column
+        self.tach_pos = pygame.Rect(0, h - TACH_HEIGHT, w, TACH_HEIGHT)
+        self.tach_area = pygame.Rect(0, 0, 0, TACH_HEIGHT)
+        self.tach_gradients = TextCache(self._tach_gradient, 32)
+        self.tach_gradients.get(95)
+
+        # Low-rate widgets: (name, area, draw, copy of the area); the map
+        # covers its area and is replayed where it's drawn, the rest first
+        self.copied = set()
+        self.tiered = []
+        for name, area, draw in (
+                ('estimate', (right_x - 430, 380, 430, 110), self._draw_estimate),
+                ('segments', (right_x - 470, 490, 470, 30), self._draw_segments),
+                ('progress', (0, 138, w, 54), self._draw_progress),
+                ('damage', (dmg_bar_x - 160, 12, DAMAGE_BAR_WIDTH + 160, 108), self._draw_damage)):
+            self.tiered.append((name, pygame.Rect(area), draw, pygame.Surface(area[2:])))
+        self.tiered = tuple(self.tiered)
+        # The stage map and the tyre panel share the centre, toggle_panel() swaps them
+        self.panels = tuple((name, panel, pygame.Surface(panel.rect.size))
+                            for name, panel in (('map', track_map), ('tyres', tyre_panel)) if panel is not None)
+        self.panel = 0
+        self._show_panel()
+        # Other fonts or screen sizes can leave less room than PANEL_RECT expects
+        left = self.tc_pos.x + max(label.get_width() for label in (self.tc_off, self.tc_on, self.tc_high,
+                                                                     self.abs_off, self.abs_on))
+        right = dmg_bar_x - 10 - max(self.fuel_text.get(9999).get_width(), self.tyre_text.get(100 * 8 + 4).get_width(),
+                                     self.engine_text.get(100).get_width(), self.susp_text.get(100).get_width())
+        for name, panel, _ in self.panels:
+            if panel.rect.left < left or panel.rect.right > right:
+                print(f'The {name} panel at x {panel.rect.left} to {panel.rect.right} overlaps the labels, '
+                      f'x {left} to {right} is free')
+
+    def draw(self, frame):
+        screen = self.screen
+        profiler = self.profiler
+        right_x = self.right_x
+        rpm_ratio = frame.rpm_ratio
+
+        # Low-rate widgets, before anything else is on the screen
+        for name, area, draw, copy in self.tiered:
+            self._tiered(name, area, draw, copy, frame)
+            profiler.lap(name)
+
+        # Speed
+        text = self.speed_text.get(int(frame.speed_display))
+        screen.blit(text, self.speed_pos)
+        self.speed_unit_pos.x = 20 + text.get_width()
+        screen.blit(self.speed_unit, self.speed_unit_pos)
+        profiler.lap('speed')
+
+        # RPM
+        text = self.rpm_text.get(int(frame.rpm))
+        screen.blit(text, self.rpm_pos)
+        self.rpm_label_pos.x = 20 + text.get_width()
+        screen.blit(self.rpm_label, self.rpm_label_pos)
+        profiler.lap('rpm')
+
+        # Gear
+        gear = frame.gear
+        flash = gear == -1 or (frame.shift_light and (self.ticks() // 75) % 2 == 1)
+        text = self.gear_text.get(gear * 2 + (1 if flash else 0))
+        self.gear_pos.x = self.width // 2 - text.get_width() // 2
+        screen.blit(text, self.gear_pos)
+        profiler.lap('gear')
+
+        # Times
+        text = self.current_text.get(frame.current_ms)
+        self.current_pos.x = right_x - text.get_width()
+        screen.blit(text, self.current_pos)
+        screen.blit(self.current_label, self.current_label_pos)
+
+        text = self.delta_text.get(frame.delta_ms if frame.delta_valid else None)
+        self.delta_pos.x = self.width // 2 - text.get_width() // 2
+        screen.blit(text, self.delta_pos)
+        profiler.lap('times')
+
+        # Input pos bars
+        bar = self.throttle_bar
+        bar.height = int(frame.throttle * 220)
+        bar.y = 500 - bar.height
+        pygame.draw.rect(screen, GREEN, bar)
+        bar = self.brake_bar
+        bar.height = int(frame.brake * 220)
+        bar.y = 500 - bar.height
+        pygame.draw.rect(screen, RED, bar)
+        profiler.lap('inputs')
+
+        # Input traces
+        if self.traces is not None:
+            self.traces.push_frame(frame)
+            self.traces.draw(screen, self.font_small)
+            profiler.lap('traces')
+
+        # RPM bar
+        pygame.draw.rect(screen, TACH_BACKGROUND, self.tach_pos)
+        self.tach_area.width = int(self.width * rpm_ratio)
+        if self.tach_area.width > 0:
+            screen.blit(self.tach_gradients.get(round(frame.shift_ratio * 100)), self.tach_pos, self.tach_area)
+        profiler.lap('tach')
+
+        # TC and ABS
+        tc = frame.tc
+        screen.blit(self.tc_off if tc < 0.1 else self.tc_on if tc < 0.5 else self.tc_high, self.tc_pos)
+        screen.blit(self.abs_off if frame.abs < 0.1 else self.abs_on, self.abs_pos)
+        profiler.lap('tc/abs')
+
+        # Stage map or tyre panel, under the alert; the map has nothing to copy until it has an outline
+        if self.panels:
+            name, panel, copy = self.panels[self.panel]
+            if name != 'map' or panel.background is not None:
+                self._tiered(name, panel.rect, panel.draw, copy, frame)
+                profiler.lap(name)
+
+        # Detector alert
+        if self.alert is not None:
+            if self.ticks() < self.alert_until:
+                screen.blit(self.alert, self.alert_pos)
+            else:
+                self.alert = None
+            profiler.lap('alerts')
+
+    def _tiered(self, name, area, draw, copy, frame):
+        governor = self.governor
+        if governor is None:
+            draw(self.screen, frame)
+        elif governor.due(name) or name not in self.copied:
+            draw(self.screen, frame)
+            copy.blit(self.screen, (0, 0), area)
+            self.copied.add(name)
+        else:
+            self.screen.blit(copy, area)
+
+    def _draw_estimate(self, screen, frame):
+        text = self.estimate_text.get(frame.estimated_ms)
+        self.estimate_pos.x = self.right_x - text.get_width()
+        screen.blit(text, self.estimate_pos)
+        screen.blit(self.estimate_label, self.estimate_label_pos)
+
+    def _draw_segments(self, screen, frame):
+        # Segment delta and theoretical best
+        right_x = self.right_x
+        segments = self.segments
+        theo = self.theo_text.get(segments.theoretical_best_ms if segments.theoretical_best_valid() else 0)
+        self.theo_pos.x = right_x - theo.get_width()
+        screen.blit(theo, self.theo_pos)
+        if segments.live_valid:
+            label = self.segment_label.get(segments.index + 1)
+            text = self.segment_delta.get(segments.live_delta_ms)
+        else:
+            index = segments.index + 1
+            label = self.segment_label.get(index if index < segments.segment_count else segments.segment_count)
+            text = self.segment_delta.get(None)
+        self.segment_delta_pos.x = self.theo_pos.x - text.get_width() - 20
+        screen.blit(text, self.segment_delta_pos)
+        self.segment_label_pos.x = self.segment_delta_pos.x - label.get_width() - 6
+        screen.blit(label, self.segment_label_pos)
+
+    def _draw_progress(self, screen, frame):
+        # Stage progress
+        text = self.distance_text.get(round(frame.distance_display * 100))
+        self.distance_pos.x = self.right_x - text.get_width()
+        screen.blit(text, self.distance_pos)
+
+        bar = self.progress_bar
+        bar.width = self.width - 30 - text.get_width()
+        bar.x = self.width - bar.width - 20 - text.get_width()
+        pygame.draw.rect(screen, PROGRESS_BACKGROUND, bar)
+        fill = self.progress_fill
+        fill.x = bar.x
+        fill.width = int(bar.width * (frame.progress_percent / 100.0))
+        pygame.draw.rect(screen, LABEL, fill)
+        draw_segment_bar(screen, self.segments, bar.x, bar.y, bar.width, bar.height)
+        self.percent_pos.x = fill.width
+        screen.blit(self.percent_text.get(round(frame.progress_percent)), self.percent_pos)
+
+    def _draw_damage(self, screen, frame):
+        # Engine, tyre, suspension and fuel bars, with the predictions inside
+        tyres_out = frame.tyres_out
+        self._damage_bar(0, frame.engine_dmg, RED, self.engine_text.get(round(frame.engine_dmg)))
+        self._damage_bar(1, frame.tyre_wear_avg, TYRE if tyres_out == 0 else TYRE_PUNCTURED,
+                         self.tyre_text.get(round(frame.tyre_wear_avg) * 8 + (tyres_out & 7)))
+        self._bar_note(1, self.wear_end_text.get(wear_end_key(frame)))
+        self._damage_bar(2, frame.susp_dmg_max, SUSPENSION, self.susp_text.get(round(frame.susp_dmg_max)))
+        fuel_range = frame.fuel_range_display
+        self._damage_bar(3, frame.fuel / frame.max_fuel * 100 if frame.max_fuel > 0 else 0, FUEL,
+                         self.fuel_text.get(round(fuel_range * 10) if fuel_range >= 0 else -1))
+        self._bar_note(3, self.fuel_laps_text.get(round(frame.fuel_laps * 10) if frame.fuel_laps >= 0 else -1))
+
+    def _tach_gradient(self, shift_percent):
+        w = self.width
+        tach = pygame.Surface((w, TACH_HEIGHT))
+        for x in range(w):
+            pygame.draw.line(tach, get_rpm_color(x / w, shift_percent / 100), (x, 0), (x, TACH_HEIGHT - 1), 1)
+        return tach
+
+    def toggle_panel(self):
+        if self.panels:
+            self.panel = (self.panel + 1) % len(self.panels)
+            self.copied.discard(self.panels[self.panel][0])  # its copy is from when it was last shown
+            self._show_panel()
+
+    def _show_panel(self):
+        # The tyre panel only aggregates while it is on screen
+        if self.tyre_panel is not None:
+            self.tyre_panel.aggregator.set_active(self.panels[self.panel][0] == 'tyres')
+
+    def show_alert(self, text):
+        self.alert = self.font_medium_small.render(text, True, ALERT)
+        self.alert_until = self.ticks() + ALERT_MS
+        self.alert_pos.x = self.alert_centre - self.alert.get_width() // 2
+
+    def _bar_note(self, row, text):
+        bar = self.damage_bars[row]
+        pos = self.note_pos
+        pos.x = bar.right - text.get_width() - 6
+        pos.y = bar.y
+        self.screen.blit(text, pos)
+
+    def _damage_bar(self, row, percent, color, text):
+        bar = self.damage_bars[row]
+        pygame.draw.rect(self.screen, BAR_BACKGROUND, bar)
+        fill = self.damage_fill
+        fill.y = bar.y
+        fill.width = int(DAMAGE_BAR_WIDTH * (percent / 100))
+        if fill.width > 0:
+            pygame.draw.rect(self.screen, color, fill)
+        pos = self.damage_text_pos
+        pos.x = bar.x - text.get_width() - 10
+        pos.y = bar.y
+        self.screen.blit(text, pos)
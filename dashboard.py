@@ -1,125 +1,11 @@
 import pygame
-import ctypes
-from ctypes import c_int32, c_float, c_wchar, Structure
-import mmap
 import os
 
-# Extract Shared Memory Structures
-class SPageFilePhysics(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('packetId', c_int32),
-        ('gas', c_float),
-        ('brake', c_float),
-        ('fuel', c_float),
-        ('gear', c_int32),
-        ('rpms', c_int32),
-        ('steerAngle', c_float),
-        ('speedMph', c_float),
-        ('velocity', c_float * 3),
-        ('accG', c_float * 3),
-        ('wheelSlip', c_float * 4),
-        ('wheelLoad', c_float * 4),
-        ('wheelsPressure', c_float * 4),
-        ('wheelAngularSpeed', c_float * 4),
-        ('tyreWear', c_float * 4),
-        ('tyreDirtyLevel', c_float * 4),
-        ('tyreCoreTemperature', c_float * 4),
-        ('camberRAD', c_float * 4),
-        ('suspensionTravel', c_float * 4),
-        ('drs', c_float),
-        ('tc', c_float),
-        ('heading', c_float),
-        ('pitch', c_float),
-        ('roll', c_float),
-        ('cgHeight', c_float),
-        ('carDamage', c_float * 5),
-        ('numberOfTyresOut', c_int32),
-        ('pitLimiterOn', c_int32),
-        ('abs', c_float),
-        ('kersCharge', c_float),
-        ('kersInput', c_float),
-        ('autoShifterOn', c_int32),
-        ('rideHeight', c_float * 2),
-        # Add telemetry fields here
-    ]
-
-class SPageFileGraphic(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('packetId', c_int32),
-        ('status', c_int32),
-        ('session', c_int32),
-        ('currentTime', c_wchar * 15),
-        ('lastTime', c_wchar * 15),
-        ('bestTime', c_wchar * 15),
-        ('split', c_wchar * 15),
-        ('completedLaps', c_int32),
-        ('position', c_int32),
-        ('iCurrentTime', c_int32),
-        ('iLastTime', c_int32),
-        ('iBestTime', c_int32),
-        ('sessionTimeLeft', c_float),
-        ('distanceTraveled', c_float),
-        ('isInPit', c_int32),
-        ('currentSectorIndex', c_int32),
-        ('lastSectorTime', c_int32),
-        ('numberOfLaps', c_int32),
-        ('tyreCompound', c_wchar * 33),
-        ('replayTimeMultiplier', c_float),
-        ('normalizedCarPosition', c_float),
-        ('carCoordinates', c_float * 3),
-        ('penaltyTime', c_float),
-        ('flag', c_int32),
-        ('idealLineOn', c_int32),
-        # Add telemetry fields here
-    ]
-
-class SPageFileStatic(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('smVersion', c_wchar * 15),
-        ('acVersion', c_wchar * 15),
-        ('numberOfSessions', c_int32),
-        ('numCars', c_int32),
-        ('carModel', c_wchar * 33),
-        ('track', c_wchar * 33),
-        ('playerName', c_wchar * 33),
-        ('playerSurname', c_wchar * 33),
-        ('playerNick', c_wchar * 33),
-        ('sectorCount', c_int32),
-        ('maxTorque', c_float),
-        ('maxPower', c_float),
-        ('maxRpm', c_int32),
-        ('maxFuel', c_float),
-        ('suspensionMaxTravel', c_float * 4),
-        ('tyreRadius', c_float * 4),
-        # Add telemetry fields here
-    ]
-
-class SimInfo:
-    def __init__(self):
-        self.physics = None
-        self.graphics = None
-        self.static = None
-        try:
-            self._physics = mmap.mmap(-1, ctypes.sizeof(SPageFilePhysics), 'acpmf_physics')
-            self._graphics = mmap.mmap(-1, ctypes.sizeof(SPageFileGraphic), 'acpmf_graphics')
-            self._static = mmap.mmap(-1, ctypes.sizeof(SPageFileStatic), 'acpmf_static')
-
-            self.physics = SPageFilePhysics.from_buffer(self._physics)
-            self.graphics = SPageFileGraphic.from_buffer(self._graphics)
-            self.static = SPageFileStatic.from_buffer(self._static)
-        except Exception:
-            pass # AC not running
-
-    def close(self):
-        for m in (getattr(self, attr, None) for attr in ['_physics', '_graphics', '_static']):
-            if m:
-                try:
-                    m.close()
-                except:
-                    pass
+from ac_layout import SimInfo
+from predictor import Predictor
+
+# Add telemetry fields to ac_layout.json
+
 info = SimInfo()
 
 pygame.init()
@@ -128,6 +14,9 @@ pygame.init()
 # Set screen dimensions below
 SCREEN_WIDTH, SCREEN_HEIGHT = 1024, 600 
 
+# Miles and mph, or km and km/h
+freedom_units = True
+
 # Change to the position of your dash
 # Ex: if your main monitor is 1920x1080 and Dash is set up to the right -> '1920, 0'
 os.environ['SDL_VIDEO_WINDOW_POS'] = '0, 0'
@@ -152,6 +41,7 @@ def format_time(ms):
 running = True
 clock = pygame.time.Clock()
 last_packet_id = -1
+predictor = Predictor()  # fuel range and end-of-lap tyre wear from distance travelled
 
 while running:
     for event in pygame.event.get():
@@ -164,7 +54,7 @@ while running:
         if info.physics.packetId != last_packet_id:
             last_packet_id = info.physics.packetId
 
-            speed = info.physics.speedMph
+            speed = info.physics.speedKmh / 1.609 if freedom_units else info.physics.speedKmh
             rpm = info.physics.rpms
             gear = info.physics.gear - 1 if info.physics.gear > 1 else info.physics.gear
             throttle = info.physics.gas
@@ -175,12 +65,15 @@ while running:
             avg_tyre_wear = sum(info.physics.tyreWear) / 4 * 100
             max_fuel = info.static.maxFuel if info.static and info.static.maxFuel > 0 else 100
             # Add fields you want to display here or edit the ones above IDC
+            # Wear in AC's own scale for every wheel and the average alike
+            predictor.add(info.graphics.distanceTraveled, fuel, info.physics.tyreWear, sum(info.physics.tyreWear) / 4,
+                          info.graphics.completedLaps + info.graphics.normalizedCarPosition)
 
         # Rendering
         # Speed
         speed_text = font_large.render(f'{int(speed)}', True, (255, 255, 255))
         screen.blit(speed_text, (50, 50))
-        screen.blit(font_medium.render('Mph', True, (200, 200, 200)), (50, 160))
+        screen.blit(font_medium.render('Mph' if freedom_units else 'Km/h', True, (200, 200, 200)), (50, 160))
 
         # RPM 
         rpm_text = font_large.render(f'{int(rpm)}', True, (255, 255, 255))
@@ -200,11 +93,23 @@ while running:
         # Fuel bar
         fuel_width = int((fuel / max_fuel) * 300) if max_fuel > 0 else 0
         pygame.draw.rect(screen, (0, 255, 255), (450, 250, fuel_width, 40))
-        screen.blit(font_medium.render("FUEL", True, (200, 200, 200)), (450, 300))
+        if predictor.fuel_range_m >= 0:
+            if freedom_units:
+                fuel_label = f"FUEL {predictor.fuel_range_m / 1609:.1f} Mi"
+            else:
+                fuel_label = f"FUEL {predictor.fuel_range_m / 1000:.1f} Km"
+            if predictor.fuel_laps >= 0:
+                fuel_label += f" {predictor.fuel_laps:.1f} laps"
+        else:
+            fuel_label = "FUEL"
+        screen.blit(font_medium.render(fuel_label, True, (200, 200, 200)), (450, 300))
 
         # Tyre wear bar
         pygame.draw.rect(screen, (255, 165, 0), (450, 350, int(avg_tyre_wear * 3), 30))
         screen.blit(font_medium.render(f"WEAR {avg_tyre_wear:.0f}%", True, (200, 200, 200)), (450, 390))
+        if predictor.wear_end[0] >= 0:
+            ends = ' '.join(f'{wear * 100:.0f}' for wear in predictor.wear_end)
+            screen.blit(font_medium.render(f"END {ends}", True, (200, 200, 200)), (450, 440))
 
         # Throttle / Brake bars
         pygame.draw.rect(screen, (0, 255, 0), (50, 400, int(throttle * 400), 30))
@@ -1,125 +1,10 @@
 import pygame
-import ctypes
-from ctypes import c_int32, c_float, c_wchar, Structure
-import mmap
 import os
 
-# Extract Shared Memory Structures
-class SPageFilePhysics(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('packetId', c_int32),
-        ('gas', c_float),
-        ('brake', c_float),
-        ('fuel', c_float),
-        ('gear', c_int32),
-        ('rpms', c_int32),
-        ('steerAngle', c_float),
-        ('speedMph', c_float),
-        ('velocity', c_float * 3),
-        ('accG', c_float * 3),
-        ('wheelSlip', c_float * 4),
-        ('wheelLoad', c_float * 4),
-        ('wheelsPressure', c_float * 4),
-        ('wheelAngularSpeed', c_float * 4),
-        ('tyreWear', c_float * 4),
-        ('tyreDirtyLevel', c_float * 4),
-        ('tyreCoreTemperature', c_float * 4),
-        ('camberRAD', c_float * 4),
-        ('suspensionTravel', c_float * 4),
-        ('drs', c_float),
-        ('tc', c_float),
-        ('heading', c_float),
-        ('pitch', c_float),
-        ('roll', c_float),
-        ('cgHeight', c_float),
-        ('carDamage', c_float * 5),
-        ('numberOfTyresOut', c_int32),
-        ('pitLimiterOn', c_int32),
-        ('abs', c_float),
-        ('kersCharge', c_float),
-        ('kersInput', c_float),
-        ('autoShifterOn', c_int32),
-        ('rideHeight', c_float * 2),
-        # Add telemetry fields here
-    ]
-
-class SPageFileGraphic(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('packetId', c_int32),
-        ('status', c_int32),
-        ('session', c_int32),
-        ('currentTime', c_wchar * 15),
-        ('lastTime', c_wchar * 15),
-        ('bestTime', c_wchar * 15),
-        ('split', c_wchar * 15),
-        ('completedLaps', c_int32),
-        ('position', c_int32),
-        ('iCurrentTime', c_int32),
-        ('iLastTime', c_int32),
-        ('iBestTime', c_int32),
-        ('sessionTimeLeft', c_float),
-        ('distanceTraveled', c_float),
-        ('isInPit', c_int32),
-        ('currentSectorIndex', c_int32),
-        ('lastSectorTime', c_int32),
-        ('numberOfLaps', c_int32),
-        ('tyreCompound', c_wchar * 33),
-        ('replayTimeMultiplier', c_float),
-        ('normalizedCarPosition', c_float),
-        ('carCoordinates', c_float * 3),
-        ('penaltyTime', c_float),
-        ('flag', c_int32),
-        ('idealLineOn', c_int32),
-        # Add telemetry fields here
-    ]
-
-class SPageFileStatic(Structure):
-    _pack_ = 4
-    _fields_ = [
-        ('smVersion', c_wchar * 15),
-        ('acVersion', c_wchar * 15),
-        ('numberOfSessions', c_int32),
-        ('numCars', c_int32),
-        ('carModel', c_wchar * 33),
-        ('track', c_wchar * 33),
-        ('playerName', c_wchar * 33),
-        ('playerSurname', c_wchar * 33),
-        ('playerNick', c_wchar * 33),
-        ('sectorCount', c_int32),
-        ('maxTorque', c_float),
-        ('maxPower', c_float),
-        ('maxRpm', c_int32),
-        ('maxFuel', c_float),
-        ('suspensionMaxTravel', c_float * 4),
-        ('tyreRadius', c_float * 4),
-        # Add telemetry fields here
-    ]
-
-class SimInfo:
-    def __init__(self):
-        self.physics = None
-        self.graphics = None
-        self.static = None
-        try:
-            self._physics = mmap.mmap(-1, ctypes.sizeof(SPageFilePhysics), 'acpmf_physics')
-            self._graphics = mmap.mmap(-1, ctypes.sizeof(SPageFileGraphic), 'acpmf_graphics')
-            self._static = mmap.mmap(-1, ctypes.sizeof(SPageFileStatic), 'acpmf_static')
-
-            self.physics = SPageFilePhysics.from_buffer(self._physics)
-            self.graphics = SPageFileGraphic.from_buffer(self._graphics)
-            self.static = SPageFileStatic.from_buffer(self._static)
-        except Exception:
-            pass # AC not running
-
-    def close(self):
-        for m in (getattr(self, attr, None) for attr in ['_physics', '_graphics', '_static']):
-            if m:
-                try:
-                    m.close()
-                except:
-                    pass
+from ac_layout import SimInfo
+
+# Add telemetry fields to ac_layout.json
+
 info = SimInfo()
 
 pygame.init()
@@ -164,7 +49,9 @@ while running:
         if info.physics.packetId != last_packet_id:
             last_packet_id = info.physics.packetId
 
-            speed = info.physics.speedMph
+            # AC publishes km/h at this offset; the old hand-kept structure named it
+            # speedMph, so km/h used to be shown under the Mph label
+            speed = info.physics.speedKmh / 1.609
             rpm = info.physics.rpms
             gear = info.physics.gear - 1 if info.physics.gear > 1 else info.physics.gear
             throttle = info.physics.gas
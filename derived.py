@@ -0,0 +1,208 @@
+from array import array
+
+from telemetry import TelemetryFrame
+
+# Derived channels, computed from the frame once per drawn frame and shared by
+# every dashboard. Each channel is (name, inputs, function of those inputs);
+# an input is a TelemetryFrame field, a dashboard-side value from EXTERNALS or
+# another derived channel. A channel is recomputed only when one of its inputs
+# changed since the last update, and its result lands on the frame when the
+# frame has a field of that name, in DerivedChannels.values otherwise.
+# Custom channels are added the same way, e.g. in a dashboard's settings:
+#   custom_channels = [('tyre_temp_max', ('tyre_temp',), max)]
+# and one with a standard channel's name replaces it.
+
+MPH_PER_KMH = 1 / 1.609
+
+# Values the dashboard supplies through set(), with their starting values
+EXTERNALS = {
+    'stage_start_distance': 0.0,
+    'best_lap_ms': 0,
+    'reference': None,  # ReferenceTrace of the personal best, if there is one
+    'freedom_units': False,
+    'shift_points': (),  # upshift rpm per gear from the shift-point model, 0 = not known
+}
+
+SHIFT_RATIO = 0.95  # shift light and tach colours without a learned shift point
+
+
+def _reference_ms(reference, stage_distance):
+    return reference.time_at(stage_distance) if reference is not None else -1.0
+
+
+def _delta_valid(current_ms, reference_ms, best_lap_ms):
+    return current_ms > 0 and (reference_ms >= 0 or best_lap_ms > 0)
+
+
+def _delta_ms(delta_valid, current_ms, reference_ms, best_lap_ms, position):
+    if not delta_valid:
+        return 0
+    if reference_ms >= 0:
+        return int(current_ms - reference_ms)
+    return int(current_ms - best_lap_ms * position)
+
+
+def _pace_factor(current_ms, best_lap_ms, position):
+    # This run's time over the best's at the same progress
+    if best_lap_ms > 0 and position > 0.01:
+        return current_ms / (best_lap_ms * position)
+    return 0.0
+
+
+def _estimated_ms(best_lap_ms, pace_factor):
+    return int(best_lap_ms * pace_factor) if pace_factor > 0 else 0
+
+
+def _rpm_ratio(rpm, max_rpm):
+    ratio = rpm / (max_rpm if max_rpm > 100 else 100)
+    return 0.0 if ratio < 0 else 1.0 if ratio > 1 else ratio
+
+
+def _shift_rpm(gear, shift_points):
+    return shift_points[gear] if 0 < gear < len(shift_points) else 0
+
+
+def _shift_ratio(shift_rpm, max_rpm):
+    if shift_rpm <= 0 or max_rpm <= 100:
+        return SHIFT_RATIO
+    ratio = shift_rpm / max_rpm
+    return 0.3 if ratio < 0.3 else 1.0 if ratio > 1 else ratio
+
+
+def _shift_light(rpm, rpm_ratio, shift_rpm):
+    return rpm >= shift_rpm if shift_rpm > 0 else rpm_ratio > SHIFT_RATIO
+
+
+STANDARD_CHANNELS = (
+    ('stage_distance', ('distance_m', 'stage_start_distance'), lambda distance, start: distance - start),
+    ('progress_percent', ('position',), lambda position: position * 100.0),
+    ('reference_ms', ('reference', 'stage_distance'), _reference_ms),
+    ('delta_valid', ('current_ms', 'reference_ms', 'best_lap_ms'), _delta_valid),
+    ('delta_ms', ('delta_valid', 'current_ms', 'reference_ms', 'best_lap_ms', 'position'), _delta_ms),
+    ('pace_factor', ('current_ms', 'best_lap_ms', 'position'), _pace_factor),
+    ('estimated_ms', ('best_lap_ms', 'pace_factor'), _estimated_ms),
+    ('rpm_ratio', ('rpm', 'max_rpm'), _rpm_ratio),
+    ('speed_display', ('speed_kmh', 'freedom_units'),
+     lambda speed, freedom: speed * MPH_PER_KMH if freedom else speed),
+    ('distance_display', ('distance_m', 'freedom_units'),  # km or miles
+     lambda distance, freedom: distance / 1000 * MPH_PER_KMH if freedom else distance / 1000),
+    ('fuel_range_display', ('fuel_range_m', 'freedom_units'),  # km or miles, -1 = not known
+     lambda distance, freedom: -1.0 if distance < 0 else distance / 1000 * MPH_PER_KMH if freedom else distance / 1000),
+    ('shift_rpm', ('gear', 'shift_points'), _shift_rpm),
+    ('shift_ratio', ('shift_rpm', 'max_rpm'), _shift_ratio),
+    ('shift_light', ('rpm', 'rpm_ratio', 'shift_rpm'), _shift_light),
+)
+
+
+class DerivedChannels:
+    def __init__(self, custom_channels=(), freedom_units=False):
+        channels = {}
+        for name, inputs, compute in tuple(STANDARD_CHANNELS) + tuple(custom_channels):
+            channels[name] = (name, tuple(inputs), compute)
+        self.order = self._sort(channels)
+
+        self.values = dict(EXTERNALS)
+        self.values['freedom_units'] = freedom_units
+        self.changed = set(EXTERNALS)  # everything is computed on the first update
+        self.frame_inputs = []
+        self.array_inputs = []
+        probe = TelemetryFrame()
+        for _, inputs, _ in self.order:
+            for name in inputs:
+                if name in channels or name in EXTERNALS or name in self.values:
+                    continue
+                value = getattr(probe, name)
+                if isinstance(value, array):
+                    # Compared against a private copy, the frame's array is reused
+                    self.values[name] = array(value.typecode, value)
+                    self.array_inputs.append(name)
+                else:
+                    self.values[name] = value
+                    self.frame_inputs.append(name)
+                self.changed.add(name)
+        for name, _, _ in self.order:
+            self.values[name] = None
+        self.frame_outputs = tuple(name for name, _, _ in self.order if name in TelemetryFrame.__slots__)
+
+    @staticmethod
+    def _sort(channels):
+        # Inputs before the channels that use them
+        order = []
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f'derived channels depend on each other: {" -> ".join(path + [name])}')
+            state[name] = 'visiting'
+            _, inputs, _ = channels[name]
+            for source in inputs:
+                if source in channels:
+                    visit(source, path + [name])
+                elif source not in EXTERNALS and source not in TelemetryFrame.__slots__:
+                    raise ValueError(f'derived channel {name}: unknown input {source}')
+            state[name] = 'done'
+            order.append(channels[name])
+
+        for name in channels:
+            visit(name, [])
+        return tuple(order)
+
+    def set(self, name, value):
+        if self.values[name] != value:
+            self.values[name] = value
+            self.changed.add(name)
+
+    def update(self, frame):
+        values = self.values
+        changed = self.changed
+        for name in self.frame_inputs:
+            value = getattr(frame, name)
+            if values[name] != value:
+                values[name] = value
+                changed.add(name)
+        for name in self.array_inputs:
+            value = getattr(frame, name)
+            copy = values[name]
+            if copy != value:
+                copy[:] = value
+                changed.add(name)
+
+        if changed:
+            for name, inputs, compute in self.order:
+                if changed.isdisjoint(inputs):
+                    continue
+                value = compute(*[values[source] for source in inputs])
+                if values[name] != value:
+                    values[name] = value
+                    changed.add(name)
+            changed.clear()
+
+        # Every time, the frame was just overwritten by the newest tick
+        for name in self.frame_outputs:
+            setattr(frame, name, values[name])
+
+
+if __name__ == '__main__':
+    import time
+
+    # The checks live in tests/test_derived.py; this times the per-frame update
+    frame = TelemetryFrame()
+    derived = DerivedChannels([('tyre_temp_max', ('tyre_temp',), max)], freedom_units=True)
+    derived.set('best_lap_ms', 200000)
+    derived.set('shift_points', (0, 5600, 6000))
+
+    frames = 100000
+    start = time.perf_counter()
+    for i in range(frames):
+        frame.current_ms = i * 16
+        frame.position = i / frames
+        frame.distance_m = i * 0.5
+        derived.update(frame)
+    moving = (time.perf_counter() - start) / frames * 1e6
+    start = time.perf_counter()
+    for i in range(frames):
+        derived.update(frame)
+    still = (time.perf_counter() - start) / frames * 1e6
+    print(f'update: {moving:.2f} us with the stage timer running, {still:.2f} us with nothing changed')
@@ -0,0 +1,135 @@
+import math
+from array import array
+from collections import deque
+
+# Event detectors run on every physics tick or UDP packet, not once per
+# rendered frame, so lockups, impacts and damage between frames are caught.
+# update() is a handful of comparisons per wheel; an event is only built when
+# something actually happens. Events are (time, kind, wheel, value) tuples in
+# a bounded deque, wheel is 0-3 (FL, FR, RL, RR) or -1 for the whole car.
+
+WHEELS = ('FL', 'FR', 'RL', 'RR')
+
+MIN_SPEED_MS = 5.0      # lockups aren't judged below this ground speed
+LOCKUP_RATIO = 0.5      # wheel surface speed under half of ground speed
+SPIN_RATIO = 1.5        # wheel surface speed over 1.5x ground speed ...
+SPIN_MARGIN_MS = 3.0    # ... plus this, so pulling away doesn't count
+DEBOUNCE_TICKS = 3
+PUNCTURE_FRACTION = 0.6  # pressure below 60% of the wheel's running baseline
+BASELINE_RATE = 0.0005
+OFF_TRACK_TYRES = 2
+IMPACT_G = 3.5          # horizontal g, jumps and landings are vertical
+DAMAGE_JUMP = 1.0       # percentage points between two ticks
+EVENT_QUEUE = 256
+
+
+class EventDetector:
+    def __init__(self, maxlen=EVENT_QUEUE):
+        self.events = deque(maxlen=maxlen)
+        self.count = 0  # total emitted, so readers can spot new events
+        self.lock_ticks = array('i', [0]) * 4
+        self.spin_ticks = array('i', [0]) * 4
+        self.baseline = array('f', [0.0]) * 4
+        self.punctured = array('b', [0]) * 4
+        self.tyres_out = 0
+        self.impact_peak = 0.0
+        self.impact_start = 0.0
+        self.damage = -1.0
+
+    def reset(self):
+        for w in range(4):
+            self.lock_ticks[w] = 0
+            self.spin_ticks[w] = 0
+            self.baseline[w] = 0.0
+            self.punctured[w] = 0
+        self.tyres_out = 0
+        self.impact_peak = 0.0
+        self.damage = -1.0
+
+    def emit(self, t, kind, wheel, value):
+        self.events.append((t, kind, wheel, value))
+        self.count += 1
+
+    def update(self, frame, t):
+        self._wheels(frame, t)
+        self._impact(frame, t)
+        self._damage(frame, t)
+        tyres_out = frame.tyres_out
+        if tyres_out >= OFF_TRACK_TYRES and self.tyres_out < OFF_TRACK_TYRES:
+            self.emit(t, 'off', -1, tyres_out)
+        self.tyres_out = tyres_out
+
+    def _wheels(self, frame, t):
+        ground = frame.speed_kmh / 3.6
+        speeds = frame.wheel_speed
+        pressures = frame.tyre_pressure
+        have_speeds = speeds[0] != 0 or speeds[1] != 0 or speeds[2] != 0 or speeds[3] != 0
+        braking = frame.brake > 0.05 and ground > MIN_SPEED_MS
+        driving = frame.throttle > 0.2
+        for w in range(4):
+            if have_speeds:
+                wheel = speeds[w]
+                if braking and wheel < ground * LOCKUP_RATIO:
+                    self.lock_ticks[w] += 1
+                    if self.lock_ticks[w] == DEBOUNCE_TICKS:
+                        self.emit(t, 'lockup', w, ground - wheel)
+                else:
+                    self.lock_ticks[w] = 0
+                if driving and wheel > ground * SPIN_RATIO + SPIN_MARGIN_MS:
+                    self.spin_ticks[w] += 1
+                    if self.spin_ticks[w] == DEBOUNCE_TICKS:
+                        self.emit(t, 'wheelspin', w, wheel - ground)
+                else:
+                    self.spin_ticks[w] = 0
+
+            # A fast pressure loss against a slowly tracking baseline
+            pressure = pressures[w]
+            baseline = self.baseline[w]
+            if pressure <= 0:
+                continue
+            if baseline == 0:
+                self.baseline[w] = pressure
+            elif pressure < baseline * PUNCTURE_FRACTION:
+                if not self.punctured[w]:
+                    self.punctured[w] = 1
+                    self.emit(t, 'puncture', w, pressure)
+            else:
+                self.punctured[w] = 0
+                self.baseline[w] = baseline + (pressure - baseline) * BASELINE_RATE
+
+    def _impact(self, frame, t):
+        # One event per hit, reported with its peak once it's over
+        acc = frame.acc_g
+        g = math.sqrt(acc[0] * acc[0] + acc[2] * acc[2])
+        if g > IMPACT_G:
+            if self.impact_peak == 0.0:
+                self.impact_start = t
+            if g > self.impact_peak:
+                self.impact_peak = g
+        elif self.impact_peak > 0.0:
+            self.emit(self.impact_start, 'impact', -1, self.impact_peak)
+            self.impact_peak = 0.0
+
+    def _damage(self, frame, t):
+        d = frame.car_damage
+        total = (d[0] + d[1] + d[2] + d[3] + d[4]) * 100
+        if total == 0:
+            total = frame.engine_dmg + frame.susp_dmg_max
+        if self.damage >= 0 and total - self.damage > DAMAGE_JUMP:
+            self.emit(t, 'damage', -1, total - self.damage)
+        self.damage = total
+
+
+def describe(event):
+    _, kind, wheel, value = event
+    if kind == 'lockup':
+        return f'LOCK {WHEELS[wheel]}'
+    if kind == 'wheelspin':
+        return f'SPIN {WHEELS[wheel]}'
+    if kind == 'puncture':
+        return f'PUNCTURE {WHEELS[wheel]}'
+    if kind == 'off':
+        return f'{value} WHEELS OFF'
+    if kind == 'impact':
+        return f'IMPACT {value:.1f}G'
+    return f'DAMAGE +{value:.0f}%'
@@ -0,0 +1,140 @@
+import argparse
+import json
+import os
+import sys
+import zipfile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+from recorder import SessionReader
+
+# Columnar export of session recordings for notebooks. The recording is read
+# and written in fixed-size chunks, so memory stays bounded however long the
+# session was. Every chunk carries per-channel min/max/mean so readers can
+# skip the ones they don't need:
+#   .npz      one member per chunk and channel ('chunk00003/speed_kmh') plus
+#             a metadata.json member with the header and the chunk stats.
+#             read_npz() below does the chunk skipping.
+#   .parquet  one row group per chunk; Parquet keeps column min/max per row
+#             group itself, the header goes into the file's key-value metadata.
+
+CHUNK_RECORDS = 65536
+
+
+def record_dtype(channels):
+    return np.dtype([('t', '<f8')] + [(name, '<f4') for name in channels])
+
+
+def iter_chunks(recording, channels, start_s=None, end_s=None, chunk_records=CHUNK_RECORDS):
+    # (first record index, structured array) for the records in [start_s, end_s)
+    first = recording.index_at_time(start_s) if start_s is not None else 0
+    stop = recording.index_at_time(end_s) if end_s is not None else recording.count
+    dtype = record_dtype(recording.channels)
+    for start in range(first, stop, chunk_records):
+        data = np.frombuffer(recording.read_bytes(start, min(chunk_records, stop - start)), dtype=dtype)
+        yield start, data[['t'] + channels]
+
+
+def chunk_stats(data, channels):
+    stats = {'rows': len(data), 't_start': float(data['t'][0]), 't_end': float(data['t'][-1])}
+    for name in channels:
+        column = data[name]
+        stats[name] = {'min': float(column.min()), 'max': float(column.max()), 'mean': float(column.mean())}
+    return stats
+
+
+def export_npz(recording, path, channels, start_s=None, end_s=None, chunk_records=CHUNK_RECORDS):
+    chunks = []
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for index, (first, data) in enumerate(iter_chunks(recording, channels, start_s, end_s, chunk_records)):
+            for name in ['t'] + channels:
+                with archive.open(f'chunk{index:05}/{name}.npy', 'w', force_zip64=True) as member:
+                    np.lib.format.write_array(member, np.ascontiguousarray(data[name]))
+            stats = chunk_stats(data, channels)
+            stats['first_record'] = first
+            chunks.append(stats)
+        archive.writestr('metadata.json', json.dumps({
+            'header': recording.header, 'channels': channels, 'chunks': chunks,
+        }))
+    return len(chunks)
+
+
+def export_parquet(recording, path, channels, start_s=None, end_s=None, chunk_records=CHUNK_RECORDS):
+    schema = pa.schema([('t', pa.float64())] + [(name, pa.float32()) for name in channels],
+                       metadata={'simdash.header': json.dumps(recording.header)})
+    count = 0
+    with pq.ParquetWriter(path, schema, compression='zstd', write_statistics=True) as writer:
+        for _, data in iter_chunks(recording, channels, start_s, end_s, chunk_records):
+            table = pa.Table.from_arrays([pa.array(np.ascontiguousarray(data[name])) for name in ['t'] + channels],
+                                         schema=schema)
+            writer.write_table(table, row_group_size=chunk_records)
+            count += 1
+    return count
+
+
+def read_npz(path, channels=None, start_s=None, end_s=None, where=None):
+    # Loads only the chunks overlapping [start_s, end_s) whose stats pass
+    # where(stats), e.g. where=lambda s: s['speed_kmh']['max'] > 150
+    with zipfile.ZipFile(path) as archive:
+        metadata = json.loads(archive.read('metadata.json'))
+        channels = channels or metadata['channels']
+        parts = {name: [] for name in ['t'] + channels}
+        for index, stats in enumerate(metadata['chunks']):
+            if start_s is not None and stats['t_end'] < start_s:
+                continue
+            if end_s is not None and stats['t_start'] >= end_s:
+                continue
+            if where is not None and not where(stats):
+                continue
+            for name in parts:
+                with archive.open(f'chunk{index:05}/{name}.npy') as member:
+                    parts[name].append(np.lib.format.read_array(member))
+    columns = {name: np.concatenate(arrays) if arrays else np.zeros(0, dtype=np.float32)
+               for name, arrays in parts.items()}
+    # Chunks are whole, trim the rows at either end of the range
+    t = columns['t']
+    lo = np.searchsorted(t, start_s) if start_s is not None else 0
+    hi = np.searchsorted(t, end_s) if end_s is not None else len(t)
+    return {name: column[lo:hi] for name, column in columns.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export a session recording to a columnar file')
+    parser.add_argument('recording')
+    parser.add_argument('-o', '--output', help='.npz or .parquet, defaults next to the recording')
+    parser.add_argument('-c', '--channels', help='comma separated, defaults to all')
+    parser.add_argument('--start', type=float, help='session time in seconds')
+    parser.add_argument('--end', type=float, help='session time in seconds')
+    parser.add_argument('--chunk', type=int, default=CHUNK_RECORDS, help='records per chunk')
+    args = parser.parse_args()
+
+    if np is None:
+        sys.exit('export needs numpy')
+    recording = SessionReader(args.recording)
+    channels = args.channels.split(',') if args.channels else list(recording.channels)
+    unknown = [name for name in channels if name not in recording.channels]
+    if unknown:
+        sys.exit(f'unknown channels: {", ".join(unknown)}')
+    output = args.output or os.path.splitext(args.recording)[0] + ('.parquet' if pa is not None else '.npz')
+
+    if output.endswith('.parquet'):
+        if pa is None:
+            sys.exit('parquet export needs pyarrow, use a .npz output instead')
+        chunks = export_parquet(recording, output, channels, args.start, args.end, args.chunk)
+    else:
+        chunks = export_npz(recording, output, channels, args.start, args.end, args.chunk)
+    recording.close()
+    print(f'{output} written, {chunks} chunks')
+
+
+if __name__ == '__main__':
+    main()
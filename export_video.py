@@ -0,0 +1,242 @@
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from recorder import SessionReader
+
+# Onboard-style video of a recorded session, drawn through the real
+# DashLayout. Every video frame depends only on the record under it plus a
+# little state (segment splits, best time so far, the strip chart window), and
+# that state is cheap to rebuild by replaying records without drawing. So the
+# timeline is cut into chunks, each worker process replays up to its chunk and
+# renders it headless, and the chunks are stitched in order:
+#   python export_video.py run.simrec -o run.mp4     (needs ffmpeg on PATH)
+#   python export_video.py run.simrec -o frames/     (PNG sequence)
+
+FPS = 30
+SIZE = (1024, 600)
+CHUNK_SECONDS = 20
+SEGMENTS = 10
+TRACE_SECONDS = 10
+READ_RECORDS = 4096
+
+
+def load_times(recording):
+    dtype = np.dtype([('t', '<f8')] + [(name, '<f4') for name in recording.channels])
+    records = np.memmap(recording.path, dtype=dtype, mode='r', offset=recording.data_offset,
+                        shape=(recording.count,))
+    return np.array(records['t']), float(records['rpm'].max()), float(records['fuel'].max())
+
+
+class _Replay:
+    # Feeds records into a TelemetryFrame and the state the layout draws from
+    def __init__(self, recording, freedom_units, fps, max_rpm, max_fuel):
+        from derived import DerivedChannels
+        from splits import SegmentTimer
+        from strip_chart import INPUT_TRACES, StripChart
+        from telemetry import TelemetryFrame
+
+        self.recording = recording
+        c = {name: i + 1 for i, name in enumerate(recording.channels)}
+        self.columns = tuple(c[name] for name in (
+            'stage_time_ms', 'stage_distance_m', 'stage_progress', 'laps', 'speed_kmh', 'rpm', 'gear',
+            'throttle', 'brake', 'steer', 'fuel', 'tyre_wear', 'engine_damage', 'suspension_damage',
+            'pos_x', 'pos_y', 'pos_z', 'acc_lat_g', 'acc_vert_g', 'acc_long_g'))
+        self.frame = TelemetryFrame()
+        self.frame.max_rpm = int(max_rpm)
+        self.frame.max_fuel = max_fuel
+        self.derived = DerivedChannels((), freedom_units)
+        self.segments = SegmentTimer(SEGMENTS)
+        self.traces = StripChart((10, 182, 360, 70), TRACE_SECONDS, fps, INPUT_TRACES)
+        self.best_ms = 0
+        self.next = 0  # next record to apply
+        self.buffer = []
+        self.buffer_start = 0
+
+    def _record(self, index):
+        if not self.buffer_start <= index < self.buffer_start + len(self.buffer):
+            self.buffer = self.recording.read(index, READ_RECORDS)
+            self.buffer_start = index
+        return self.buffer[index - self.buffer_start]
+
+    def advance(self, index):
+        # Applies records up to and including `index`
+        f = self.frame
+        while self.next <= index:
+            record = self._record(self.next)
+            (current_ms, distance, position, laps, speed, rpm, gear, throttle, brake, steer, fuel,
+             wear, engine, susp, x, y, z, lat, vert, long) = (record[i] for i in self.columns)
+            previous_ms = f.current_ms
+            if int(laps) > f.laps and self.next > 0:
+                # A completed stage: the time the timer reached is the result
+                self.segments.finish(previous_ms)
+                if self.best_ms == 0 or previous_ms < self.best_ms:
+                    self.best_ms = previous_ms
+            f.current_ms, f.distance_m, f.position, f.laps = int(current_ms), distance, position, int(laps)
+            f.speed_kmh, f.rpm, f.gear = speed, int(rpm), int(gear)
+            f.throttle, f.brake, f.steer, f.fuel = throttle, brake, steer, fuel
+            f.tyre_wear_avg, f.engine_dmg, f.susp_dmg_max = wear, engine, susp
+            f.pos[0], f.pos[1], f.pos[2] = x, y, z
+            f.acc_g[0], f.acc_g[1], f.acc_g[2] = lat, vert, long
+            self.segments.update(position, f.current_ms)
+            self.next += 1
+        self.derived.set('best_lap_ms', self.best_ms)
+        self.derived.update(f)
+
+
+def _first_frame_at(t, start_t, fps):
+    # The first video frame whose time is at or after t, as the render loop sees it
+    k = max(0, int((t - start_t) * fps))
+    while start_t + k / fps < t:
+        k += 1
+    while k > 0 and start_t + (k - 1) / fps >= t:
+        k -= 1
+    return k
+
+
+def render_chunk(job):
+    # Worker: renders video frames [first, stop) of the timeline
+    (path, output, chunk, first, stop, fps, freedom_units, times, max_rpm, max_fuel, events, use_ffmpeg) = job
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    import pygame
+    from dash_layout import ALERT_MS, BLACK, DashLayout
+    from detectors import describe
+    from profiler import FrameProfiler
+
+    pygame.font.init()
+    screen = pygame.Surface(SIZE)
+    recording = SessionReader(path)
+    replay = _Replay(recording, freedom_units, fps, max_rpm, max_fuel)
+    layout = DashLayout(screen, freedom_units, replay.segments, replay.traces, FrameProfiler(False))
+    start_t = times[0]
+    clock_ms = [0]
+    layout.ticks = lambda: clock_ms[0]
+
+    # Rebuild the state at the chunk start without drawing; the strip chart
+    # only needs the frames inside its window
+    for k in range(max(0, first - TRACE_SECONDS * fps), first):
+        replay.advance(int(np.searchsorted(times, start_t + k / fps, 'right')) - 1)
+        replay.traces.push_frame(replay.frame)
+    # Alerts raised before the chunk that are still up at its start are raised
+    # again on the clock of the frame they first showed on, as in one long render
+    event = 0
+    while event < len(events) and events[event][0] <= start_t + (first - 1) / fps:
+        t = events[event][0]
+        if t > start_t + first / fps - ALERT_MS / 1000:
+            clock_ms[0] = int(_first_frame_at(t, start_t, fps) * 1000 / fps)
+            layout.show_alert(describe(events[event]))
+        event += 1
+
+    encoder = None
+    chunk_path = None
+    if use_ffmpeg:
+        chunk_path = f'{output}.part{chunk:05}.mp4'
+        encoder = subprocess.Popen(
+            ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+             '-s', f'{SIZE[0]}x{SIZE[1]}', '-r', str(fps), '-i', '-',
+             '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', chunk_path],
+            stdin=subprocess.PIPE)
+    for k in range(first, stop):
+        t = start_t + k / fps
+        clock_ms[0] = int(k * 1000 / fps)
+        replay.advance(int(np.searchsorted(times, t, 'right')) - 1)
+        while event < len(events) and events[event][0] <= t:
+            layout.show_alert(describe(events[event]))
+            event += 1
+        screen.fill(BLACK)
+        layout.draw(replay.frame)
+        if encoder is not None:
+            encoder.stdin.write(pygame.image.tobytes(screen, 'RGB'))
+        else:
+            pygame.image.save(screen, os.path.join(output, f'frame_{k:06}.png'))
+    recording.close()
+    if encoder is not None:
+        encoder.stdin.close()
+        if encoder.wait() != 0:
+            raise RuntimeError(f'ffmpeg failed on chunk {chunk}')
+    return chunk_path
+
+
+def detector_events(path):
+    # (time, kind, wheel, value) of the recorded detector events, for alerts
+    from session_index import SessionIndex, index_path
+
+    if not os.path.exists(index_path(path)):
+        return []
+    return [(t, kind, wheel, value) for t, _, kind, wheel, value in SessionIndex(index_path(path)).find()
+            if kind not in ('stage_start', 'finish', 'shift')]
+
+
+def export_video(path, output, fps=FPS, start_s=None, end_s=None, freedom_units=True,
+                 workers=None, chunk_seconds=CHUNK_SECONDS):
+    recording = SessionReader(path)
+    times, max_rpm, max_fuel = load_times(recording)
+    recording.close()
+    if not len(times):
+        raise ValueError(f'{path} has no records')
+    first_t = times[0] if start_s is None else max(times[0], start_s)
+    last_t = times[-1] if end_s is None else min(times[-1], end_s)
+    offset = int(round((first_t - times[0]) * fps))
+    total = offset + int((last_t - first_t) * fps) + 1
+
+    use_ffmpeg = not output.endswith(('/', os.sep)) and not os.path.isdir(output)
+    if use_ffmpeg and shutil.which('ffmpeg') is None:
+        raise RuntimeError('video output needs ffmpeg on PATH, give a directory for a PNG sequence instead')
+    if not use_ffmpeg:
+        os.makedirs(output, exist_ok=True)
+
+    events = detector_events(path)
+    step = max(1, int(chunk_seconds * fps))
+    jobs = [(path, output, i, first, min(first + step, total), fps, freedom_units, times, max_rpm, max_fuel,
+             events, use_ffmpeg)
+            for i, first in enumerate(range(offset, total, step))]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(render_chunk, jobs))
+
+    if use_ffmpeg:
+        listing = output + '.parts.txt'
+        with open(listing, 'w') as f:
+            for part in parts:
+                f.write(f"file '{os.path.abspath(part)}'\n")
+        subprocess.run(['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', listing,
+                        '-c', 'copy', output], check=True)
+        for part in parts:
+            os.remove(part)
+        os.remove(listing)
+    return total - offset, last_t - first_t
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render a session recording through the dashboard layout')
+    parser.add_argument('recording')
+    parser.add_argument('-o', '--output', help='video file (.mp4, needs ffmpeg) or a directory for PNG frames')
+    parser.add_argument('--fps', type=int, default=FPS)
+    parser.add_argument('--start', type=float, help='session time in seconds')
+    parser.add_argument('--end', type=float, help='session time in seconds')
+    parser.add_argument('--kph', action='store_true', help='metric units instead of freedom units')
+    parser.add_argument('-j', '--workers', type=int, help='processes, defaults to every core')
+    parser.add_argument('--chunk', type=float, default=CHUNK_SECONDS, help='seconds of video per work unit')
+    args = parser.parse_args()
+    if np is None:
+        sys.exit('export_video needs numpy')
+
+    output = args.output or os.path.splitext(args.recording)[0] + '.mp4'
+    start = time.perf_counter()
+    frames, duration = export_video(args.recording, output, args.fps, args.start, args.end, not args.kph,
+                                    args.workers, args.chunk)
+    elapsed = time.perf_counter() - start
+    print(f'{output}: {frames} frames of {duration:.1f} s rendered in {elapsed:.1f} s '
+          f'({duration / elapsed if elapsed else 0:.1f}x real time, {os.cpu_count()} cores)')
+
+
+if __name__ == '__main__':
+    main()
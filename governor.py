@@ -0,0 +1,73 @@
+import time
+
+# Frame-budget governor for the dashboard loop. Widgets given a rate in
+# widget_rates are low priority: they are redrawn every
+# refresh_rate / rate frames and replayed from a copy in between, staggered
+# so they don't all land on the same frame. The work done per frame (all of
+# it except the wait for the next frame) is smoothed and compared against
+# 1 / refresh_rate. When it keeps running close to the budget, the
+# low-priority rates are halved, down to LEVELS halvings, so the widgets
+# drawn every frame keep their rate. Once there is headroom again they step
+# back up. Each change is printed.
+
+LEVELS = 3
+OVER = 0.85      # of the budget, smoothed work above this degrades
+UNDER = 0.5      # and below this recovers
+SMOOTHING = 0.1
+DEGRADE_S = 0.25  # of running over before a step down
+RECOVER_S = 3.0   # of headroom before a step back up
+
+
+class FrameGovernor:
+    def __init__(self, refresh_rate, widget_rates):
+        self.refresh_rate = refresh_rate
+        self.budget_ms = 1000.0 / refresh_rate
+        self.intervals = {}
+        self.offsets = {}
+        for i, (name, rate) in enumerate(widget_rates.items()):
+            self.intervals[name] = max(1, round(refresh_rate / rate)) if rate > 0 else 1
+            self.offsets[name] = i
+        self.level = 0
+        self.frame = 0
+        self.work_ms = 0.0
+        self.over = 0
+        self.under = 0
+        self.degrade_frames = max(1, int(DEGRADE_S * refresh_rate))
+        self.recover_frames = max(1, int(RECOVER_S * refresh_rate))
+        self._start = 0.0
+
+    def begin_frame(self):
+        self.frame += 1
+        self._start = time.perf_counter()
+
+    def due(self, name):
+        # Widgets without a rate draw every frame and are never slowed down
+        interval = self.intervals.get(name)
+        if interval is None:
+            return True
+        return (self.frame + self.offsets[name]) % (interval << self.level) == 0
+
+    def end_frame(self):
+        # Call before waiting for the next frame
+        work = (time.perf_counter() - self._start) * 1000
+        self.work_ms += (work - self.work_ms) * SMOOTHING
+        if self.work_ms > self.budget_ms * OVER:
+            self.over += 1
+            self.under = 0
+        elif self.work_ms < self.budget_ms * UNDER:
+            self.under += 1
+            self.over = 0
+        else:
+            self.over = self.under = 0
+
+        if self.over >= self.degrade_frames and self.level < LEVELS and self.intervals:
+            self.level += 1
+            self.over = 0
+            print(f'Frame budget: {self.work_ms:.1f} of {self.budget_ms:.1f} ms used, '
+                  f'low-priority widgets slowed to 1/{1 << self.level} of their rate')
+        elif self.under >= self.recover_frames and self.level > 0:
+            self.level -= 1
+            self.under = 0
+            print(f'Frame budget: {self.work_ms:.1f} of {self.budget_ms:.1f} ms used, '
+                  + ('low-priority widgets back to their rate' if self.level == 0
+                     else f'low-priority widgets back up to 1/{1 << self.level} of their rate'))
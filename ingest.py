@@ -0,0 +1,62 @@
+import threading
+import time
+
+# Background ingest: reads every sim tick at full rate, runs the event
+# detectors and any learners (anything with update(frame, t), like the
+# shift-point model) on it and keeps the newest frame for the render loop,
+# which only copies it once per drawn frame. The reader must offer poll(), which waits
+# briefly for the next tick and returns True once one is in, and read(), which
+# decodes it into reader.frame. A reader with a `paused` attribute that is set
+# still updates the frame, but detectors and learners skip those ticks.
+# Learners run under the same lock as read(), so whatever they write onto the
+# frame (the predictor's ranges, say) is whole by the time a snapshot copies it.
+
+
+class IngestThread(threading.Thread):
+    def __init__(self, reader, detector, learners=()):
+        super().__init__(daemon=True)
+        self.reader = reader
+        self.detector = detector
+        self.learners = tuple(learners)
+        self.lock = threading.Lock()
+        self.ticks = 0
+        self.seen = 0
+        self.running = True
+
+    def run(self):
+        reader = self.reader
+        frame = reader.frame
+        detector = self.detector
+        learners = self.learners
+        previous_ms = 0
+        while self.running:
+            if not reader.poll():
+                continue
+            paused = getattr(reader, 'paused', False)
+            t = time.perf_counter()
+            with self.lock:
+                reader.read()
+                self.ticks += 1
+                if not paused:
+                    for learner in learners:
+                        learner.update(frame, t)
+            # A restart re-learns the tyre pressure baselines
+            if frame.current_ms < previous_ms:
+                detector.reset()
+            previous_ms = frame.current_ms
+            if not paused:
+                detector.update(frame, t)
+
+    def snapshot(self, frame):
+        # Copies the newest tick into `frame`, False if nothing new arrived
+        with self.lock:
+            if self.ticks == self.seen:
+                return False
+            self.seen = self.ticks
+            frame.copy_from(self.reader.frame)
+        return True
+
+    def stop(self):
+        self.running = False
+        self.join(timeout=1.0)
+
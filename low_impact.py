@@ -0,0 +1,181 @@
+import os
+import sys
+import time
+
+# Low-impact mode for a dashboard sharing the PC with the sim. apply() pins
+# every thread of the process (render loop, ingest, web server) to the chosen
+# cores and lowers their priority; call it after the threads are started, or
+# at least before any thread the sim competes with. throttle(), once per frame
+# after the frame wait, keeps the render loop's own CPU time to `cpu_budget`
+# of one core: when a window has used more than its share, the frame is
+# stretched until it hasn't. Only the render loop's time counts, as it is the
+# only thread that sleeps for it; the ingest thread, learners and web server
+# are held back by affinity and priority alone. A 60 Hz dashboard normally
+# draws on 10-25% of a core, so a budget below that lowers its frame rate.
+# draw() shows the whole process's usage and the render loop's either way.
+# Linux uses sched_setaffinity and setpriority per thread, Windows the
+# process affinity mask and priority class.
+#   python low_impact.py    measures a CPU-bound job sharing a core with the dash
+
+WINDOW_S = 0.5
+MAX_STRETCH_S = 0.25  # longest single pause, so input and the window stay responsive
+BELOW_NORMAL_PRIORITY_CLASS = 0x4000
+IDLE_PRIORITY_CLASS = 0x40
+
+
+def _thread_ids():
+    try:
+        return [int(tid) for tid in os.listdir('/proc/self/task')]
+    except OSError:
+        return [0]
+
+
+class LowImpact:
+    def __init__(self, enabled=False, cores=None, nice=10, cpu_budget=0.3):
+        self.enabled = enabled
+        self.cores = cores
+        self.nice = nice
+        self.cpu_budget = cpu_budget
+        self.usage = 0.0  # fraction of one core over the last window, all threads
+        self.render_usage = 0.0  # the same for the thread calling throttle()
+        self.stretched_s = 0.0
+        self._window_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        self._render_start = time.thread_time()
+        self._shown = None
+        self._text = None
+
+    def apply(self):
+        if not self.enabled:
+            return
+        if hasattr(os, 'sched_setaffinity'):
+            self._apply_linux()
+        elif sys.platform == 'win32':
+            self._apply_windows()
+        else:
+            print('Low-impact mode: affinity and priority not supported here, only the CPU budget applies')
+
+    def _apply_linux(self):
+        threads = _thread_ids()
+        try:
+            if self.cores:
+                for tid in threads:
+                    os.sched_setaffinity(tid, self.cores)
+            for tid in threads:
+                # Only ever lowered, raising it back needs privileges
+                if os.getpriority(os.PRIO_PROCESS, tid) < self.nice:
+                    os.setpriority(os.PRIO_PROCESS, tid, self.nice)
+        except OSError as e:
+            print(f'Low-impact mode: {e}')
+            return
+        print(f'Low-impact mode: {len(threads)} threads on cores {sorted(os.sched_getaffinity(0))}, '
+              f'nice {self.nice}, CPU budget {self.cpu_budget:.0%} of a core')
+
+    def _apply_windows(self):
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        process = kernel32.GetCurrentProcess()
+        if self.cores and not kernel32.SetProcessAffinityMask(process, sum(1 << core for core in self.cores)):
+            print(f'Low-impact mode: cores {self.cores} not set, error {kernel32.GetLastError()}')
+        priority = IDLE_PRIORITY_CLASS if self.nice >= 15 else BELOW_NORMAL_PRIORITY_CLASS
+        if self.nice > 0 and not kernel32.SetPriorityClass(process, priority):
+            print(f'Low-impact mode: priority not lowered, error {kernel32.GetLastError()}')
+        print(f'Low-impact mode: cores {self.cores or "all"}, '
+              f'{"idle" if priority == IDLE_PRIORITY_CLASS else "below normal"} priority, '
+              f'CPU budget {self.cpu_budget:.0%} of a core')
+
+    def throttle(self):
+        # Call once per frame after the frame wait
+        now = time.perf_counter()
+        render = time.thread_time()
+        elapsed = now - self._window_start
+        if elapsed >= WINDOW_S:
+            cpu = time.process_time()
+            self.usage = (cpu - self._cpu_start) / elapsed
+            self.render_usage = (render - self._render_start) / elapsed
+            self._window_start = now
+            self._cpu_start = cpu
+            self._render_start = render
+            return
+        if not self.enabled or self.cpu_budget <= 0:
+            return
+        # The wall time this window's render CPU time is allowed to take
+        owed = (render - self._render_start) / self.cpu_budget - elapsed
+        if owed > 0:
+            owed = owed if owed < MAX_STRETCH_S else MAX_STRETCH_S
+            time.sleep(owed)
+            self.stretched_s += owed
+
+    def draw(self, screen, font, x, y):
+        # Re-rendered when a shown tenth of a percent changes, twice a second at most
+        shown = int(self.usage * 1000) * 10000 + int(self.render_usage * 1000)
+        if shown != self._shown:
+            self._shown = shown
+            self._text = font.render(f'CPU {self.usage:.1%}, drawing {self.render_usage:.1%}', True, (150, 150, 150))
+        screen.blit(self._text, (x, y))
+
+
+def _spin(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def _worker(core, seconds, result):
+    # The stand-in for the sim: counts as fast as it can on `core`
+    os.sched_setaffinity(0, [core])
+    end = time.perf_counter() + seconds
+    count = 0
+    while time.perf_counter() < end:
+        for _ in range(10000):
+            count += 1
+    result.value = count
+
+
+def _dash(low_impact, seconds, work_ms, rate):
+    # The stand-in for the dashboard: work_ms of CPU per frame at `rate` Hz
+    low_impact.apply()
+    frame_s = 1.0 / rate
+    end = time.perf_counter() + seconds
+    frames = 0
+    while time.perf_counter() < end:
+        start = time.perf_counter()
+        _spin(work_ms / 1000)
+        frames += 1
+        left = frame_s - (time.perf_counter() - start)
+        if left > 0:
+            time.sleep(left)
+        low_impact.throttle()
+    return frames
+
+
+if __name__ == '__main__':
+    import multiprocessing
+
+    if not hasattr(os, 'sched_setaffinity'):
+        sys.exit('the benchmark needs Linux')
+    core = sorted(os.sched_getaffinity(0))[-1]
+    seconds = 5.0
+    work_ms, rate = 6.0, 60
+    results = []
+    for name, low_impact in (('no dashboard', None),
+                             ('dashboard', LowImpact(False, [core])),
+                             ('low-impact dashboard', LowImpact(True, [core], 10, 0.1))):
+        count = multiprocessing.Value('q', 0)
+        worker = multiprocessing.Process(target=_worker, args=(core, seconds, count))
+        worker.start()
+        frames = 0
+        if low_impact is not None:
+            os.sched_setaffinity(0, [core])  # same core as the worker, like a sim on a busy PC
+            frames = _dash(low_impact, seconds, work_ms, rate)
+        worker.join()
+        results.append((name, count.value, frames, low_impact))
+    baseline = results[0][1]
+    print(f'CPU-bound job sharing core {core} with a dashboard doing {work_ms} ms of work per frame at {rate} Hz:')
+    for name, count, frames, low_impact in results:
+        line = f'  {name:<22} job at {count / baseline:6.1%}'
+        if low_impact is not None:
+            line += (f', dashboard at {frames / seconds:5.1f} fps using {low_impact.usage:5.1%} of a core, '
+                     f'{low_impact.render_usage:5.1%} in the render loop')
+        print(line)
@@ -0,0 +1,188 @@
+import os
+import queue
+import sqlite3
+import threading
+import zlib
+from array import array
+
+# Personal bests and reference traces per (sim, track, car), kept in a local
+# SQLite file. The best-time index is read by a background thread at startup,
+# traces are only fetched and decompressed when a session asks for them.
+# A save only ever replaces a slower stored time, so a run submitted before
+# the index has loaded can't overwrite a better best.
+
+TRACE_STEP_M = 10.0
+MAX_STAGE_M = 100000.0
+
+
+class ReferenceTrace:
+    def __init__(self, step_m, times, xs=None, zs=None):
+        self.step_m = step_m
+        self.times = times  # array('i') of elapsed ms at every step_m of distance
+        # array('f') map position at the same steps, None for traces saved
+        # before positions were kept
+        self.xs = xs
+        self.zs = zs
+
+    def time_at(self, distance_m):
+        times = self.times
+        if not times or distance_m <= 0:
+            return 0
+        pos = distance_m / self.step_m
+        i = int(pos)
+        if i >= len(times) - 1:
+            return times[-1]
+        return times[i] + (times[i + 1] - times[i]) * (pos - i)
+
+    def encode(self):
+        # Consecutive times differ by a few hundred ms at most, so the deltas
+        # compress far better than the raw values
+        deltas = array('i', self.times)
+        for i in range(len(deltas) - 1, 0, -1):
+            deltas[i] -= deltas[i - 1]
+        return zlib.compress(deltas.tobytes(), 9)
+
+    def encode_path(self):
+        if self.xs is None:
+            return None
+        return zlib.compress(self.xs.tobytes() + self.zs.tobytes(), 9)
+
+    @classmethod
+    def decode(cls, step_m, blob, path=None):
+        times = array('i')
+        times.frombytes(zlib.decompress(blob))
+        for i in range(1, len(times)):
+            times[i] += times[i - 1]
+        xs = zs = None
+        if path:
+            xs = array('f')
+            xs.frombytes(zlib.decompress(path))
+            zs = xs[len(xs) // 2:]
+            del xs[len(xs) // 2:]
+        return cls(step_m, times, xs, zs)
+
+
+class TraceRecorder:
+    # Builds a reference trace while driving: one preallocated slot per step
+    def __init__(self, step_m=TRACE_STEP_M, max_distance_m=MAX_STAGE_M):
+        self.step_m = step_m
+        self.times = array('i', [0]) * (int(max_distance_m / step_m) + 1)
+        self.xs = array('f', [0.0]) * len(self.times)
+        self.zs = array('f', [0.0]) * len(self.times)
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.last_distance = 0.0
+        self.last_ms = 0.0
+        self.last_x = self.last_z = 0.0
+        self.complete = True  # stays True only if we saw the run from the start
+
+    def update(self, distance_m, elapsed_ms, x=0.0, z=0.0):
+        if self.count == 0 and (distance_m > self.step_m or elapsed_ms > 1000):
+            self.complete = False
+        next_m = self.count * self.step_m
+        while distance_m >= next_m and self.count < len(self.times):
+            if distance_m > self.last_distance:
+                fraction = max(0.0, (next_m - self.last_distance) / (distance_m - self.last_distance))
+                self.times[self.count] = int(self.last_ms + (elapsed_ms - self.last_ms) * fraction)
+                self.xs[self.count] = self.last_x + (x - self.last_x) * fraction
+                self.zs[self.count] = self.last_z + (z - self.last_z) * fraction
+            else:
+                self.times[self.count] = int(elapsed_ms)
+                self.xs[self.count] = x
+                self.zs[self.count] = z
+            self.count += 1
+            next_m = self.count * self.step_m
+        if distance_m > self.last_distance:
+            self.last_distance = distance_m
+            self.last_ms = elapsed_ms
+            self.last_x = x
+            self.last_z = z
+
+    def trace(self):
+        return ReferenceTrace(self.step_m, self.times[:self.count], self.xs[:self.count], self.zs[:self.count])
+
+
+class PersonalBestStore:
+    def __init__(self, path):
+        self.path = os.path.expanduser(path)
+        self.bests = {}
+        self.ready = False
+        self.reference = None
+        self.reference_key = None
+        self._jobs = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def best_ms(self, key):
+        return self.bests.get(key, 0)
+
+    def request_reference(self, key):
+        # Lookup is deferred to the worker; self.reference fills in when ready
+        if key != self.reference_key:
+            self.reference_key = key
+            self.reference = None
+            self._jobs.put(('load', key))
+
+    def submit(self, key, total_ms, trace):
+        best = self.bests.get(key, 0)
+        if total_ms <= 0 or (best and total_ms >= best):
+            return False
+        self.bests[key] = total_ms
+        if key == self.reference_key:
+            self.reference = trace
+        self._jobs.put(('save', key, total_ms, trace))
+        return True
+
+    def close(self):
+        self._jobs.put(None)
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            db = sqlite3.connect(self.path)
+            db.execute('CREATE TABLE IF NOT EXISTS bests ('
+                       'sim TEXT, track TEXT, car TEXT, best_ms INTEGER, step_m REAL, trace BLOB, '
+                       'PRIMARY KEY (sim, track, car))')
+            # Map positions of the reference run, added after the first release
+            if 'path' not in [row[1] for row in db.execute('PRAGMA table_info(bests)')]:
+                db.execute('ALTER TABLE bests ADD COLUMN path BLOB')
+            for sim, track, car, best_ms in db.execute('SELECT sim, track, car, best_ms FROM bests'):
+                # A run submitted meanwhile only stays if it is faster
+                best = self.bests.get((sim, track, car), 0)
+                if not best or best_ms < best:
+                    self.bests[(sim, track, car)] = best_ms
+        except (sqlite3.Error, OSError) as e:
+            print(f'Personal best store unavailable: {e}')
+            return
+        self.ready = True
+
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            if job[0] == 'load':
+                key = job[1]
+                row = db.execute('SELECT step_m, trace, path FROM bests WHERE sim = ? AND track = ? AND car = ?',
+                                 key).fetchone()
+                if row and row[1] and key == self.reference_key and self.reference is None:
+                    self.reference = ReferenceTrace.decode(row[0], row[1], row[2])
+            elif job[0] == 'save':
+                _, key, total_ms, trace = job
+                saved = db.execute('INSERT INTO bests (sim, track, car, best_ms, step_m, trace, path) '
+                                   'VALUES (?, ?, ?, ?, ?, ?, ?) '
+                                   'ON CONFLICT (sim, track, car) DO UPDATE SET best_ms = excluded.best_ms, '
+                                   'step_m = excluded.step_m, trace = excluded.trace, path = excluded.path '
+                                   'WHERE excluded.best_ms < bests.best_ms',
+                                   (*key, total_ms, trace.step_m, trace.encode(), trace.encode_path())).rowcount
+                db.commit()
+                if not saved:
+                    # The stored best was faster after all: it stays the best and the reference
+                    row = db.execute('SELECT best_ms, step_m, trace, path FROM bests '
+                                     'WHERE sim = ? AND track = ? AND car = ?', key).fetchone()
+                    self.bests[key] = row[0]
+                    if row[2] and key == self.reference_key:
+                        self.reference = ReferenceTrace.decode(row[1], row[2], row[3])
+        db.close()
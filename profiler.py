@@ -0,0 +1,103 @@
+import cProfile
+import io
+import pstats
+import time
+from array import array
+
+import pygame
+
+# Per-section frame timers. lap(name) charges the time since the previous lap
+# to `name`; with profiling off every call returns on the first check, so the
+# timers can stay in the main loop permanently.
+
+WINDOW = 240
+
+
+class _Section:
+    __slots__ = ('ring', 'head', 'count')
+
+    def __init__(self, window):
+        self.ring = array('d', [0.0]) * window
+        self.head = 0
+        self.count = 0
+
+
+class FrameProfiler:
+    def __init__(self, enabled=False, window=WINDOW):
+        self.enabled = enabled
+        self.window = window
+        self.sections = {}
+        self.frames = 0
+        self._last = 0
+        self._capture = None
+        self._capture_left = 0
+        self._lines = []
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.sections.clear()
+        self._lines = []
+        self._last = time.perf_counter_ns()
+
+    def begin_frame(self):
+        if self._capture is not None:
+            self._capture_left -= 1
+            if self._capture_left <= 0:
+                self._finish_capture()
+        if not self.enabled:
+            return
+        self.frames += 1
+        self._last = time.perf_counter_ns()
+
+    def lap(self, name):
+        if not self.enabled:
+            return
+        now = time.perf_counter_ns()
+        section = self.sections.get(name)
+        if section is None:
+            section = self.sections[name] = _Section(self.window)
+        section.ring[section.head] = (now - self._last) / 1e6
+        section.head = (section.head + 1) % self.window
+        if section.count < self.window:
+            section.count += 1
+        self._last = now
+
+    def stats(self):
+        # (name, mean ms, max ms) over the rolling window, in first-seen order
+        result = []
+        for name, section in self.sections.items():
+            samples = section.ring[:section.count]
+            result.append((name, sum(samples) / len(samples), max(samples)))
+        return result
+
+    def capture(self, frames):
+        # cProfile the next `frames` frames, then dump a .pstats file
+        if self._capture is None:
+            self._capture = cProfile.Profile()
+            self._capture_left = frames
+            self._capture.enable()
+
+    def _finish_capture(self):
+        self._capture.disable()
+        path = time.strftime('dash_profile_%Y%m%d_%H%M%S.pstats')
+        self._capture.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(self._capture, stream=out).sort_stats('cumulative').print_stats(20)
+        print(f'Profile written to {path}\n{out.getvalue()}')
+        self._capture = None
+
+    def draw(self, screen, font, x, y):
+        if not self.enabled:
+            return
+        # Text is re-rendered twice a second, not every frame
+        if self.frames % 30 == 1 or not self._lines:
+            stats = self.stats()
+            total = sum(mean for name, mean, _ in stats if name != 'wait')
+            lines = [f'frame {total:6.2f} ms']
+            lines += [f'{name:<10}{mean:6.2f} {peak:6.2f}' for name, mean, peak in stats]
+            self._lines = [font.render(line, True, (255, 255, 0)) for line in lines]
+        height = sum(line.get_height() for line in self._lines)
+        pygame.draw.rect(screen, (0, 0, 0), (x, y, 200, height + 8))
+        for line in self._lines:
+            screen.blit(line, (x + 4, y + 4))
+            y += line.get_height()
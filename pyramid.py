@@ -0,0 +1,198 @@
+import glob
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+
+# Min/max/mean pyramids for recorded sessions. Level k summarises every 2**k
+# samples of each channel, so a screen-width summary of any time range reads
+# at most a couple of blocks per pixel instead of every sample underneath.
+# Levels start at BASE_LEVEL; finer summaries are cheaper to read raw.
+# While building, each level streams to its own <pyramid>.L<k> file; close()
+# merges them into <pyramid>.tmp and renames that into place, so a pyramid
+# either exists whole or not at all. A build that died leaves its temporary
+# files behind, and the next builder for the same path removes them, e.g.
+# python pyramid.py run.simrec after a crash.
+
+MAGIC = b'SIMPYR1\n'
+BASE_LEVEL = 4
+
+
+class _Level:
+    def __init__(self, path, channel_count):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.mins = array('d', [math.inf]) * channel_count
+        self.maxs = array('d', [-math.inf]) * channel_count
+        self.sums = array('d', [0.0]) * channel_count
+        self.samples = 0   # raw samples folded into the open block
+        self.children = 0  # blocks (or raw samples) folded into the open block
+        self.blocks = 0
+        self.block = struct.Struct('<' + 'fff' * channel_count)
+        self.out = array('f', [0.0]) * (3 * channel_count)
+
+
+class PyramidBuilder:
+    # Streaming: add() is amortised O(channels) per sample, like a binary counter
+    def __init__(self, path, channel_count, base_level=BASE_LEVEL):
+        self.path = path
+        self.channel_count = channel_count
+        self.base_level = base_level
+        self.levels = []
+        for leftover in glob.glob(glob.escape(path) + '.L*') + glob.glob(glob.escape(path) + '.tmp'):
+            os.remove(leftover)
+
+    def add(self, values):
+        level = self._level(0)
+        for c in range(self.channel_count):
+            v = values[c]
+            if v < level.mins[c]:
+                level.mins[c] = v
+            if v > level.maxs[c]:
+                level.maxs[c] = v
+            level.sums[c] += v
+        level.samples += 1
+        level.children += 1
+        if level.children == 1 << self.base_level:
+            self._emit(0)
+
+    def _level(self, index):
+        if index == len(self.levels):
+            self.levels.append(_Level(f'{self.path}.L{self.base_level + index}', self.channel_count))
+        return self.levels[index]
+
+    def _emit(self, index):
+        level = self.levels[index]
+        out = level.out
+        for c in range(self.channel_count):
+            out[3 * c] = level.mins[c]
+            out[3 * c + 1] = level.maxs[c]
+            out[3 * c + 2] = level.sums[c] / level.samples
+        level.file.write(out.tobytes())
+        level.blocks += 1
+
+        parent = self._level(index + 1)
+        for c in range(self.channel_count):
+            if level.mins[c] < parent.mins[c]:
+                parent.mins[c] = level.mins[c]
+            if level.maxs[c] > parent.maxs[c]:
+                parent.maxs[c] = level.maxs[c]
+            parent.sums[c] += level.sums[c]
+            level.mins[c] = math.inf
+            level.maxs[c] = -math.inf
+            level.sums[c] = 0.0
+        parent.samples += level.samples
+        parent.children += 1
+        level.samples = 0
+        level.children = 0
+        if parent.children == 2:
+            self._emit(index + 1)
+
+    def close(self):
+        # Flush partial blocks, drop the empty top level, then merge the
+        # per-level files into one with an offset table in the header
+        for index in range(len(self.levels)):
+            if self.levels[index].children:
+                self._emit(index)
+        levels = [level for level in self.levels if level.blocks]
+        for level in self.levels:
+            level.file.close()
+
+        table = []
+        offset = 0
+        for index, level in enumerate(levels):
+            table.append({'level': self.base_level + index, 'blocks': level.blocks, 'offset': offset})
+            offset += level.blocks * level.block.size
+        header = json.dumps({'channel_count': self.channel_count, 'base_level': self.base_level,
+                             'levels': table}).encode()
+        with open(self.path + '.tmp', 'wb') as out:
+            out.write(MAGIC + struct.pack('<I', len(header)) + header)
+            for level in levels:
+                with open(level.path, 'rb') as f:
+                    while chunk := f.read(1 << 20):
+                        out.write(chunk)
+        os.replace(self.path + '.tmp', self.path)
+        for level in self.levels:
+            os.remove(level.path)
+
+
+class PyramidReader:
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a pyramid file')
+        (length,) = struct.unpack('<I', self.file.read(4))
+        header = json.loads(self.file.read(length))
+        self.data_offset = len(MAGIC) + 4 + length
+        self.channel_count = header['channel_count']
+        self.base_level = header['base_level']
+        self.levels = header['levels']
+        self.block = struct.Struct('<' + 'fff' * self.channel_count)
+
+    def close(self):
+        self.file.close()
+
+    def read_blocks(self, level, first, count):
+        info = self.levels[level - self.base_level]
+        count = max(0, min(count, info['blocks'] - first))
+        self.file.seek(self.data_offset + info['offset'] + first * self.block.size)
+        data = array('f')
+        data.frombytes(self.file.read(count * self.block.size))
+        return data
+
+    def summary(self, recording, channel, start, stop, width):
+        # (mins, maxs, means) for records [start, stop) folded into `width` columns
+        c = recording.channels.index(channel)
+        span = max(1, stop - start)
+        width = max(1, min(width, span))
+        level = int(math.log2(span / width))
+        top = self.base_level + len(self.levels) - 1
+
+        if level < self.base_level or not self.levels:
+            blocks = [(v, v, v) for v in recording.read_channel(channel, start, span)]
+        else:
+            level = min(level, top)
+            size = 1 << level
+            first = start // size
+            data = self.read_blocks(level, first, (stop - 1) // size - first + 1)
+            n = self.channel_count * 3
+            blocks = [(data[i + 3 * c], data[i + 3 * c + 1], data[i + 3 * c + 2]) for i in range(0, len(data), n)]
+
+        count = len(blocks)
+        width = min(width, count)
+        mins = array('f', [0.0]) * width
+        maxs = array('f', [0.0]) * width
+        means = array('f', [0.0]) * width
+        for px in range(width):
+            a = px * count // width
+            b = max(a + 1, (px + 1) * count // width)
+            group = blocks[a:b]
+            mins[px] = min(g[0] for g in group)
+            maxs[px] = max(g[1] for g in group)
+            means[px] = sum(g[2] for g in group) / len(group)
+        return mins, maxs, means
+
+
+def pyramid_path(recording_path):
+    return os.path.splitext(recording_path)[0] + '.simpyr'
+
+
+def build_pyramid(recording_path, chunk_records=65536):
+    # Post-pass for recordings made without a live builder
+    from recorder import SessionReader
+
+    recording = SessionReader(recording_path)
+    builder = PyramidBuilder(pyramid_path(recording_path), len(recording.channels))
+    for start in range(0, recording.count, chunk_records):
+        for record in recording.read(start, chunk_records):
+            builder.add(record[1:])
+    builder.close()
+    recording.close()
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        build_pyramid(path)
+        print(f'{pyramid_path(path)} written')
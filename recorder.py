@@ -0,0 +1,125 @@
+import json
+import os
+import struct
+import time
+from array import array
+
+from pyramid import PyramidBuilder, pyramid_path
+from session_index import IndexBuilder, index_path
+
+# Binary session recordings: a JSON header followed by fixed-size records of
+# one float64 session time and one float32 per channel. Record i sits at
+# data_offset + i * record_size, so any sample is one seek away.
+
+MAGIC = b'SIMREC1\n'
+
+# Same channel set for every sim so the analysis tools never need to care
+CHANNELS = (
+    'stage_time_ms', 'stage_distance_m', 'stage_progress', 'laps',
+    'speed_kmh', 'rpm', 'gear', 'throttle', 'brake', 'steer',
+    'fuel', 'tyre_wear', 'engine_damage', 'suspension_damage',
+    'pos_x', 'pos_y', 'pos_z', 'acc_lat_g', 'acc_long_g', 'acc_vert_g',
+)
+
+
+def recording_name(sim, track, car):
+    safe = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in f'{sim}_{track}_{car}')
+    return f'{safe}_{time.strftime("%Y%m%d_%H%M%S")}.simrec'
+
+
+class SessionRecorder:
+    def __init__(self, path, sim, track='', car='', channels=CHANNELS):
+        self.path = path
+        self.channels = tuple(channels)
+        self.record = struct.Struct('<d' + 'f' * len(self.channels))
+        header = json.dumps({
+            'sim': sim, 'track': track, 'car': car,
+            'channels': self.channels, 'started': time.time(),
+        }).encode()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + struct.pack('<I', len(header)) + header)
+        self.pyramid = PyramidBuilder(pyramid_path(path), len(self.channels))
+        self.index = IndexBuilder(index_path(path))
+        self.count = 0
+        # write_frame() packs into this buffer; the view hands the same
+        # values to the pyramid without building a tuple
+        self._buffer = bytearray(self.record.size)
+        self._values = memoryview(self._buffer)[8:].cast('f')
+
+    def write(self, t, values):
+        self._file.write(self.record.pack(t, *values))
+        self.pyramid.add(values)
+        self.count += 1
+
+    def mark(self, t, kind, wheel=-1, value=0.0):
+        # An event from outside the frame, e.g. a detector event or a finish
+        # the sim reports separately, at the next record
+        self.index.mark(t, self.count, kind, wheel, value)
+
+    def write_frame(self, t, f):
+        # TelemetryFrame in CHANNELS order
+        self.record.pack_into(
+            self._buffer, 0, t,
+            f.current_ms, f.stage_distance, f.position, f.laps,
+            f.speed_kmh, f.rpm, f.gear, f.throttle, f.brake, f.steer,
+            f.fuel, f.tyre_wear_avg, f.engine_dmg, f.susp_dmg_max,
+            f.pos[0], f.pos[1], f.pos[2], f.acc_g[0], f.acc_g[2], f.acc_g[1],
+        )
+        self._file.write(self._buffer)
+        self.pyramid.add(self._values)
+        self.index.update(t, self.count, f.current_ms, f.laps, f.gear, f.last_ms)
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+        self.pyramid.close()
+        self.index.close()
+
+
+class SessionReader:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        if self.file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{path} is not a session recording')
+        (length,) = struct.unpack('<I', self.file.read(4))
+        self.header = json.loads(self.file.read(length))
+        self.channels = self.header['channels']
+        self.record = struct.Struct('<d' + 'f' * len(self.channels))
+        self.data_offset = len(MAGIC) + 4 + length
+        self.count = (os.path.getsize(path) - self.data_offset) // self.record.size
+
+    def close(self):
+        self.file.close()
+
+    def read(self, start, count):
+        # Records as (t, *channels) tuples
+        return list(self.record.iter_unpack(self.read_bytes(start, count)))
+
+    def read_bytes(self, start, count):
+        # Raw packed records, for numpy.frombuffer and friends
+        count = max(0, min(count, self.count - start))
+        self.file.seek(self.data_offset + start * self.record.size)
+        return self.file.read(count * self.record.size)
+
+    def read_channel(self, channel, start, count):
+        c = self.channels.index(channel) + 1
+        return array('f', (record[c] for record in self.read(start, count)))
+
+    def time_at(self, index):
+        self.file.seek(self.data_offset + index * self.record.size)
+        return struct.unpack('<d', self.file.read(8))[0]
+
+    def index_at_time(self, t, lo=0, hi=None):
+        # Binary search over the record times, one 8-byte read per probe;
+        # SessionIndex.record_at narrows [lo, hi) to two keyframes first
+        if hi is None:
+            hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.time_at(mid) < t:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+
+from detectors import WHEELS
+
+# Side index for session recordings, written next to the .simrec while
+# recording. It holds a keyframe every KEYFRAME_S seconds (session time and
+# record number) and an event list: stage starts when the stage timer starts
+# or jumps back, finishes when the completed-lap count moves, gear shifts and the
+# detector events. Entries are fixed-size and appended as they happen, so an
+# interrupted session still leaves a usable index. Readers bisect the loaded
+# index instead of probing the recording, then start from the keyframe.
+
+MAGIC = b'SIMIDX1\n'
+KEYFRAME_S = 1.0
+
+KINDS = ('keyframe', 'stage_start', 'finish', 'shift',
+         'lockup', 'wheelspin', 'puncture', 'off', 'impact', 'damage')
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# session time, record number, kind, wheel (-1 = whole car), value
+ENTRY = struct.Struct('<dIBbxxf')
+
+
+def index_path(recording_path):
+    return os.path.splitext(recording_path)[0] + '.simidx'
+
+
+class IndexBuilder:
+    def __init__(self, path, keyframe_s=KEYFRAME_S):
+        self.path = path
+        self.keyframe_s = keyframe_s
+        self.next_keyframe = 0.0
+        self.stage_ms = -1
+        self.laps = -1
+        self.gear = None
+        self.file = open(path, 'wb')
+        header = json.dumps({'kinds': KINDS, 'keyframe_s': keyframe_s}).encode()
+        self.file.write(MAGIC + struct.pack('<I', len(header)) + header)
+
+    def mark(self, t, record, kind, wheel=-1, value=0.0):
+        self.file.write(ENTRY.pack(t, record, KIND_CODES[kind], wheel, value))
+
+    def update(self, t, record, stage_ms, laps, gear, finish_ms):
+        # Called for every record written; only changes cost anything
+        if t >= self.next_keyframe:
+            self.mark(t, record, 'keyframe')
+            self.next_keyframe = t + self.keyframe_s
+        # The timer starts running, or jumps back on a restart
+        if 0 < stage_ms and (stage_ms < self.stage_ms or self.stage_ms <= 0):
+            self.mark(t, record, 'stage_start')
+        self.stage_ms = stage_ms
+        if laps != self.laps:
+            if self.laps >= 0 and laps > self.laps:
+                self.mark(t, record, 'finish', -1, finish_ms)
+            self.laps = laps
+        if gear != self.gear:
+            if self.gear is not None:
+                self.mark(t, record, 'shift', -1, gear)
+            self.gear = gear
+
+    def close(self):
+        self.file.close()
+
+
+class SessionIndex:
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'{path} is not a session index')
+            (length,) = struct.unpack('<I', f.read(4))
+            header = json.loads(f.read(length))
+            data = f.read()
+        kinds = header['kinds']
+        self.keyframe_times = array('d')
+        self.keyframe_records = array('I')
+        events = []
+        # A torn last entry from a crash is ignored
+        usable = len(data) - len(data) % ENTRY.size
+        for t, record, code, wheel, value in ENTRY.iter_unpack(data[:usable]):
+            kind = kinds[code]
+            if kind == 'keyframe':
+                self.keyframe_times.append(t)
+                self.keyframe_records.append(record)
+            else:
+                events.append((t, record, kind, wheel, value))
+        # Detector events carry the time they started, which can be a
+        # little before the record they were written with
+        events.sort(key=lambda event: event[0])
+        self.events = events
+        self.event_times = array('d', (event[0] for event in events))
+
+    def keyframe_before(self, t):
+        # (time, record) of the last keyframe at or before t
+        i = bisect_right(self.keyframe_times, t) - 1
+        if i < 0:
+            return 0.0, 0
+        return self.keyframe_times[i], self.keyframe_records[i]
+
+    def record_at(self, recording, t):
+        # First record at or after t: bisects the keyframes in memory, then
+        # searches only the records between two keyframes
+        i = bisect_right(self.keyframe_times, t) - 1
+        lo = self.keyframe_records[i] if i >= 0 else 0
+        hi = self.keyframe_records[i + 1] + 1 if i + 1 < len(self.keyframe_records) else recording.count
+        return recording.index_at_time(t, lo, min(hi, recording.count))
+
+    def find(self, kind=None, start_s=None, end_s=None):
+        # Events as (time, record, kind, wheel, value) in [start_s, end_s)
+        lo = bisect_left(self.event_times, start_s) if start_s is not None else 0
+        hi = bisect_left(self.event_times, end_s) if end_s is not None else len(self.events)
+        return [event for event in self.events[lo:hi] if kind is None or event[2] == kind]
+
+    def stages(self):
+        # (start time, finish time or None) for every stage in the recording
+        stages = []
+        for t, _, kind, _, _ in self.events:
+            if kind == 'stage_start':
+                stages.append([t, None])
+            elif kind == 'finish' and stages and stages[-1][1] is None:
+                stages[-1][1] = t
+        return [tuple(stage) for stage in stages]
+
+
+def build_index(recording_path, chunk_records=65536):
+    # Post-pass for recordings made without a live index; the detector events
+    # only exist live, so these have keyframes, stages and shifts
+    from recorder import SessionReader
+
+    recording = SessionReader(recording_path)
+    stage = recording.channels.index('stage_time_ms') + 1
+    laps = recording.channels.index('laps') + 1
+    gear = recording.channels.index('gear') + 1
+    builder = IndexBuilder(index_path(recording_path))
+    previous_ms = 0
+    for start in range(0, recording.count, chunk_records):
+        for i, record in enumerate(recording.read(start, chunk_records)):
+            builder.update(record[0], start + i, record[stage], int(record[laps]), int(record[gear]), previous_ms)
+            previous_ms = record[stage]
+    builder.close()
+    recording.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='List the events of a session recording')
+    parser.add_argument('recording')
+    parser.add_argument('-k', '--kind', choices=KINDS[1:])
+    parser.add_argument('--start', type=float, help='session time in seconds')
+    parser.add_argument('--end', type=float, help='session time in seconds')
+    parser.add_argument('--rebuild', action='store_true', help='rebuild the index from the recording')
+    args = parser.parse_args()
+
+    path = index_path(args.recording)
+    if args.rebuild or not os.path.exists(path):
+        build_index(args.recording)
+        print(f'{path} written')
+    index = SessionIndex(path)
+    for t, record, kind, wheel, value in index.find(args.kind, args.start, args.end):
+        where = f' {WHEELS[wheel]}' if wheel >= 0 else ''
+        print(f'{t:10.3f} s  record {record:8}  {kind}{where} {value:g}')
+
+
+if __name__ == '__main__':
+    main()
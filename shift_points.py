@@ -0,0 +1,209 @@
+import json
+import os
+import sys
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Per-car shift points learned from telemetry. Longitudinal acceleration at
+# full throttle is binned by rpm for every gear, along with each gear's
+# speed/rpm ratio. The best upshift from gear g is the lowest rpm past g's
+# strongest pull where g accelerates no harder than g + 1 would at the rpm it
+# lands on after the shift; a gear that never crosses over is revved out.
+# Live samples come from the ingest thread, one bin increment per tick, and
+# the fit runs at most every REFIT_S seconds. Recordings are binned in one go
+# with numpy: python shift_points.py run1.simrec run2.simrec [--save]
+
+BIN_RPM = 100
+BINS = 160          # up to 16000 rpm
+GEARS = 10          # gear 1 to 9, index 0 unused
+MIN_THROTTLE = 0.95
+MIN_SPEED_KMH = 15.0
+MIN_SAMPLES = 5     # per bin before its mean is trusted
+REFIT_S = 2.0
+ROUND_RPM = 50
+STORE_PATH = r"~\Documents\Sim-Dashboard\shift_points.json"
+
+
+class ShiftModel:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.shift_rpm = (0,) * GEARS  # 0 = not known yet
+        self.last_fit = 0.0
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.sums = [array('d', [0.0]) * BINS for _ in range(GEARS)]
+            self.counts = [array('i', [0]) * BINS for _ in range(GEARS)]
+            self.ratio_sums = array('d', [0.0]) * GEARS  # km/h per rpm
+            self.ratio_counts = array('i', [0]) * GEARS
+        self.shift_rpm = (0,) * GEARS
+
+    def update(self, frame, t):
+        # One tick from the ingest thread
+        gear = frame.gear
+        rpm = frame.rpm
+        speed = frame.speed_kmh
+        if (gear < 1 or gear >= GEARS or rpm <= 0 or frame.throttle < MIN_THROTTLE or frame.brake > 0.05
+                or speed < MIN_SPEED_KMH):
+            return
+        b = rpm // BIN_RPM
+        if b >= BINS:
+            return
+        with self.lock:
+            self.sums[gear][b] += frame.acc_g[2]  # longitudinal, forward positive
+            self.counts[gear][b] += 1
+            self.ratio_sums[gear] += speed / rpm
+            self.ratio_counts[gear] += 1
+        if t - self.last_fit > REFIT_S:
+            self.last_fit = t
+            self.refit()
+
+    def add_samples(self, rpm, gear, acc_long, speed, throttle, brake):
+        # numpy arrays from a recording, binned without a Python loop
+        rpm = np.asarray(rpm, dtype=np.float64)
+        gear = np.asarray(gear).astype(np.int64)
+        keep = ((gear >= 1) & (gear < GEARS) & (rpm > 0) & (np.asarray(throttle) >= MIN_THROTTLE)
+                & (np.asarray(brake) <= 0.05) & (np.asarray(speed) >= MIN_SPEED_KMH) & (rpm < BINS * BIN_RPM))
+        rpm, gear = rpm[keep], gear[keep]
+        acc = np.asarray(acc_long, dtype=np.float64)[keep]
+        speed = np.asarray(speed, dtype=np.float64)[keep]
+        cell = gear * BINS + (rpm // BIN_RPM).astype(np.int64)
+        sums = np.bincount(cell, weights=acc, minlength=GEARS * BINS).reshape(GEARS, BINS)
+        counts = np.bincount(cell, minlength=GEARS * BINS).reshape(GEARS, BINS)
+        ratio_sums = np.bincount(gear, weights=speed / rpm, minlength=GEARS)
+        ratio_counts = np.bincount(gear, minlength=GEARS)
+        with self.lock:
+            for g in range(GEARS):
+                for b in np.flatnonzero(counts[g]):
+                    self.sums[g][b] += sums[g, b]
+                    self.counts[g][b] += int(counts[g, b])
+                self.ratio_sums[g] += ratio_sums[g]
+                self.ratio_counts[g] += int(ratio_counts[g])
+        self.refit()
+
+    def _mean(self, gear, b):
+        n = self.counts[gear][b]
+        return self.sums[gear][b] / n if n >= MIN_SAMPLES else None
+
+    def refit(self):
+        shift = [0] * GEARS
+        for g in range(1, GEARS - 1):
+            if self.ratio_counts[g] == 0 or self.ratio_counts[g + 1] == 0:
+                continue
+            # rpm after the shift at the same road speed
+            drop = ((self.ratio_sums[g] / self.ratio_counts[g]) /
+                    (self.ratio_sums[g + 1] / self.ratio_counts[g + 1]))
+            bins = [b for b in range(BINS) if self.counts[g][b] >= MIN_SAMPLES]
+            if not bins:
+                continue
+            peak = max(bins, key=lambda b: self._mean(g, b))
+            best = bins[-1]  # rev it out unless the next gear pulls harder sooner
+            for b in bins:
+                if b < peak:
+                    continue
+                landing = int((b + 0.5) * drop)
+                if landing >= BINS:
+                    continue
+                next_acc = self._mean(g + 1, landing)
+                if next_acc is not None and self._mean(g, b) <= next_acc:
+                    best = b
+                    break
+            shift[g] = int(round((best + 0.5) * BIN_RPM / ROUND_RPM)) * ROUND_RPM
+        self.shift_rpm = tuple(shift)  # replaced whole, readers never see half a fit
+
+    def to_json(self):
+        with self.lock:
+            return {
+                'sums': [[round(v, 4) for v in s] for s in self.sums],
+                'counts': [list(c) for c in self.counts],
+                'ratio_sums': list(self.ratio_sums),
+                'ratio_counts': list(self.ratio_counts),
+            }
+
+    def load_json(self, data):
+        self.clear()
+        with self.lock:
+            for g in range(min(GEARS, len(data['counts']))):
+                for b in range(min(BINS, len(data['counts'][g]))):
+                    self.sums[g][b] = data['sums'][g][b]
+                    self.counts[g][b] = data['counts'][g][b]
+                self.ratio_sums[g] = data['ratio_sums'][g]
+                self.ratio_counts[g] = data['ratio_counts'][g]
+        self.refit()
+
+
+class ShiftPointStore:
+    # Learned data per car in a small JSON file, loaded when a car is known
+    def __init__(self, path=STORE_PATH):
+        self.path = os.path.expanduser(path)
+        self.model = ShiftModel()
+        self.key = None
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self.cars = json.load(f)
+        except (OSError, ValueError):
+            self.cars = {}
+
+    def select(self, sim, car):
+        key = f'{sim}|{car}'
+        if key == self.key:
+            return
+        if self.key is not None:
+            self.cars[self.key] = self.model.to_json()
+        self.key = key
+        if key in self.cars:
+            self.model.load_json(self.cars[key])
+        else:
+            self.model.clear()
+
+    def save(self):
+        if self.key is None:
+            return
+        self.cars[self.key] = self.model.to_json()
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self.cars, f)
+        except OSError as e:
+            print(f'Shift points not saved: {e}')
+
+
+def fit_recordings(paths, model):
+    from recorder import SessionReader
+
+    for path in paths:
+        recording = SessionReader(path)
+        dtype = np.dtype([('t', '<f8')] + [(name, '<f4') for name in recording.channels])
+        records = np.memmap(path, dtype=dtype, mode='r', offset=recording.data_offset, shape=(recording.count,))
+        model.add_samples(records['rpm'], records['gear'], records['acc_long_g'], records['speed_kmh'],
+                          records['throttle'], records['brake'])
+        recording.close()
+
+
+if __name__ == '__main__':
+    if np is None:
+        sys.exit('fitting recordings needs numpy')
+    paths = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not paths:
+        sys.exit('usage: python shift_points.py recording.simrec [...] [--save]')
+    from recorder import SessionReader
+
+    # The store keys its model by sim and car, which the header carries
+    recording = SessionReader(paths[0])
+    header = recording.header
+    recording.close()
+    store = ShiftPointStore()
+    store.select(header['sim'], header['car'])
+    fit_recordings(paths, store.model)
+    for gear, rpm in enumerate(store.model.shift_rpm):
+        if rpm:
+            print(f'gear {gear} -> {gear + 1}: shift at {rpm} rpm')
+    if '--save' in sys.argv:
+        store.save()
+        print(f'{store.path} updated for {store.key}')
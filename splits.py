@@ -0,0 +1,131 @@
+from array import array
+
+import pygame
+
+# Split timing for a stage cut into equal-distance segments.
+# Everything lives in fixed-size arrays that are allocated once, so update()
+# is O(1) per packet and never scans history.
+
+BEST_COLOR = (180, 0, 255)
+FASTER_COLOR = (0, 255, 0)
+SLOWER_COLOR = (255, 100, 100)
+EVEN_COLOR = (255, 255, 0)
+UNTIMED_COLOR = (120, 120, 120)
+TICK_COLOR = (0, 0, 0)
+
+_scratch = pygame.Rect(0, 0, 0, 0)
+
+
+class SegmentTimer:
+    def __init__(self, segment_count):
+        self.segment_count = segment_count
+        self.times = array('i', [0]) * segment_count   # this run, 0 = not timed
+        self.deltas = array('i', [0]) * segment_count  # vs best at the moment of crossing
+        self.new_best = array('b', [0]) * segment_count
+        self.best = array('i', [0]) * segment_count
+        self.best_count = 0
+        self.theoretical_best_ms = 0
+        self.live_delta_ms = 0
+        self.live_valid = False
+        self.reset()
+
+    def reset(self):
+        for i in range(self.segment_count):
+            self.times[i] = 0
+            self.deltas[i] = 0
+            self.new_best[i] = 0
+        self.index = 0
+        self.segment_start_ms = 0.0
+        self.last_position = 0.0
+        self.last_ms = 0.0
+        self.synced = False
+        self.partial = False
+        self.live_valid = False
+
+    def theoretical_best_valid(self):
+        return self.best_count == self.segment_count
+
+    def update(self, position, elapsed_ms):
+        n = self.segment_count
+        if position < 0:
+            position = 0.0
+        if elapsed_ms < self.last_ms or position < self.last_position - 0.5:
+            self.reset()
+
+        if not self.synced:
+            # Joining mid-segment (dash started late) leaves that segment untimed
+            self.index = min(int(position * n), n)
+            self.partial = position * n - self.index > 0.01
+            self.segment_start_ms = elapsed_ms
+            self.synced = True
+        elif self.index < n and position > self.last_position:
+            boundary = (self.index + 1) / n
+            while position >= boundary:
+                # Interpolate the crossing time between the two packets
+                fraction = (boundary - self.last_position) / (position - self.last_position)
+                self._close_segment(self.last_ms + (elapsed_ms - self.last_ms) * fraction)
+                if self.index == n:
+                    break
+                boundary = (self.index + 1) / n
+
+        self.last_position = position
+        self.last_ms = elapsed_ms
+
+        if self.index < n and not self.partial and self.best[self.index] > 0:
+            done = position * n - self.index
+            self.live_delta_ms = int(elapsed_ms - self.segment_start_ms - self.best[self.index] * done)
+            self.live_valid = True
+        else:
+            self.live_valid = False
+
+    def finish(self, total_ms):
+        # The final boundary is the finish line, which the sim reports as a
+        # lap/stage completion rather than a position of exactly 1.0
+        if self.synced and self.index == self.segment_count - 1:
+            self._close_segment(total_ms)
+        self.index = self.segment_count
+        self.last_ms = total_ms
+        self.live_valid = False
+
+    def _close_segment(self, crossed_ms):
+        i = self.index
+        if self.partial:
+            self.partial = False
+        else:
+            seg_ms = int(crossed_ms - self.segment_start_ms)
+            best = self.best[i]
+            self.times[i] = seg_ms
+            self.deltas[i] = seg_ms - best if best else 0
+            if best == 0 or seg_ms < best:
+                if best == 0:
+                    self.best_count += 1
+                self.theoretical_best_ms += seg_ms - best
+                self.best[i] = seg_ms
+                self.new_best[i] = 1
+        self.segment_start_ms = crossed_ms
+        self.index = i + 1
+
+
+def segment_color(timer, i):
+    if timer.times[i] == 0:
+        return UNTIMED_COLOR
+    if timer.new_best[i]:
+        return BEST_COLOR
+    delta = timer.deltas[i]
+    return FASTER_COLOR if delta < 0 else EVEN_COLOR if delta == 0 else SLOWER_COLOR
+
+
+def draw_segment_bar(screen, timer, bar_x, bar_y, bar_width, bar_height):
+    # Colours each finished segment of the progress bar and ticks the boundaries
+    n = timer.segment_count
+    rect = _scratch
+    rect.y = bar_y
+    rect.height = bar_height
+    for i in range(min(timer.index, n)):
+        rect.x = bar_x + bar_width * i // n
+        rect.width = bar_x + bar_width * (i + 1) // n - rect.x
+        pygame.draw.rect(screen, segment_color(timer, i), rect)
+    rect.width = 2
+    for i in range(1, n):
+        rect.x = bar_x + bar_width * i // n - 1
+        pygame.draw.rect(screen, TICK_COLOR, rect)
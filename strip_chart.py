@@ -0,0 +1,106 @@
+from array import array
+
+import pygame
+
+# Rolling strip chart over a fixed-capacity ring buffer. Each frame the chart
+# surface is scrolled left and only the newest columns are drawn, so the cost
+# per frame stays the same however many seconds the chart holds.
+
+BACKGROUND = (15, 15, 15)
+BORDER = (60, 60, 60)
+
+# Throttle, brake, speed and steering, read from TelemetryFrame attributes
+INPUT_TRACES = (
+    ('THR', (0, 255, 0), 0.0, 1.0, 'throttle'),
+    ('BRK', (255, 0, 0), 0.0, 1.0, 'brake'),
+    ('SPD', (255, 255, 255), 0.0, 250.0, 'speed_kmh'),
+    ('STR', (255, 200, 0), -1.0, 1.0, 'steer'),
+)
+
+
+class StripChart:
+    def __init__(self, rect, seconds, rate, traces):
+        # traces: sequence of (label, colour, low, high, frame attribute)
+        self.rect = pygame.Rect(rect)
+        self.traces = traces
+        self.capacity = max(2, int(seconds * rate))
+        self.buffers = [array('f', [0.0]) * self.capacity for _ in traces]
+        self.head = 0
+        self.count = 0
+        self.pending = 0
+        self.columns_per_sample = self.rect.width / self.capacity
+        self.scroll_debt = 0.0
+        self.surface = pygame.Surface(self.rect.size)
+        self.surface.fill(BACKGROUND)
+        self.last_x = self.rect.width - 1.0
+        self.last_y = array('f', [self.rect.height - 1.0]) * len(traces)
+        self.labels = None
+        # Reused line endpoints and label position, nothing is allocated per sample
+        self._start = [0.0, 0.0]
+        self._end = [0.0, 0.0]
+        self._label_pos = pygame.Rect(0, 0, 0, 0)
+
+    def push(self, *values):
+        for i, buffer in enumerate(self.buffers):
+            buffer[self.head] = values[i]
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        self.pending += 1
+
+    def push_frame(self, frame):
+        head = self.head
+        for i, buffer in enumerate(self.buffers):
+            buffer[head] = getattr(frame, self.traces[i][4])
+        self.head = (head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.pending += 1
+
+    def _y(self, trace, value):
+        _, _, low, high, _ = self.traces[trace]
+        ratio = (value - low) / (high - low)
+        ratio = 0.0 if ratio < 0 else 1.0 if ratio > 1 else ratio
+        return (self.rect.height - 1) * (1.0 - ratio)
+
+    def _advance(self):
+        # Scroll by whole columns and clear what scrolled in from the right
+        self.scroll_debt += self.pending * self.columns_per_sample
+        columns = int(self.scroll_debt)
+        self.scroll_debt -= columns
+        if columns:
+            self.surface.scroll(-columns, 0)
+            self.surface.fill(BACKGROUND, (self.rect.width - columns, 0, columns, self.rect.height))
+            self.last_x -= columns
+
+        width = self.rect.width
+        new = self.pending
+        self.pending = 0
+        start = self._start
+        end = self._end
+        for k in range(new, 0, -1):
+            index = (self.head - k) % self.capacity
+            x = width - 1 - (k - 1) * self.columns_per_sample - self.scroll_debt
+            start[0] = self.last_x
+            end[0] = x
+            for t, buffer in enumerate(self.buffers):
+                y = self._y(t, buffer[index])
+                start[1] = self.last_y[t]
+                end[1] = y
+                pygame.draw.line(self.surface, self.traces[t][1], start, end)
+                self.last_y[t] = y
+            self.last_x = x
+
+    def draw(self, screen, font=None):
+        if self.pending:
+            self._advance()
+        screen.blit(self.surface, self.rect)
+        pygame.draw.rect(screen, BORDER, self.rect, 1)
+        if font is not None:
+            if self.labels is None:
+                self.labels = [font.render(trace[0], True, trace[1]) for trace in self.traces]
+            pos = self._label_pos
+            pos.x = self.rect.x + 4
+            pos.y = self.rect.y + 2
+            for text in self.labels:
+                screen.blit(text, pos)
+                pos.x += text.get_width() + 8
@@ -0,0 +1,205 @@
+import gc
+import time
+import tracemalloc
+from array import array
+from ctypes import memmove
+
+# One preallocated TelemetryFrame per dashboard. Sim readers overwrite its
+# fields in place every packet and the layout draws straight from it, so the
+# main loop never builds dicts, tuples or slices to move telemetry around.
+# Per-wheel and vector channels are float32 arrays filled by memmove from the
+# shared-memory page.
+
+
+class TelemetryFrame:
+    __slots__ = (
+        'packet_id', 'speed_kmh', 'rpm', 'max_rpm', 'gear', 'throttle', 'brake', 'steer',
+        'fuel', 'max_fuel', 'current_ms', 'best_ms', 'last_ms', 'laps', 'position', 'distance_m',
+        'tc', 'abs', 'tyres_out', 'engine_dmg', 'tyre_wear_avg', 'susp_dmg_max',
+        'tyre_wear', 'tyre_temp', 'tyre_pressure', 'wheel_load', 'wheel_slip', 'wheel_speed',
+        'camber', 'susp_travel', 'tyre_radius', 'car_damage', 'acc_g', 'pos',
+        # Filled by the derived channels from the values above
+        'stage_distance', 'progress_percent', 'delta_ms', 'delta_valid', 'estimated_ms',
+        'pace_factor', 'rpm_ratio', 'speed_display', 'distance_display', 'fuel_range_display', 'shift_rpm',
+        'shift_ratio', 'shift_light',
+        # Filled by the predictor in the ingest thread
+        'fuel_range_m', 'fuel_laps', 'tyre_wear_end', 'tyre_wear_avg_end',
+    )
+
+    def __init__(self):
+        self.packet_id = 0
+        self.speed_kmh = self.throttle = self.brake = self.steer = 0.0
+        self.rpm = self.max_rpm = self.gear = 0
+        self.fuel = self.max_fuel = 0.0
+        self.current_ms = self.best_ms = self.last_ms = self.laps = 0
+        self.position = self.distance_m = 0.0
+        self.tc = self.abs = 0.0
+        self.tyres_out = 0
+        self.engine_dmg = self.tyre_wear_avg = self.susp_dmg_max = 0.0  # percent
+        self.tyre_wear = array('f', [0.0]) * 4
+        self.tyre_temp = array('f', [0.0]) * 4
+        self.tyre_pressure = array('f', [0.0]) * 4
+        self.wheel_load = array('f', [0.0]) * 4
+        self.wheel_slip = array('f', [0.0]) * 4
+        self.wheel_speed = array('f', [0.0]) * 4  # tyre surface speed, m/s
+        self.camber = array('f', [0.0]) * 4
+        self.susp_travel = array('f', [0.0]) * 4
+        self.tyre_radius = array('f', [0.0]) * 4
+        self.car_damage = array('f', [0.0]) * 5
+        self.acc_g = array('f', [0.0]) * 3  # lateral, vertical, longitudinal, AC axis order
+        self.pos = array('f', [0.0]) * 3
+        self.stage_distance = 0.0
+        self.progress_percent = 0.0
+        self.delta_ms = 0
+        self.delta_valid = False
+        self.estimated_ms = 0
+        self.pace_factor = 0.0
+        self.rpm_ratio = 0.0
+        self.speed_display = 0.0  # mph or km/h
+        self.distance_display = 0.0  # miles or km
+        self.fuel_range_display = -1.0
+        self.shift_rpm = 0  # learned upshift point for this gear, 0 = not known
+        self.shift_ratio = 0.95  # the same as a fraction of max_rpm
+        self.shift_light = False
+        self.fuel_range_m = -1.0  # -1 = not known yet
+        self.fuel_laps = -1.0
+        self.tyre_wear_end = array('f', [-1.0]) * 4  # projected at the end of the lap or stage
+        self.tyre_wear_avg_end = -1.0
+
+    def copy_from(self, other):
+        for name in SCALARS:
+            setattr(self, name, getattr(other, name))
+        for name in ARRAYS:
+            getattr(self, name)[:] = getattr(other, name)
+
+
+ARRAYS = tuple(name for name in TelemetryFrame.__slots__ if isinstance(getattr(TelemetryFrame(), name), array))
+SCALARS = tuple(name for name in TelemetryFrame.__slots__ if name not in ARRAYS)
+
+
+class AcReader:
+    # Fills a TelemetryFrame from the AC shared-memory pages. The fields come
+    # from the layout's channel map: scalars are read through ctypes objects
+    # pinned at their offsets, array channels are memmoved straight into the
+    # frame's arrays
+    def __init__(self, info, frame, poll_interval=0.0005):
+        self.frame = frame
+        self.poll_interval = poll_interval
+        self.last_packet_id = -1
+        self.packet_id = info.accessor('physics.packetId')
+        self.static_max_rpm = info.accessor('static.maxRpm')
+        scalars = []
+        copies = []
+        for name, ref in info.layout.channels.items():
+            if name not in TelemetryFrame.__slots__:
+                raise ValueError(f'{info.layout.path}: {name} is not a TelemetryFrame field')
+            if name in ARRAYS:
+                address, size = info.address(ref)
+                target = getattr(frame, name)
+                # (destination, source, bytes), never more than the frame holds
+                copies.append((target.buffer_info()[0], address, min(size, len(target) * target.itemsize)))
+            else:
+                scalars.append((name, info.accessor(ref)))
+        self.scalars = tuple(scalars)
+        self.copies = tuple(copies)
+
+    def poll(self):
+        # AC bumps packetId every physics step
+        packet_id = self.packet_id.value
+        if packet_id == self.last_packet_id:
+            time.sleep(self.poll_interval)
+            return False
+        self.last_packet_id = packet_id
+        return True
+
+    def read(self):
+        f = self.frame
+        for name, field in self.scalars:
+            setattr(f, name, field.value)
+        for target, source, size in self.copies:
+            memmove(target, source, size)
+        f.gear -= 1  # AC counts reverse as 0
+        if f.position < 0:
+            f.position = 0.0
+        speed = f.wheel_speed
+        radius = f.tyre_radius
+        for w in range(4):
+            speed[w] *= radius[w]  # rad/s to m/s
+
+        # Fall back to the highest rpm seen when the car doesn't report one
+        static_max = self.static_max_rpm.value
+        if static_max > 0:
+            f.max_rpm = static_max
+        elif f.rpm > f.max_rpm:
+            f.max_rpm = f.rpm
+
+        damage = f.car_damage
+        f.engine_dmg = damage[0] * 100
+        susp = damage[2]
+        if damage[3] > susp:
+            susp = damage[3]
+        if damage[4] > susp:
+            susp = damage[4]
+        f.susp_dmg_max = susp * 100
+        wear = f.tyre_wear
+        f.tyre_wear_avg = (wear[0] + wear[1] + wear[2] + wear[3]) / 4
+
+
+class GcPolicy:
+    # Automatic collection is switched off for the session. Everything alive
+    # after startup is frozen out of the collector's reach, young objects are
+    # collected between frames once enough have piled up, and full collections
+    # wait until the dash has been idle for a while.
+    def __init__(self, enabled=True, young_limit=700, full_interval_s=10.0):
+        self.enabled = enabled
+        self.young_limit = young_limit
+        self.full_interval_s = full_interval_s
+        self.last_full = time.monotonic()
+
+    def start(self):
+        if not self.enabled:
+            return
+        gc.collect()
+        gc.freeze()
+        gc.disable()
+
+    def safe_point(self, idle=False):
+        # Call between flip() and the frame wait
+        if not self.enabled:
+            return
+        young, middle, _ = gc.get_count()
+        if idle:
+            now = time.monotonic()
+            if now - self.last_full > self.full_interval_s:
+                gc.collect()
+                self.last_full = now
+        elif young > self.young_limit:
+            gc.collect(1 if middle >= 10 else 0)
+
+    def stop(self):
+        if self.enabled:
+            gc.enable()
+
+
+def measure_allocations(step, frames=300, warmup=60):
+    # Runs step() `frames` times after a warmup and reports the net bytes
+    # still held per frame, the largest transient allocation seen inside a
+    # frame, and the net growth of gc-tracked objects per frame
+    for _ in range(warmup):
+        step()
+    gc.collect()
+    tracemalloc.start()
+    start_young = gc.get_count()[0]
+    start, _ = tracemalloc.get_traced_memory()
+    peak = 0
+    for _ in range(frames):
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        step()
+        _, frame_peak = tracemalloc.get_traced_memory()
+        if frame_peak - before > peak:
+            peak = frame_peak - before
+    end, _ = tracemalloc.get_traced_memory()
+    young = gc.get_count()[0] - start_young
+    tracemalloc.stop()
+    return (end - start) / frames, peak, young / frames
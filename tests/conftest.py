@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The dashboard modules are top-level scripts; pygame draws on a headless display
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
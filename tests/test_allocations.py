@@ -0,0 +1,40 @@
+import pygame
+import pytest
+
+from dash_layout import DashLayout
+from profiler import FrameProfiler
+from splits import SegmentTimer
+from strip_chart import INPUT_TRACES, StripChart
+from telemetry import TelemetryFrame, measure_allocations
+
+
+@pytest.fixture
+def screen():
+    pygame.init()
+    yield pygame.display.set_mode((1024, 600))
+    pygame.quit()
+
+
+def test_steady_state_frame_does_not_allocate(screen):
+    # Identical telemetry every frame, drawn through the full layout
+    frame = TelemetryFrame()
+    frame.speed_kmh, frame.rpm, frame.max_rpm, frame.gear = 123.4, 6200, 8000, 3
+    frame.speed_display, frame.rpm_ratio, frame.distance_display = 76.7, 0.775, 2.68
+    frame.throttle, frame.brake, frame.steer = 0.8, 0.1, -0.2
+    frame.current_ms, frame.distance_m, frame.position = 83456, 4321.0, 0.43
+    frame.progress_percent, frame.delta_ms, frame.delta_valid = 43.0, -512, True
+    frame.engine_dmg, frame.tyre_wear_avg, frame.susp_dmg_max, frame.tc = 12.0, 96.0, 4.0, 0.3
+    segments = SegmentTimer(10)
+    segments.update(0.0, 0)
+    segments.update(0.43, 83456)
+    traces = StripChart((10, 182, 360, 70), 10, 60, INPUT_TRACES)
+    layout = DashLayout(screen, True, segments, traces, FrameProfiler(False))
+
+    def step():
+        screen.fill((0, 0, 0))
+        layout.draw(frame)
+
+    held, peak, young = measure_allocations(step)
+    assert held <= 16, f'{held:.1f} B held per frame'
+    assert peak <= 4096, f'{peak} B peak in a frame'
+    assert young <= 0.5, f'{young:.2f} gc objects per frame'
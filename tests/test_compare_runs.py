@@ -0,0 +1,22 @@
+import pytest
+
+from recorder import SessionRecorder
+from telemetry import TelemetryFrame
+
+pytest.importorskip('numpy')
+from compare_runs import load_stage  # noqa: E402
+
+
+def test_stage_out_of_range_names_the_stage_count(tmp_path):
+    # Two stages: the timer goes back to zero halfway through
+    path = str(tmp_path / 'run.simrec')
+    recorder = SessionRecorder(path, 'wrc', 'track', 'car')
+    frame = TelemetryFrame()
+    for i in range(200):
+        frame.current_ms, frame.stage_distance = (i % 100) * 10 + 10, (i % 100) * 5.0
+        recorder.write_frame(i * 0.01, frame)
+    recorder.close()
+    assert len(load_stage(path, 1)['distance']) == 100
+    for stage in (2, -1):
+        with pytest.raises(ValueError, match='stages recorded: 2'):
+            load_stage(path, stage)
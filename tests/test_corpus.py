@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from recorder import SessionRecorder
+from session_index import ENTRY, KIND_CODES, index_path
+from telemetry import TelemetryFrame
+
+pytest.importorskip('numpy')
+from corpus import Corpus  # noqa: E402
+
+
+def _record(path):
+    recorder = SessionRecorder(path, 'wrc', 'track', 'car')
+    frame = TelemetryFrame()
+    for i in range(200):
+        frame.current_ms, frame.speed_kmh, frame.position = i * 10, 80, i / 400
+        recorder.write_frame(i * 0.01, frame)
+    recorder.close()
+
+
+def test_changed_index_alone_reanalyses(tmp_path):
+    # The finish markers live in the .simidx: a rewritten index with the
+    # recording untouched must still refresh the row
+    runs = tmp_path / 'runs'
+    runs.mkdir()
+    path = str(runs / 'a.simrec')
+    _record(path)
+    corpus = Corpus(str(tmp_path / 'corpus.db'))
+    assert corpus.scan(str(runs), 1) == (1, 1, 0, 0)
+    assert corpus.query()[0]['finished'] == 0
+    assert corpus.scan(str(runs), 1) == (1, 0, 0, 0)
+
+    with open(index_path(path), 'ab') as f:
+        f.write(ENTRY.pack(1.99, 199, KIND_CODES['finish'], -1, 1990.0))
+    stat = os.stat(index_path(path))
+    os.utime(index_path(path), (stat.st_atime, stat.st_mtime + 10))
+    assert corpus.scan(str(runs), 1) == (1, 1, 0, 0)
+    assert corpus.query()[0]['finished'] == 1
+
+    # Only the mtime moves: hashed, found unchanged, touched
+    os.utime(index_path(path), (stat.st_atime, stat.st_mtime + 20))
+    assert corpus.scan(str(runs), 1) == (1, 0, 1, 0)
+    corpus.close()
+
+
+def test_scan_spelling_and_sibling_directories(tmp_path):
+    runs, sibling = tmp_path / 'runs', tmp_path / 'runs2'
+    runs.mkdir()
+    sibling.mkdir()
+    _record(str(runs / 'a.simrec'))
+    _record(str(sibling / 'b.simrec'))
+    corpus = Corpus(str(tmp_path / 'corpus.db'))
+    corpus.scan(str(runs), 1)
+    corpus.scan(str(sibling), 1)
+    # Another spelling of the same directory finds the same rows
+    os.symlink(runs, tmp_path / 'link')
+    assert corpus.scan(str(tmp_path / 'link') + os.sep, 1) == (1, 0, 0, 0)
+    # Emptying runs must not drop runs2's session
+    os.remove(runs / 'a.simrec')
+    assert corpus.scan(str(runs), 1) == (0, 0, 0, 1)
+    assert [os.path.basename(row['path']) for row in corpus.query()] == ['b.simrec']
+    corpus.close()
@@ -0,0 +1,35 @@
+from derived import DerivedChannels
+from telemetry import TelemetryFrame
+
+
+def test_channels_and_shift_light():
+    frame = TelemetryFrame()
+    derived = DerivedChannels([('tyre_temp_max', ('tyre_temp',), max)], freedom_units=True)
+    derived.set('best_lap_ms', 200000)
+    frame.current_ms, frame.position, frame.distance_m = 50000, 0.2, 2000.0
+    frame.rpm, frame.max_rpm, frame.speed_kmh = 6000, 8000, 160.9
+    frame.tyre_temp[2] = 85.0
+    derived.update(frame)
+    assert frame.delta_ms == 10000 and frame.delta_valid
+    assert frame.estimated_ms == 250000 and abs(frame.pace_factor - 1.25) < 1e-9
+    assert frame.rpm_ratio == 0.75 and abs(frame.speed_display - 100.0) < 1e-3
+    assert derived.values['tyre_temp_max'] == 85.0
+    assert frame.shift_ratio == 0.95 and not frame.shift_light
+    derived.set('shift_points', (0, 5600, 6000))
+    frame.gear = 1
+    derived.update(frame)
+    assert frame.shift_rpm == 5600 and frame.shift_ratio == 0.7 and frame.shift_light
+    frame.gear = 3
+    derived.update(frame)
+    assert frame.shift_rpm == 0 and not frame.shift_light
+
+
+def test_unrelated_change_recomputes_nothing():
+    frame = TelemetryFrame()
+    calls = [0]
+    derived = DerivedChannels([('counted', ('rpm',), lambda rpm: calls.__setitem__(0, calls[0] + 1) or rpm)])
+    derived.update(frame)
+    for i in range(1000):
+        frame.throttle = i / 1000
+        derived.update(frame)
+    assert calls[0] == 1
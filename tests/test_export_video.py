@@ -0,0 +1,44 @@
+import os
+
+import pygame
+
+from export_video import export_video
+from recorder import SessionRecorder
+from telemetry import TelemetryFrame
+
+ALERT_RED = (255, 60, 60)
+
+
+def _frames(directory):
+    names = sorted(os.listdir(directory))
+    return names, [pygame.image.tobytes(pygame.image.load(os.path.join(directory, name)), 'RGB') for name in names]
+
+
+def _shows_alert(directory, name):
+    image = pygame.image.load(os.path.join(directory, name))
+    return any(image.get_at((x, y))[:3] == ALERT_RED for x in range(250, 550) for y in range(20, 60))
+
+
+def test_chunked_render_matches_single_worker_across_a_seam(tmp_path):
+    # An impact half a second before the 10 s chunk seam: its alert is still up
+    # when the second chunk starts and must stay up, as in one long render
+    path = str(tmp_path / 'run.simrec')
+    recorder = SessionRecorder(path, 'ac', 'track', 'car')
+    frame = TelemetryFrame()
+    for i in range(1501):
+        t = i * 0.01
+        frame.current_ms, frame.position, frame.stage_distance = int(t * 1000), t / 15, t * 30
+        frame.speed_kmh, frame.rpm, frame.gear, frame.fuel = 100, 5000, 3, 40
+        recorder.write_frame(t, frame)
+        if i == 950:
+            recorder.mark(9.5, 'impact', -1, 5.0)
+    recorder.close()
+
+    chunked, single = str(tmp_path / 'chunked') + os.sep, str(tmp_path / 'single') + os.sep
+    export_video(path, chunked, 5, start_s=8, end_s=13, workers=2, chunk_seconds=2)
+    export_video(path, single, 5, start_s=8, end_s=13, workers=1, chunk_seconds=1000)
+
+    names, chunked_frames = _frames(chunked)
+    assert (names, chunked_frames) == _frames(single)
+    seam = names[10]
+    assert _shows_alert(chunked, seam) and not _shows_alert(chunked, names[-1])
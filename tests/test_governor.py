@@ -0,0 +1,22 @@
+import time
+
+from governor import LEVELS, FrameGovernor
+
+
+def test_slows_low_priority_widgets_when_over_budget_and_recovers():
+    governor = FrameGovernor(60, {'damage': 5, 'progress': 10})
+    drawn = {'damage': 0, 'progress': 0, 'gear': 0}
+    # One second fine, one second overloaded, then fine again long enough to recover
+    frames = 120 + (LEVELS + 1) * governor.recover_frames
+    for frame in range(frames):
+        governor.begin_frame()
+        for name in drawn:
+            drawn[name] += governor.due(name)
+        time.sleep(0.015 if 60 <= frame < 120 else 0.002)
+        governor.end_frame()
+        if frame == 59:
+            assert drawn == {'damage': 5, 'progress': 10, 'gear': 60}
+        if frame == 119:
+            assert governor.level > 0
+    assert drawn['gear'] == frames
+    assert governor.level == 0
@@ -0,0 +1,62 @@
+from predictor import SAMPLE_M, SERIES, Predictor
+from telemetry import TelemetryFrame
+
+
+def _driver(frame, predictor):
+    # 1 km laps, 0.2 fuel per km, each tyre losing 1-4 % per km
+    frame.fuel = 30.0
+
+    def drive(metres):
+        frame.distance_m += metres
+        frame.laps, frame.position = divmod(frame.distance_m / 1000.0, 1.0)
+        frame.laps = int(frame.laps)
+        frame.fuel = 30.0 - frame.distance_m * 0.0002
+        for w in range(4):
+            frame.tyre_wear[w] = 100.0 - frame.distance_m * (w + 1) * 0.001
+        frame.tyre_wear_avg = sum(frame.tyre_wear) / 4
+        predictor.update(frame, 0.0)
+    return drive
+
+
+def test_predicts_fuel_and_wear_then_restarts_on_refuel():
+    frame = TelemetryFrame()
+    predictor = Predictor()
+    drive = _driver(frame, predictor)
+    for _ in range(50246):
+        drive(0.5)  # 25.123 km in 0.5 m ticks
+    expected_range = frame.fuel / 0.0002
+    # Predictions are as of the last sample, up to SAMPLE_M back
+    assert abs(frame.fuel_range_m - expected_range) < SAMPLE_M, frame.fuel_range_m
+    assert abs(frame.fuel_laps - expected_range / 1000) < 0.01
+    for w in range(4):
+        assert abs(frame.tyre_wear_end[w] - (100.0 - 26000 * (w + 1) * 0.001)) < 0.01  # at the end of lap 26
+    frame.fuel += 10
+    predictor.update(frame, 0.0)
+    assert frame.fuel_range_m == -1.0
+
+
+def test_running_sums_match_the_ring_after_many_wraps():
+    frame = TelemetryFrame()
+    predictor = Predictor()
+    drive = _driver(frame, predictor)
+    # Seven laps of the ring and a bit, short of the tyres wearing out
+    for _ in range(7 * predictor.size * 20 + 7):
+        drive(0.5)
+    assert predictor.count == predictor.size
+    xs = predictor.xs
+    assert abs(predictor.sum_x - sum(xs)) <= 1e-9 * sum(xs)
+    assert abs(predictor.sum_xx - sum(x * x for x in xs)) <= 1e-9 * predictor.sum_xx
+    for k in range(SERIES):
+        exact = sum(x * y for x, y in zip(xs, predictor.ys[k]))
+        assert abs(predictor.sum_xy[k] - exact) <= 1e-9 * abs(exact)
+
+
+def test_tyre_change_restarts_in_percent_and_fraction():
+    for scale in (1.0, 0.01):
+        predictor = Predictor()
+        for i in range(1000):
+            predictor.add(i * 1.0, 30.0 - i * 0.0002, [(100.0 - i * 0.01) * scale] * 4, (100.0 - i * 0.01) * scale,
+                          i / 1000)
+        assert predictor.valid
+        predictor.add(1000.0, 29.8, [100.0 * scale] * 4, 100.0 * scale, 1.0)
+        assert not predictor.valid and predictor.count == 0
@@ -0,0 +1,50 @@
+import pygame
+import pytest
+
+from dash_layout import PANEL_RECT
+from telemetry import TelemetryFrame
+from tyre_panel import TEMP, TyrePanel
+
+# The aggregator keeps its per-wheel buffers in numpy arrays
+pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def panel():
+    pygame.font.init()
+    yield TyrePanel(PANEL_RECT)
+    pygame.font.quit()
+
+
+def test_reduces_every_tick_between_draws(panel):
+    # 333 Hz physics under a 60 Hz dash: about 5.5 ticks per frame
+    frame = TelemetryFrame()
+    aggregator = panel.aggregator
+    for tick in range(6):
+        for w in range(4):
+            frame.tyre_temp[w] = 70 + 10 * w + tick
+            frame.tyre_pressure[w] = 27.5
+            frame.wheel_load[w] = 3000 + 500 * w
+            frame.wheel_slip[w] = 2.0 if w == 2 and tick % 2 else 0.1
+            frame.camber[w] = -0.035
+        aggregator.update(frame, 0.0)
+    aggregator.collect()
+    assert aggregator.ticks == 6
+    assert aggregator.mins[TEMP, 1] == 80 and aggregator.maxs[TEMP, 1] == 85
+    assert abs(aggregator.means[TEMP, 3] - 102.5) < 1e-4
+    assert aggregator.slip_duty[2] == 0.5 and aggregator.slip_duty[0] == 0.0
+    panel.draw(pygame.Surface((1024, 600)), frame)
+
+
+def test_ticks_while_hidden_do_not_count(panel):
+    frame = TelemetryFrame()
+    aggregator = panel.aggregator
+    aggregator.set_active(False)
+    frame.tyre_temp[1] = 200.0
+    for _ in range(100):
+        aggregator.update(frame, 0.0)
+    aggregator.set_active(True)
+    assert not aggregator.collect() and aggregator.ticks == 0
+    frame.tyre_temp[1] = 90.0
+    aggregator.update(frame, 0.0)
+    assert aggregator.collect() and aggregator.ticks == 1 and aggregator.maxs[TEMP, 1] == 90
@@ -0,0 +1,123 @@
+import base64
+import json
+import socket
+import struct
+import threading
+import time
+import urllib.request
+
+import pytest
+
+from telemetry import TelemetryFrame
+from web_dash import FIELDS, RECORD, WebDashboard
+
+
+def _connect(port, hz):
+    # Minimal WebSocket client
+    client = socket.create_connection(('127.0.0.1', port))
+    key = base64.b64encode(b'0123456789abcdef').decode('ascii')
+    client.sendall((f'GET /stream?hz={hz} HTTP/1.1\r\nHost: localhost\r\nUpgrade: websocket\r\n'
+                    f'Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n')
+                   .encode('ascii'))
+    response = b''
+    while b'\r\n\r\n' not in response:
+        response += client.recv(1)
+    assert response.startswith(b'HTTP/1.1 101'), response
+    return client
+
+
+def _read_frame(client):
+    def exactly(n):
+        data = b''
+        while len(data) < n:
+            chunk = client.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError('closed')
+            data += chunk
+        return data
+
+    _, length = exactly(2)
+    if length == 126:
+        length = struct.unpack('!H', exactly(2))[0]
+    return exactly(length)
+
+
+@pytest.fixture
+def dashboard():
+    dashboard = WebDashboard(port=0)
+    dashboard.start()
+    yield dashboard
+    dashboard.stop()
+
+
+def test_serves_page_and_field_layout(dashboard):
+    page = urllib.request.urlopen(f'http://127.0.0.1:{dashboard.port}/').read()
+    assert b'WebSocket' in page
+    layout = json.loads(urllib.request.urlopen(f'http://127.0.0.1:{dashboard.port}/fields.json').read())
+    assert layout['size'] == RECORD.size
+
+
+def test_float_in_integer_field_is_rounded(dashboard):
+    # A custom channel may hand a float to an integer field
+    frame = TelemetryFrame()
+    dashboard.clients = 1
+    frame.delta_ms = -123.6
+    dashboard.publish(frame)
+    assert RECORD.unpack(dashboard.latest[1])[[name for name, _ in FIELDS].index('delta_ms')] == -124
+    dashboard.clients = 0
+
+
+def test_clients_get_newest_record_at_their_own_rate(dashboard):
+    # A fast and a throttled client against a publisher running at physics
+    # rate, plus one client that never reads
+    frame = TelemetryFrame()
+    stalled = _connect(dashboard.port, 60)
+    stalled.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    fast = _connect(dashboard.port, 60)
+    slow = _connect(dashboard.port, 5)
+    while dashboard.clients < 3:
+        time.sleep(0.01)
+
+    publish_times = []
+    stop = threading.Event()
+
+    def publisher():
+        i = 0
+        while not stop.is_set():
+            i += 1
+            frame.packet_id = i
+            frame.speed_display = i * 0.1
+            start = time.perf_counter()
+            dashboard.publish(frame)
+            publish_times.append(time.perf_counter() - start)
+            time.sleep(0.002)
+
+    thread = threading.Thread(target=publisher)
+    thread.start()
+    received = {'fast': [], 'slow': []}
+
+    def reader(name, client):
+        client.settimeout(0.5)
+        end = time.monotonic() + 2.0
+        try:
+            while time.monotonic() < end:
+                received[name].append(RECORD.unpack(_read_frame(client))[0])
+        except (socket.timeout, ConnectionError):
+            pass
+
+    readers = [threading.Thread(target=reader, args=(name, client)) for name, client in (('fast', fast), ('slow', slow))]
+    for r in readers:
+        r.start()
+    for r in readers:
+        r.join()
+    stop.set()
+    thread.join()
+    for client in (stalled, fast, slow):
+        client.close()
+
+    fast_ids, slow_ids = received['fast'], received['slow']
+    assert 80 <= len(fast_ids) <= 125, len(fast_ids)
+    assert 8 <= len(slow_ids) <= 12, len(slow_ids)
+    # Coalesced: each record is the newest one, never a backlog
+    assert slow_ids == sorted(slow_ids) and slow_ids[-1] - slow_ids[0] > len(slow_ids) * 10
+    assert max(publish_times) < 0.005
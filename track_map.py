@@ -0,0 +1,115 @@
+import pygame
+
+# Stage map drawn from the personal-best run's positions. The outline is
+# scaled and rendered once per reference into a background surface; the run
+# so far is drawn onto a copy of it one segment at a time, so a frame costs a
+# blit, a short line and the markers however long the stage is. The ghost
+# marker is where the reference run was at the same elapsed time.
+
+BACKGROUND = (15, 15, 15)
+OUTLINE = (70, 70, 70)
+TRAIL = (255, 165, 0)
+CAR = (255, 255, 255)
+GHOST = (180, 0, 255)
+START = (0, 255, 0)
+MARGIN = 6
+MIN_STEP_PX = 2  # trail points closer than this are merged into the next segment
+
+
+class TrackMap:
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.reference = None
+        self.background = None
+        self.layer = None
+        self.scale = 1.0
+        self.origin_x = self.origin_z = 0.0
+        self.ghost_index = 0
+        self.last_ms = -1
+        self.last_point = None
+        # Reused marker positions
+        self._car = [0, 0]
+        self._ghost = [0, 0]
+
+    def set_reference(self, reference):
+        # Cheap when nothing changed, call it every frame
+        if reference is self.reference:
+            return
+        self.reference = reference
+        self.background = None
+        if reference is None or reference.xs is None or len(reference.xs) < 2:
+            return
+        xs, zs = reference.xs, reference.zs
+        min_x, max_x, min_z, max_z = min(xs), max(xs), min(zs), max(zs)
+        width = self.rect.width - 2 * MARGIN
+        height = self.rect.height - 2 * MARGIN
+        span_x = max(max_x - min_x, 1.0)
+        span_z = max(max_z - min_z, 1.0)
+        self.scale = min(width / span_x, height / span_z)
+        # Centred; z grows towards the bottom of the screen like a north-up map
+        self.origin_x = min_x - (width / self.scale - span_x) / 2
+        self.origin_z = max_z + (height / self.scale - span_z) / 2
+
+        self.background = pygame.Surface(self.rect.size)
+        self.background.fill(BACKGROUND)
+        points = [self._to_screen(x, z, [0, 0]) for x, z in zip(xs, zs)]
+        pygame.draw.lines(self.background, OUTLINE, False, points, 3)
+        pygame.draw.circle(self.background, START, points[0], 4)
+        self.reset()
+
+    def reset(self):
+        # New run: the trail starts over on a clean copy of the outline
+        if self.background is not None:
+            self.layer = self.background.copy()
+        self.last_point = None
+        self.ghost_index = 0
+        self.last_ms = -1
+
+    def _to_screen(self, x, z, out):
+        out[0] = int(MARGIN + (x - self.origin_x) * self.scale)
+        out[1] = int(MARGIN + (self.origin_z - z) * self.scale)
+        return out
+
+    def draw(self, screen, frame):
+        if self.background is None:
+            return
+        elapsed = frame.current_ms
+        if elapsed < self.last_ms:
+            self.reset()
+        self.last_ms = elapsed
+
+        car = self._to_screen(frame.pos[0], frame.pos[2], self._car)
+        if self.last_point is None:
+            self.last_point = (car[0], car[1])
+        elif abs(car[0] - self.last_point[0]) + abs(car[1] - self.last_point[1]) >= MIN_STEP_PX:
+            pygame.draw.line(self.layer, TRAIL, self.last_point, car, 2)
+            self.last_point = (car[0], car[1])
+        screen.blit(self.layer, self.rect)
+
+        # Ghost: the reference's time only moves forward, so the cursor does too
+        reference = self.reference
+        times = reference.times
+        i = self.ghost_index
+        last = len(times) - 1
+        while i < last and times[i + 1] <= elapsed:
+            i += 1
+        self.ghost_index = i
+        if i < last and times[i + 1] > times[i]:
+            f = (elapsed - times[i]) / (times[i + 1] - times[i])
+            f = 0.0 if f < 0 else 1.0 if f > 1 else f
+        else:
+            f = 0.0
+        j = i + 1 if i < last else i
+        ghost = self._to_screen(reference.xs[i] + (reference.xs[j] - reference.xs[i]) * f,
+                                reference.zs[i] + (reference.zs[j] - reference.zs[i]) * f, self._ghost)
+        pygame.draw.circle(screen, GHOST, self._on_screen(ghost), 4)
+        pygame.draw.circle(screen, CAR, self._on_screen(car), 4)
+
+    def _on_screen(self, point):
+        # Map to screen coordinates, held at the edge when off the reference's map
+        rect = self.rect
+        x = point[0] if point[0] > 0 else 0
+        y = point[1] if point[1] > 0 else 0
+        point[0] = rect.x + (x if x < rect.width - 1 else rect.width - 1)
+        point[1] = rect.y + (y if y < rect.height - 1 else rect.height - 1)
+        return point
@@ -0,0 +1,229 @@
+import threading
+
+import pygame
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from detectors import WHEELS
+
+# Four-corner tyre panel. The aggregator runs in the ingest thread and copies
+# every tick's core temperature, pressure, load, slip and camber into the next
+# row of a fixed (CAPACITY, channels, 4) buffer through numpy views over the
+# frame's arrays. When the panel draws, it swaps in the spare buffer and
+# reduces the rows collected since the last draw with numpy into min, max and
+# mean per channel and wheel plus the slip duty cycle (the share of ticks over
+# SLIP_LIMIT), so nothing between two frames is missed. If more than CAPACITY
+# ticks arrive in between, the newest CAPACITY are kept. Each tile's background
+# comes from a set of pre-rendered colour tiles picked by mean core
+# temperature, and its text is cached per value, so a frame costs the same
+# handful of blits however many ticks went into it. While the panel is hidden
+# the aggregator skips ticks, and showing it again starts from an empty buffer
+# so the first draw isn't an average of ticks from before it was hidden.
+
+CHANNELS = ('tyre_temp', 'tyre_pressure', 'wheel_load', 'wheel_slip', 'camber')
+TEMP, PRESSURE, LOAD, SLIP, CAMBER = range(len(CHANNELS))
+CAPACITY = 512
+SLIP_LIMIT = 1.0
+COLD_C, OPTIMAL_C, HOT_C = 60.0, 85.0, 110.0
+COLOUR_STEPS = 32
+GAP = 2
+TEXT = (255, 255, 255)
+DETAIL = (220, 220, 220)
+SLIP_BAR = (255, 60, 60)
+BACKGROUND = (15, 15, 15)
+
+
+def temperature_colour(temp):
+    # Blue when cold, green in the window, red when overheating; darkened so text stays readable
+    if temp <= COLD_C:
+        r, g, b = 0, 80, 255
+    elif temp < OPTIMAL_C:
+        f = (temp - COLD_C) / (OPTIMAL_C - COLD_C)
+        r, g, b = 0, int(80 + 120 * f), int(255 * (1 - f))
+    elif temp < HOT_C:
+        f = (temp - OPTIMAL_C) / (HOT_C - OPTIMAL_C)
+        r, g, b = int(255 * f), int(200 * (1 - f)), 0
+    else:
+        r, g, b = 255, 0, 0
+    return (r * 45 // 100, g * 45 // 100, b * 45 // 100)
+
+
+class TyreAggregator:
+    def __init__(self, capacity=CAPACITY):
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        self.buffer = np.zeros((capacity, len(CHANNELS), 4), dtype=np.float32)
+        self.spare = np.zeros_like(self.buffer)
+        self.head = 0
+        self.count = 0
+        self.frame = None
+        self.views = ()
+        self.active = True
+        # Results of the last collect(), updated in place
+        self.ticks = 0
+        self.mins = np.zeros((len(CHANNELS), 4), dtype=np.float32)
+        self.maxs = np.zeros_like(self.mins)
+        self.means = np.zeros_like(self.mins)
+        self.slip_duty = np.zeros(4, dtype=np.float32)
+        self._slip = np.zeros((capacity, 4), dtype=np.float32)
+        self._over = np.zeros((capacity, 4), dtype=bool)
+
+    def update(self, frame, t):
+        # One tick from the ingest thread: one row, a copy per channel
+        if not self.active:
+            return
+        if frame is not self.frame:
+            self.frame = frame
+            self.views = tuple(np.frombuffer(getattr(frame, name), dtype=np.float32) for name in CHANNELS)
+        with self.lock:
+            row = self.buffer[self.head]
+            for k, view in enumerate(self.views):
+                row[k] = view
+            self.head = self.head + 1 if self.head + 1 < self.capacity else 0
+            self.count += 1
+
+    def set_active(self, active):
+        # Showing again drops whatever is left from before and the last results
+        with self.lock:
+            self.active = active
+            self.head = 0
+            self.count = 0
+            self.ticks = 0
+
+    def collect(self):
+        # Reduces the ticks since the last call; keeps the last results when none came in
+        with self.lock:
+            count = self.count
+            rows = self.buffer
+            self.buffer, self.spare = self.spare, self.buffer
+            self.head = 0
+            self.count = 0
+        if count == 0:
+            return False
+        n = count if count < self.capacity else self.capacity
+        rows = rows[:n]
+        np.min(rows, axis=0, out=self.mins)
+        np.max(rows, axis=0, out=self.maxs)
+        np.mean(rows, axis=0, out=self.means)
+        slip = self._slip[:n]
+        over = self._over[:n]
+        np.abs(rows[:, SLIP], out=slip)
+        np.greater(slip, SLIP_LIMIT, out=over)
+        np.mean(over, axis=0, out=self.slip_duty)
+        self.ticks = count
+        return True
+
+
+class TyrePanel:
+    def __init__(self, rect, aggregator=None):
+        self.rect = pygame.Rect(rect)
+        self.aggregator = aggregator or TyreAggregator()
+        self.font = pygame.font.SysFont('arial', 20, bold=True)
+        self.font_detail = pygame.font.SysFont('arial', 15)
+        width = (self.rect.width - GAP) // 2
+        height = (self.rect.height - GAP) // 2
+        self.tile_rects = tuple(pygame.Rect(self.rect.x + (w % 2) * (width + GAP),
+                                            self.rect.y + (w // 2) * (height + GAP), width, height)
+                                for w in range(4))
+        # One background per colour step between COLD_C and HOT_C
+        self.tiles = []
+        for step in range(COLOUR_STEPS):
+            tile = pygame.Surface((width, height))
+            tile.fill(temperature_colour(COLD_C + (HOT_C - COLD_C) * step / (COLOUR_STEPS - 1)))
+            self.tiles.append(tile)
+        font, detail = self.font, self.font_detail
+        # Text caches: key = temperature * 4 + wheel, and packed tenths for the detail lines
+        self.temp_text = {}
+        self.range_text = {}
+        self.load_text = {}
+        self._render_temp = lambda key: font.render(f'{WHEELS[key & 3]} {key >> 2}C', True, TEXT)
+        self._render_range = lambda key: detail.render(
+            f'{key >> 20}-{(key >> 10) & 1023}C {(key & 1023) / 10:.1f}psi', True, DETAIL)
+        self._render_load = lambda key: detail.render(
+            f'{(key >> 11) / 10:.1f}kN {((key & 2047) - 1024) / 10:+.1f}\u00b0', True, DETAIL)
+        self.text_pos = pygame.Rect(0, 0, 0, 0)
+        self.slip_bar = pygame.Rect(0, 0, 0, 4)
+
+    @staticmethod
+    def _cached(cache, render, key):
+        surface = cache.get(key)
+        if surface is None:
+            if len(cache) >= 256:
+                cache.clear()
+            surface = cache[key] = render(key)
+        return surface
+
+    def draw(self, screen, frame):
+        aggregator = self.aggregator
+        if not aggregator.collect() and aggregator.ticks == 0:
+            screen.fill(BACKGROUND, self.rect)  # nothing since it was shown
+            return
+        mins, maxs, means, duty = aggregator.mins, aggregator.maxs, aggregator.means, aggregator.slip_duty
+        screen.fill(BACKGROUND, self.rect)
+        pos = self.text_pos
+        for w, tile_rect in enumerate(self.tile_rects):
+            temp = float(means[TEMP, w])
+            step = int((temp - COLD_C) / (HOT_C - COLD_C) * (COLOUR_STEPS - 1) + 0.5)
+            screen.blit(self.tiles[0 if step < 0 else COLOUR_STEPS - 1 if step >= COLOUR_STEPS else step], tile_rect)
+
+            t = min(max(int(temp + 0.5), 0), 999)
+            pos.x, pos.y = tile_rect.x + 4, tile_rect.y + 2
+            screen.blit(self._cached(self.temp_text, self._render_temp, t * 4 + w), pos)
+            low = min(max(int(mins[TEMP, w] + 0.5), 0), 1023)
+            high = min(max(int(maxs[TEMP, w] + 0.5), 0), 1023)
+            pressure = min(max(int(means[PRESSURE, w] * 10 + 0.5), 0), 1023)
+            pos.y += 22
+            screen.blit(self._cached(self.range_text, self._render_range, (low << 20) | (high << 10) | pressure), pos)
+            load = min(max(int(means[LOAD, w] / 100 + 0.5), 0), 1023)  # tenths of a kN
+            camber = min(max(int(np.degrees(means[CAMBER, w]) * 10 + 0.5) + 1024, 0), 2047)
+            pos.y += 17
+            screen.blit(self._cached(self.load_text, self._render_load, (load << 11) | camber), pos)
+
+            bar = self.slip_bar
+            bar.width = int(tile_rect.width * float(duty[w]))
+            if bar.width > 0:
+                bar.x = tile_rect.x
+                bar.y = tile_rect.bottom - bar.height
+                screen.fill(SLIP_BAR, bar)
+
+
+def create_panel(rect):
+    # None without numpy, the dashboard then runs without the panel
+    if np is None:
+        print('The tyre panel needs numpy, not shown')
+        return None
+    return TyrePanel(rect)
+
+
+if __name__ == '__main__':
+    import os
+    import time
+
+    from dash_layout import PANEL_RECT
+    from telemetry import TelemetryFrame
+
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    pygame.font.init()
+    screen = pygame.Surface((1024, 600))
+    frame = TelemetryFrame()
+    panel = TyrePanel(PANEL_RECT)
+    aggregator = panel.aggregator
+
+    frames = 2000
+    ticks = 0.0
+    start = time.perf_counter()
+    update_s = 0.0
+    for i in range(frames):
+        t0 = time.perf_counter()
+        for _ in range(5 + i % 2):
+            frame.tyre_temp[0] = 80 + (i % 20)
+            aggregator.update(frame, 0.0)
+            ticks += 1
+        update_s += time.perf_counter() - t0
+        panel.draw(screen, frame)
+    total = time.perf_counter() - start
+    print(f'{update_s / ticks * 1e6:.2f} us per tick in the ingest thread, '
+          f'{(total - update_s) / frames * 1e6:.0f} us per drawn frame')
@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import json
+import select
+import socket
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Browser dashboard for phones and laptops. It listens on this PC only unless
+# told to serve the network, as it has no password. A stdlib
+# HTTP server hands out one static page and streams the telemetry over a
+# WebSocket as little-endian binary records, FIELDS below, described to the
+# page by /fields.json. publish() only packs the newest frame and swaps it in;
+# every client has its own sender thread that sends the latest record at most
+# `hz` times a second (?hz= on the page URL) and skips whatever it missed, so a
+# slow client only ever falls behind itself. Integer fields are rounded when
+# packed, so a custom channel replacing one of them may return a float.
+
+PORT = 8080
+RATE_HZ = 20
+MAX_RATE_HZ = 60
+SEND_TIMEOUT_S = 5.0
+
+FIELDS = (
+    ('packet_id', 'I'), ('speed_display', 'f'), ('rpm', 'i'), ('max_rpm', 'i'), ('rpm_ratio', 'f'),
+    ('gear', 'b'), ('shift_light', '?'), ('throttle', 'f'), ('brake', 'f'), ('steer', 'f'),
+    ('current_ms', 'i'), ('delta_ms', 'i'), ('delta_valid', '?'), ('estimated_ms', 'i'),
+    ('progress_percent', 'f'), ('distance_display', 'f'), ('fuel', 'f'), ('max_fuel', 'f'),
+    ('engine_dmg', 'f'), ('tyre_wear_avg', 'f'), ('susp_dmg_max', 'f'), ('tc', 'f'), ('abs', 'f'),
+)
+RECORD = struct.Struct('<' + ''.join(fmt for _, fmt in FIELDS))
+_JS_TYPES = {'I': 'Uint32', 'i': 'Int32', 'f': 'Float32', 'b': 'Int8', '?': 'Uint8'}
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+PAGE = '''<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Rallye Dashboard</title>
+<style>
+body { background: #000; color: #fff; font-family: Arial, sans-serif; margin: 0; padding: 12px; }
+.big { font-size: 18vw; font-weight: bold; line-height: 1; }
+.row { display: flex; justify-content: space-between; align-items: flex-end; }
+.label { color: #c8c8c8; font-size: 4vw; }
+.time { font-size: 8vw; font-weight: bold; }
+.bar { background: #282828; height: 5vw; margin: 8px 0; }
+.bar div { height: 100%; width: 0; }
+#status { color: #646464; font-size: 3vw; }
+</style></head>
+<body>
+<div class="row"><div><span id="speed" class="big">0</span> <span id="unit" class="label"></span></div>
+<div id="gear" class="big" style="color:#0f0">N</div></div>
+<div class="row"><div><span id="rpm" class="time">0</span> <span class="label">RPM</span></div>
+<div id="delta" class="time" style="color:#646464">+--.---</div></div>
+<div class="bar"><div id="tach" style="background:#ffa500"></div></div>
+<div class="row"><span class="label">CURRENT</span><span id="current" class="time">--:--.---</span></div>
+<div class="row"><span class="label">ESTIMATED</span><span id="estimated" class="time" style="color:#64c8ff">--:--.---</span></div>
+<div class="bar"><div id="progress" style="background:#c8c8c8"></div></div>
+<div class="row"><span class="label">FUEL</span><span class="label">TIRE <span id="wear">0</span>%
+ ENG <span id="eng">0</span>% SUSP <span id="susp">0</span>%</span></div>
+<div class="bar"><div id="fuel" style="background:#0ff"></div></div>
+<div id="status">connecting</div>
+<script>
+function time(ms) {
+  if (ms <= 0) return '--:--.---';
+  var m = Math.floor(ms / 60000), s = Math.floor(ms / 1000) % 60, r = ms % 1000;
+  return m + ':' + String(s).padStart(2, '0') + '.' + String(r).padStart(3, '0');
+}
+function text(id, value) { var e = document.getElementById(id); if (e.textContent != value) e.textContent = value; }
+fetch('fields.json').then(function (r) { return r.json(); }).then(function (layout) {
+  text('unit', layout.speed_unit);
+  function connect() {
+    var ws = new WebSocket((location.protocol == 'https:' ? 'wss://' : 'ws://') + location.host + '/stream' + location.search);
+    ws.binaryType = 'arraybuffer';
+    ws.onopen = function () { text('status', 'live'); };
+    ws.onclose = function () { text('status', 'reconnecting'); setTimeout(connect, 1000); };
+    ws.onmessage = function (message) {
+      var view = new DataView(message.data), f = {};
+      layout.fields.forEach(function (field) { f[field[0]] = view['get' + field[1]](field[2], true); });
+      text('speed', Math.floor(f.speed_display));
+      text('rpm', f.rpm);
+      var gear = document.getElementById('gear');
+      text('gear', f.gear == -1 ? 'R' : f.gear == 0 ? 'N' : f.gear);
+      gear.style.color = f.gear == -1 ? '#f00' : f.shift_light ? '#ff0' : '#0f0';
+      var delta = document.getElementById('delta');
+      if (f.delta_valid) {
+        text('delta', (f.delta_ms < 0 ? '-' : '+') + (Math.abs(f.delta_ms) / 1000).toFixed(3));
+        delta.style.color = f.delta_ms < 0 ? '#0f0' : '#ff6464';
+      } else { text('delta', '+--.---'); delta.style.color = '#646464'; }
+      text('current', time(f.current_ms));
+      text('estimated', time(f.estimated_ms));
+      text('wear', Math.round(f.tyre_wear_avg));
+      text('eng', Math.round(f.engine_dmg));
+      text('susp', Math.round(f.susp_dmg_max));
+      document.getElementById('tach').style.width = (f.rpm_ratio * 100) + '%';
+      document.getElementById('progress').style.width = f.progress_percent + '%';
+      document.getElementById('fuel').style.width = (f.max_fuel > 0 ? f.fuel / f.max_fuel * 100 : 0) + '%';
+    };
+  }
+  connect();
+});
+</script>
+</body></html>
+'''
+
+
+def field_layout():
+    # [name, DataView getter, byte offset] for every field of a record
+    layout = []
+    offset = 0
+    for name, fmt in FIELDS:
+        layout.append([name, _JS_TYPES[fmt], offset])
+        offset += struct.calcsize('<' + fmt)
+    return layout
+
+
+def websocket_frame(payload, opcode=0x2):
+    length = len(payload)
+    if length < 126:
+        header = struct.pack('!BB', 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass  # one line per request would flood the console
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/':
+            self._send(200, 'text/html; charset=utf-8', PAGE.encode('utf-8'))
+        elif url.path == '/fields.json':
+            body = json.dumps({'fields': field_layout(), 'size': RECORD.size,
+                               'speed_unit': 'MPH' if self.server.dashboard.freedom_units else 'KPH'})
+            self._send(200, 'application/json', body.encode('utf-8'))
+        elif url.path == '/stream' and self.headers.get('Upgrade', '').lower() == 'websocket':
+            query = parse_qs(url.query)
+            try:
+                hz = float(query.get('hz', [RATE_HZ])[0])
+            except ValueError:
+                hz = RATE_HZ
+            self._stream(min(max(hz, 1.0), MAX_RATE_HZ))
+        else:
+            self._send(404, 'text/plain', b'not found')
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _stream(self, hz):
+        key = self.headers.get('Sec-WebSocket-Key', '')
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode('ascii')).digest()).decode('ascii')
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept)
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        dashboard = self.server.dashboard
+        connection = self.connection
+        connection.settimeout(SEND_TIMEOUT_S)
+        interval = 1.0 / hz
+        sent = -1
+        dashboard.add_client()
+        try:
+            next_send = time.monotonic()
+            while dashboard.running:
+                # Anything from the browser is a close or a ping we don't need
+                readable, _, _ = select.select([connection], [], [], 0)
+                if readable:
+                    data = connection.recv(4096)
+                    if not data or data[0] & 0x0F == 0x8:
+                        break
+                sequence, record = dashboard.latest
+                if sequence != sent and record is not None:
+                    connection.sendall(websocket_frame(record))
+                    sent = sequence
+                next_send += interval
+                delay = next_send - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    next_send = time.monotonic()  # a slow send doesn't earn a burst
+        except OSError:
+            pass  # browser gone or stuck longer than SEND_TIMEOUT_S
+        finally:
+            dashboard.remove_client()
+
+
+class WebDashboard:
+    def __init__(self, port=PORT, freedom_units=False, host='127.0.0.1'):
+        self.freedom_units = freedom_units
+        self.latest = (0, None)  # (sequence, packed record), replaced whole
+        self.sequence = 0
+        self.clients = 0
+        self.clients_lock = threading.Lock()
+        self.running = True
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.dashboard = self
+        self.host = host
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        if self.host in ('', '0.0.0.0'):
+            print(f'Web dashboard on http://{socket.gethostname()}:{self.port}/ for the whole network, no password')
+        else:
+            print(f'Web dashboard on http://{self.host}:{self.port}/')
+
+    def add_client(self):
+        with self.clients_lock:
+            self.clients += 1
+
+    def remove_client(self):
+        with self.clients_lock:
+            self.clients -= 1
+
+    def publish(self, frame):
+        # Nothing is packed while nobody is watching
+        if not self.clients:
+            return
+        self.sequence += 1
+        self.latest = (self.sequence, RECORD.pack(
+            frame.packet_id & 0xFFFFFFFF, frame.speed_display, round(frame.rpm), round(frame.max_rpm), frame.rpm_ratio,
+            round(frame.gear), frame.shift_light, frame.throttle, frame.brake, frame.steer,
+            round(frame.current_ms), round(frame.delta_ms), frame.delta_valid, round(frame.estimated_ms),
+            frame.progress_percent, frame.distance_display, frame.fuel, frame.max_fuel,
+            frame.engine_dmg, frame.tyre_wear_avg, frame.susp_dmg_max, frame.tc, frame.abs))
+
+    def stop(self):
+        self.running = False
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,295 @@
+import ctypes
+import json
+import os
+
+# EA SPORTS WRC UDP telemetry. The packet layout is read from the game's own
+# readme (channels.json and udp/wrc.json) and compiled into a ctypes structure
+# laid over a single receive buffer, so recv_into decodes a datagram in place
+# without building a tuple or dict per packet.
+
+CTYPES = {
+    'boolean': ctypes.c_bool,
+    'uint8': ctypes.c_uint8, 'int8': ctypes.c_int8,
+    'uint16': ctypes.c_uint16, 'int16': ctypes.c_int16,
+    'uint32': ctypes.c_uint32, 'int32': ctypes.c_int32,
+    'uint64': ctypes.c_uint64, 'int64': ctypes.c_int64,
+    'float32': ctypes.c_float, 'float64': ctypes.c_double,
+    'fourcc': ctypes.c_char * 4,
+}
+
+# Frame attribute, then the (channel, scale) candidates in order of preference.
+# The first channel present in the packet is used for the whole session.
+CHANNEL_MAP = (
+    ('speed_kmh', float, (('speed', 1.0), ('vehicle_speed', 3.6))),
+    ('rpm', int, (('rpm', 1), ('engine_rpm', 1), ('vehicle_engine_rpm_current', 1))),
+    ('max_rpm', int, (('max_rpm', 1), ('vehicle_engine_rpm_max', 1))),
+    ('gear', int, (('gear', 1), ('vehicle_gear_index', 1))),
+    ('throttle', float, (('throttle', 1.0), ('gas', 1.0), ('vehicle_throttle', 1.0))),
+    ('brake', float, (('brake', 1.0), ('vehicle_brake', 1.0))),
+    ('steer', float, (('steering', 1.0), ('vehicle_steering', 1.0))),
+    ('current_ms', int, (('stage_current_time', 1000), ('current_time_ms', 1))),
+    ('best_ms', int, (('stage_best_time', 1000), ('best_time_ms', 1))),
+    ('position', float, (('normalized_spline_position', 1.0), ('stage_progress', 0.01))),
+    ('distance_m', float, (('distance_completed', 1.0), ('distance_traveled', 1.0), ('stage_current_distance', 1.0))),
+    ('tc', float, (('tc_intervention', 1.0),)),
+    ('abs', float, (('abs_intervention', 1.0),)),
+    ('engine_dmg', float, (('engine_damage', 100.0),)),
+    ('tyre_wear_avg', float, (('tyre_wear_average', 100.0),)),
+    ('susp_dmg_max', float, (('suspension_damage', 100.0),)),
+    ('tyres_out', int, (('flat_tyres', 1),)),
+)
+
+# Array slots, in the frame's AC axis and wheel order
+VECTOR_MAP = (
+    ('wheel_speed', 0, 'vehicle_cp_forward_speed_fl', 1.0),
+    ('wheel_speed', 1, 'vehicle_cp_forward_speed_fr', 1.0),
+    ('wheel_speed', 2, 'vehicle_cp_forward_speed_bl', 1.0),
+    ('wheel_speed', 3, 'vehicle_cp_forward_speed_br', 1.0),
+    ('pos', 0, 'vehicle_position_x', 1.0),
+    ('pos', 1, 'vehicle_position_y', 1.0),
+    ('pos', 2, 'vehicle_position_z', 1.0),
+    ('acc_g', 0, 'vehicle_acceleration_x', 1 / 9.81),
+    ('acc_g', 1, 'vehicle_acceleration_y', 1 / 9.81),
+    ('acc_g', 2, 'vehicle_acceleration_z', 1 / 9.81),
+)
+
+# session_end's stage_result_status for a stage driven to the end; anything
+# else (timed out, disqualified, retired) has no time worth keeping
+STAGE_FINISHED = 1
+
+
+def load_packet_layouts(telemetry_directory):
+    # Every packet in wrc.json as {packet id: (4cc, ctypes structure)}
+    with open(os.path.join(telemetry_directory, 'channels.json'), 'r') as f:
+        channels = {ch['id']: ch for ch in json.load(f)['channels']}
+
+    with open(os.path.join(telemetry_directory, 'udp', 'wrc.json'), 'r') as f:
+        struct_data = json.load(f)
+
+    header = struct_data['header']['channels']
+    layouts = {}
+    for packet in struct_data['packets']:
+        names = header + packet['channels']
+        layouts[packet['id']] = (packet.get('4cc', ''), type(packet['id'], (ctypes.LittleEndianStructure,), {
+            '_pack_': 1,
+            '_fields_': [(name, CTYPES[channels[name]['type']]) for name in names],
+        }))
+    return layouts
+
+
+def _stage_id(packet):
+    return getattr(packet, 'route_id', 0) or getattr(packet, 'location_id', 0) or int(getattr(packet, 'stage_length', 0))
+
+
+class _Key(ctypes.LittleEndianStructure):
+    # The 4cc read as one integer, so dispatch doesn't slice the buffer
+    _pack_ = 1
+    _fields_ = [('fourcc', ctypes.c_uint32)]
+
+
+class WrcReader:
+    # poll() receives one datagram and dispatches it on its 4cc (or on its
+    # size when the header has none). Every packet type gets its own
+    # precompiled structure over the shared receive buffer. session_update
+    # ticks are decoded into the frame by read(); session_start, session_end
+    # and pause/resume only update the session state below. While paused the
+    # ingest thread keeps the frame current but skips detectors and learners.
+    def __init__(self, layouts, frame, sock, timeout=0.1):
+        self.frame = frame
+        self.sock = sock
+        sock.settimeout(timeout)
+        self.buffer = bytearray(max([4096] + [ctypes.sizeof(layout) for _, layout in layouts.values()]))
+        self.key = _Key.from_buffer(self.buffer)
+        self.packets = {}
+        self.counts = {}
+        by_4cc = {}
+        by_size = {}
+        for packet_id, (fourcc, layout) in layouts.items():
+            packet = layout.from_buffer(self.buffer)
+            self.packets[packet_id] = packet
+            self.counts[packet_id] = 0
+            entry = (packet_id, ctypes.sizeof(layout), getattr(self, '_' + packet_id, None))
+            by_4cc[int.from_bytes(fourcc.encode().ljust(4, b'\0')[:4], 'little')] = entry
+            by_size.setdefault(ctypes.sizeof(layout), []).append(entry)
+        first = next(iter(layouts.values()))[1]
+        if first._fields_[0][0] == 'packet_4cc' and all(fourcc for fourcc, _ in layouts.values()):
+            self.dispatch = by_4cc
+            self.by_size = False
+        else:
+            # Without a 4cc only packets with a unique size can be told apart
+            self.dispatch = {size: entries[0] for size, entries in by_size.items() if len(entries) == 1}
+            self.by_size = True
+        self.unknown = 0
+        self.invalid = 0
+
+        update = layouts['session_update'][1]
+        self.packet = self.packets['session_update']
+        self.update_size = ctypes.sizeof(update)
+        self.count = 0
+        self.max_rpm_seen = 0
+        names = {name for name, _ in update._fields_}
+        self.mapping = []
+        for attr, convert, candidates in CHANNEL_MAP:
+            for channel, scale in candidates:
+                if channel in names:
+                    self.mapping.append((attr, convert, channel, scale))
+                    break
+        self.mapping = tuple(self.mapping)
+        self.has_max_rpm = any(attr == 'max_rpm' for attr, _, _, _ in self.mapping)
+        self.vectors = tuple(entry for entry in VECTOR_MAP if entry[2] in names)
+        # Without a progress channel, progress is distance over session_start's stage length
+        self.position_from_length = not any(attr == 'position' for attr, _, _, _ in self.mapping)
+        # Ids of the newest update, copied in read() (under the ingest lock) for
+        # stage_key(), which must not read the buffer the ingest thread writes to
+        self.update_stage = self.update_vehicle = -1
+        self.update_key = ('0', '0')
+
+        # Session state, read once from session_start rather than per packet
+        self.sessions = 0
+        self.session_key = ('', '')  # (stage, vehicle), replaced whole
+        self.stage_length_m = 0.0
+        self.max_rpm = 0
+        self.paused = False
+        self.ends = 0
+        self.result_ms = 0
+        self.result_status = 0
+        self.has_session_end = 'session_end' in layouts
+
+    def poll(self):
+        # Blocks for up to the socket timeout, so stopping stays responsive.
+        # True when a session_update is waiting for read()
+        try:
+            n = self.sock.recv_into(self.buffer)
+        except OSError:
+            return False
+        entry = self.dispatch.get(n if self.by_size else self.key.fourcc)
+        if entry is None:
+            self.unknown += 1
+            return False
+        packet_id, size, handler = entry
+        if n != size:
+            self.invalid += 1
+            return False
+        self.counts[packet_id] += 1
+        if handler is not None:
+            handler(self.packets[packet_id])
+        return packet_id == 'session_update'
+
+    def read(self):
+        packet = self.packet
+        frame = self.frame
+        for attr, convert, channel, scale in self.mapping:
+            setattr(frame, attr, convert(getattr(packet, channel) * scale))
+        for attr, index, channel, scale in self.vectors:
+            getattr(frame, attr)[index] = getattr(packet, channel) * scale
+        self.count += 1
+        frame.packet_id = self.count
+
+        # Without a rev limit in the update packet: the one from session_start,
+        # else the highest rpm seen so far, worked out again every packet
+        if not self.has_max_rpm or frame.max_rpm <= 0:
+            if frame.rpm > self.max_rpm_seen:
+                self.max_rpm_seen = frame.rpm
+            frame.max_rpm = self.max_rpm if self.max_rpm > 0 else self.max_rpm_seen
+        if self.position_from_length and self.stage_length_m > 0:
+            frame.position = frame.distance_m / self.stage_length_m
+
+        if not self.sessions:
+            stage = _stage_id(packet)
+            vehicle = getattr(packet, 'vehicle_id', 0)
+            if stage != self.update_stage or vehicle != self.update_vehicle:
+                self.update_stage, self.update_vehicle = stage, vehicle
+                self.update_key = (str(stage), str(vehicle))
+
+    def _session_start(self, packet):
+        self.session_key = (str(_stage_id(packet)), str(getattr(packet, 'vehicle_id', 0)))
+        self.stage_length_m = getattr(packet, 'stage_length', 0.0)
+        self.max_rpm = int(getattr(packet, 'vehicle_engine_rpm_max', 0))
+        self.max_rpm_seen = 0  # a new car doesn't keep the last one's limit
+        self.paused = False
+        self.sessions += 1
+
+    def _session_end(self, packet):
+        self.result_ms = int(getattr(packet, 'stage_result_time', 0) * 1000)
+        # Layouts without a status only send session_end for a result
+        self.result_status = getattr(packet, 'stage_result_status', STAGE_FINISHED)
+        self.ends += 1
+
+    def finished(self):
+        # The last session_end was a completed stage with a time
+        return self.result_status == STAGE_FINISHED and self.result_ms > 0
+
+    def _session_pause(self, packet):
+        self.paused = True
+
+    def _session_resume(self, packet):
+        self.paused = False
+
+    def stage_key(self):
+        # (stage, vehicle) for personal bests; falls back to the update
+        # packets' ids when the dash was started after session_start
+        return self.session_key if self.sessions else self.update_key
+
+
+if __name__ == '__main__':
+    import socket
+    import struct
+    import tempfile
+
+    from telemetry import TelemetryFrame
+
+    # A layout whose session_update has no max-rpm channel, fed over a real socket
+    directory = tempfile.mkdtemp()
+    os.makedirs(os.path.join(directory, 'udp'))
+    with open(os.path.join(directory, 'channels.json'), 'w') as f:
+        json.dump({'channels': [{'id': 'packet_4cc', 'type': 'fourcc'},
+                                {'id': 'vehicle_id', 'type': 'uint16'},
+                                {'id': 'vehicle_engine_rpm_max', 'type': 'float32'},
+                                {'id': 'vehicle_engine_rpm_current', 'type': 'float32'},
+                                {'id': 'stage_result_time', 'type': 'float32'},
+                                {'id': 'stage_result_status', 'type': 'uint8'}]}, f)
+    with open(os.path.join(directory, 'udp', 'wrc.json'), 'w') as f:
+        json.dump({'header': {'channels': ['packet_4cc']},
+                   'packets': [{'id': 'session_start', '4cc': 'sess',
+                                'channels': ['vehicle_id', 'vehicle_engine_rpm_max']},
+                               {'id': 'session_update', '4cc': 'sesu',
+                                'channels': ['vehicle_id', 'vehicle_engine_rpm_current']},
+                               {'id': 'session_end', '4cc': 'sese',
+                                'channels': ['stage_result_time', 'stage_result_status']}]}, f)
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    reader = WrcReader(load_packet_layouts(directory), TelemetryFrame(), receiver)
+
+    def send(packet):
+        sender.sendto(packet, receiver.getsockname())
+        if reader.poll():
+            reader.read()
+        return reader.frame.max_rpm
+
+    def start(vehicle, max_rpm):
+        return send(b'sess' + struct.pack('<Hf', vehicle, max_rpm))
+
+    def update(rpm):
+        return send(b'sesu' + struct.pack('<Hf', 1, rpm))
+
+    # Started mid-stage: the highest rpm seen so far, and the ids from the updates
+    assert [update(rpm) for rpm in (900, 3000, 7000, 5000)] == [900, 3000, 7000, 7000]
+    assert reader.stage_key() == ('0', '1')
+    # session_start's rev limit replaces it
+    start(1, 8000)
+    assert update(4000) == 8000
+    assert reader.stage_key() == ('0', '1')
+    # A car without one starts over rather than keeping 8000 or 7000
+    start(2, 0)
+    assert reader.stage_key() == ('0', '2')
+    assert [update(rpm) for rpm in (2000, 6500)] == [2000, 6500]
+    # A retirement has a time but is not a result
+    send(b'sese' + struct.pack('<fB', 312.5, 4))
+    assert reader.result_ms == 312500 and not reader.finished()
+    send(b'sese' + struct.pack('<fB', 298.25, STAGE_FINISHED))
+    assert reader.finished()
+    assert reader.counts == {'session_start': 2, 'session_update': 7, 'session_end': 2} and reader.invalid == 0
+    sender.close()
+    receiver.close()
+    print('rev limit fallback and stage results ok')